@@ -0,0 +1,102 @@
+"""精簡型錄的記憶體用量比較
+
+比較舊版「每張生寫真一個物件 (含 __dict__、ID 與圖片網址字串)」與 PhotoCatalog (代碼 + 陣列) 的記憶體用量。
+
+    python benchmarks/catalog_memory.py --photos 50000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sakamichi_catalog import PhotoCatalog  # noqa: E402
+
+POSE_NAMES = ["Y", "C", "H", "SPY", "SPH"]
+POSE_SUFFIXES = ["yori.jpg", "chuu.jpg", "hiki.jpg", "spyori.jpg", "sphiki.jpg"]
+BASE_IMAGE_URL = "https://example.com/images/sakamichi/"
+
+
+class LegacyPhoto:
+    """舊版 Photo 的欄位配置 (每個實例一個 __dict__，ID 與圖片網址預先組好)"""
+
+    def __init__(self, set_name, member, pose_index, owned_count=0, custom_image_url=None):
+        self.id = f"{member['name']}_{set_name}_{POSE_NAMES[pose_index]}"
+        self.set_name = set_name
+        self.member = member
+        self.pose = POSE_NAMES[pose_index]
+        self.owned_count = owned_count
+        self.custom_image_url = custom_image_url
+        self.image_url = f"{BASE_IMAGE_URL}{member['name']}_{set_name.replace(' ', '_')}_{POSE_SUFFIXES[pose_index]}"
+
+
+def synthetic_rows(photo_count: int, member_count: int = 100):
+    """產生 (成員, 系列, 姿勢代碼, 張數) 的合成資料"""
+    members = [{"name": f"member{m:03d}", "group": "乃木坂46", "gen": 3 + m % 4} for m in range(member_count)]
+    per_set = member_count * len(POSE_NAMES)
+    for index in range(photo_count):
+        set_index, rest = divmod(index, per_set)
+        member_index, pose_index = divmod(rest, len(POSE_NAMES))
+        yield members[member_index], f"2024.Set{set_index:04d}", pose_index, index % 3
+
+
+def measure(build):
+    tracemalloc.start()
+    started_at = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started_at
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="精簡型錄記憶體用量比較")
+    parser.add_argument("--photos", type=int, default=50000)
+    parser.add_argument("--output", help="結果輸出的 JSON 檔")
+    args = parser.parse_args()
+    rows = list(synthetic_rows(args.photos))
+
+    def build_legacy():
+        by_id = {}
+        for member, set_name, pose_index, count in rows:
+            photo = LegacyPhoto(set_name, member, pose_index, count)
+            by_id[photo.id] = photo
+        return by_id
+
+    def build_catalog():
+        catalog = PhotoCatalog(POSE_NAMES)
+        for member, set_name, pose_index, count in rows:
+            catalog.add(member["name"], set_name, POSE_NAMES[pose_index], count)
+        return catalog
+
+    legacy, legacy_bytes, legacy_seconds = measure(build_legacy)
+    del legacy
+    catalog, catalog_bytes, catalog_seconds = measure(build_catalog)
+
+    # 查詢仍然正確: 以 ID 找到列並讀回張數
+    member, set_name, pose_index, count = rows[-1]
+    slot = catalog.find_id(f"{member['name']}_{set_name}_{POSE_NAMES[pose_index]}")
+    assert slot is not None and catalog.counts[slot] == count
+
+    results = {
+        "photos": args.photos,
+        "legacy_bytes": legacy_bytes,
+        "catalog_bytes": catalog_bytes,
+        "catalog_column_bytes": catalog.nbytes(),
+        "saved_ratio": 1 - catalog_bytes / legacy_bytes,
+        "legacy_build_seconds": legacy_seconds,
+        "catalog_build_seconds": catalog_seconds,
+    }
+    print(f"{args.photos} photos: legacy {legacy_bytes / 1e6:.1f} MB, catalog {catalog_bytes / 1e6:.1f} MB "
+          f"(columns {catalog.nbytes() / 1e6:.2f} MB), saved {results['saved_ratio']:.0%}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""收藏進度統計的效能比較
+
+比較舊版「逐張生寫真累加 dict」與 ProgressSummary (NumPy 分組加總) 在「所有系列總計」模式下的耗時。
+
+    python benchmarks/progress_summary.py --sets 500 --members 100
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sakamichi_catalog import PhotoCatalog, ProgressSummary  # noqa: E402
+
+POSE_NAMES = ["Y", "C", "H", "SPY", "SPH"]
+GROUPS = ["乃木坂46", "櫻坂46", "日向坂46"]
+
+
+def build_catalog(set_count: int, member_count: int) -> PhotoCatalog:
+    catalog = PhotoCatalog(POSE_NAMES)
+    for set_index in range(set_count):
+        for member_index in range(member_count):
+            for pose_index, pose_name in enumerate(POSE_NAMES):
+                catalog.add(f"member{member_index:03d}", f"Set{set_index:04d}", pose_name,
+                            (set_index + member_index + pose_index) % 3, group_name=GROUPS[member_index % 3])
+    return catalog
+
+
+def python_progress(catalog: PhotoCatalog):
+    """舊版 calculate_progress 的逐張累加方式 (對照組)"""
+    progress = {}
+    for slot in catalog.slots():
+        member_name = catalog.member_name(slot)
+        if member_name not in progress:
+            progress[member_name] = {'total_needed': 0, 'total_collected': 0,
+                                     'pose_collected': {pose: 0 for pose in POSE_NAMES}}
+        stats = progress[member_name]
+        stats['total_needed'] += 1
+        stats['total_collected'] += catalog.counts[slot]
+        stats['pose_collected'][catalog.pose_name(slot)] += catalog.counts[slot]
+    return progress
+
+
+def best_of(function, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started_at)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="收藏進度統計效能比較")
+    parser.add_argument("--sets", type=int, default=500)
+    parser.add_argument("--members", type=int, default=100)
+    parser.add_argument("--output", help="結果輸出的 JSON 檔")
+    args = parser.parse_args()
+
+    catalog = build_catalog(args.sets, args.members)
+    ProgressSummary(catalog)  # 預先載入 NumPy，不計入量測
+
+    expected = python_progress(catalog)
+    summary = ProgressSummary(catalog).as_dict()
+    assert all(summary[name]['total_collected'] == stats['total_collected'] and
+               summary[name]['pose_collected'] == stats['pose_collected'] for name, stats in expected.items())
+
+    results = {
+        "photos": len(catalog),
+        "python_seconds": best_of(lambda: python_progress(catalog), repeat=2),
+        "vectorized_all_sets_seconds": best_of(lambda: ProgressSummary(catalog)),
+        "vectorized_one_set_seconds": best_of(lambda: ProgressSummary(catalog, "Set0000")),
+    }
+    print(f"{results['photos']} photos: python {results['python_seconds'] * 1000:.1f} ms, "
+          f"vectorized all sets {results['vectorized_all_sets_seconds'] * 1000:.2f} ms, "
+          f"one set {results['vectorized_one_set_seconds'] * 1000:.2f} ms")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
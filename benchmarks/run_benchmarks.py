@@ -0,0 +1,211 @@
+"""合成大型收藏的效能量測
+
+產生指定數量的系列 (依序分配給三個團體，每個系列包含該團體全部成員 x 全部姿勢)，
+量測載入、儲存、收藏進度統計、單次 ➕ 來回與系列新增/編輯/刪除的耗時，結果輸出為 JSON，
+方便比較不同版本:
+
+    python benchmarks/run_benchmarks.py --sets 500 --output results.json
+    python benchmarks/run_benchmarks.py --sets 500 --backend sqlite --legacy-format
+    python benchmarks/run_benchmarks.py --sets 500 --compare results.json   # 與先前的結果比較
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sakamichi_catalog import ProgressSummary  # noqa: E402
+from sakamichi_core import (  # noqa: E402
+    ALL_SETS_OPTION, Group, Pose, calculate_progress, load_collection, save_collection,
+)
+from sakamichi_roster import get_roster  # noqa: E402
+from sakamichi_storage import atomic_write_json, create_storage  # noqa: E402
+
+
+def synthetic_data(set_count: int, legacy_format: bool = False, owned_every: int = 3):
+    """產生 (系列定義, 收藏列)；legacy_format 為 True 時使用舊版 member_list/poses 結構"""
+    groups = list(Group)
+    pose_names = [pose.name for pose in Pose]
+    sets_by_group = {group.value: {} for group in groups}
+    rows = []
+    for set_index in range(set_count):
+        group = groups[set_index % len(groups)]
+        set_name = f"2024.Set{set_index:04d}"
+        member_names = list(get_roster().member_names(group))
+        if legacy_format:
+            sets_by_group[group.value][set_name] = {"member_list": member_names, "poses": pose_names}
+        else:
+            sets_by_group[group.value][set_name] = {
+                "members_with_poses": {name: list(pose_names) for name in member_names}}
+        for member_index, member_name in enumerate(member_names):
+            for pose_index, pose_name in enumerate(pose_names):
+                if (set_index + member_index + pose_index) % owned_every == 0:
+                    rows.append({
+                        "id": f"{member_name}_{set_name}_{pose_name}", "set_name": set_name,
+                        "member_name": member_name, "group": group.value, "pose": pose_name,
+                        "owned_count": 1 + set_index % 2, "custom_image_url": None,
+                    })
+    return sets_by_group, rows
+
+
+def timed(function, repeat: int):
+    """執行 repeat 次，回傳 (各次秒數的統計, 最後一次的回傳值)"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started_at)
+    return {"min": min(timings), "median": statistics.median(timings), "max": max(timings)}, result
+
+
+class Bench:
+    def __init__(self, args):
+        self.args = args
+        self.work_dir = tempfile.mkdtemp(prefix="sakamichi_bench_")
+        self.data_file = os.path.join(self.work_dir, "sakamichi_collection_data.json")
+        self.storage = self.open_storage()
+        self.results = {}
+
+    def open_storage(self):
+        return create_storage(
+            self.args.backend, self.data_file,
+            journal_file=os.path.join(self.work_dir, "sakamichi_collection_data.journal.jsonl"),
+            sqlite_file=os.path.join(self.work_dir, "sakamichi_collection_data.sqlite3"),
+        )
+
+    def record(self, name, stats):
+        self.results[name] = stats
+        print(f"{name:<28} median {stats['median'] * 1000:9.2f} ms   (min {stats['min'] * 1000:.2f} ms)")
+
+    def load_uncached(self):
+        # 量測實際的解碼與建立成本，不使用同一 process 的共用快取
+        self.storage.invalidate_cache()
+        return load_collection(self.storage)
+
+    def run(self):
+        args = self.args
+        sets_by_group, rows = synthetic_data(args.sets, args.legacy_format)
+        if args.legacy_format:
+            # 舊版程式寫入的 JSON 檔 (沒有 schema_version)；第一次載入會備份、轉換並寫回 (SQLite 為匯入時)，單獨記錄
+            atomic_write_json(self.data_file, {"sets": sets_by_group, "collection": rows})
+
+            def first_load():
+                self.storage = self.open_storage()
+                return self.load_uncached()
+            stats, _ = timed(first_load, 1)
+            self.record("load_legacy_first", stats)
+        else:
+            self.storage.save_all(sets_by_group, rows)
+
+        stats, (photos, sets_by_group) = timed(self.load_uncached, args.repeat)
+        self.record("load_data", stats)
+        stats, _ = timed(lambda: self.storage.load_cached(), args.repeat)
+        self.record("load_cached_hit", stats)
+        stats, _ = timed(lambda: save_collection(self.storage, photos, sets_by_group), args.repeat)
+        self.record("save_data", stats)
+
+        def uncached_progress(set_name):
+            # 直接建立統計 (不經過 summarize() 的快取)，量測實際的計算成本
+            def run_once():
+                return ProgressSummary(photos.catalog, None if set_name == ALL_SETS_OPTION else set_name)
+            return run_once
+
+        calculate_progress(photos, ALL_SETS_OPTION)  # 預先載入 NumPy，不計入量測
+        stats, _ = timed(uncached_progress(ALL_SETS_OPTION), args.repeat)
+        self.record("calculate_progress_all", stats)
+        first_set = next(iter(next(iter(sets_by_group.values()))))
+        stats, _ = timed(uncached_progress(first_set), args.repeat)
+        self.record("calculate_progress_set", stats)
+
+        photo = next(iter(photos))
+
+        def increment_round_trip():
+            delta = photos.set_count(photo, photo.owned_count + 1)
+            self.storage.save_count_deltas([(photo.to_dict(), delta)])
+            return photos.progress(ALL_SETS_OPTION)
+        stats, _ = timed(increment_round_trip, args.repeat * 10)
+        self.record("increment_round_trip", stats)
+
+        group_value = Group.NOGIZAKA.value
+        member_names = list(get_roster().member_names(Group.NOGIZAKA))
+        pose_names = [pose.name for pose in Pose]
+
+        def edit_sets(mutate):
+            # 與介面相同: 修改系列定義後只增刪該系列的 Photo，並只儲存該系列 (不重新載入)
+            def run_once():
+                set_name = mutate(sets_by_group)
+                set_info = sets_by_group[group_value].get(set_name)
+                photos.apply_set_definition(
+                    group_value, set_name, set_info["members_with_poses"] if set_info is not None else None)
+                rows = [photo.to_dict() for photo in photos.for_set(set_name)]
+                self.storage.save_set_patches([(group_value, set_name, set_info, rows)])
+            return run_once
+
+        counter = iter(range(10 ** 9))
+
+        def add_set(sets):
+            set_name = f"Bench.New{next(counter)}"
+            sets[group_value][set_name] = {
+                "members_with_poses": {name: list(pose_names) for name in member_names}}
+            return set_name
+
+        def edit_set(sets):
+            info = sets[group_value][first_set]["members_with_poses"]
+            name = member_names[0]
+            info[name] = pose_names[:2] if len(info.get(name, [])) == len(pose_names) else list(pose_names)
+            return first_set
+
+        def delete_set(sets):
+            added = [name for name in sets[group_value] if name.startswith("Bench.New")]
+            sets[group_value].pop(added[-1])
+            return added[-1]
+
+        for name, mutate in (("set_add", add_set), ("set_edit", edit_set), ("set_delete", delete_set)):
+            stats, _ = timed(edit_sets(mutate), args.repeat)
+            self.record(name, stats)
+
+        return {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {"sets": args.sets, "backend": args.backend, "legacy_format": args.legacy_format,
+                       "repeat": args.repeat},
+            "photos": len(photos),
+            "rows_with_counts": len(rows),
+            "seconds": self.results,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合成大型收藏的效能量測")
+    parser.add_argument("--sets", type=int, default=100)
+    parser.add_argument("--backend", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--legacy-format", action="store_true", help="以舊版 member_list/poses 結構產生系列")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="結果輸出的 JSON 檔")
+    parser.add_argument("--compare", help="先前輸出的 JSON 檔，列出各項目 median 的變化")
+    args = parser.parse_args()
+
+    results = Bench(args).run()
+    print(f"{results['photos']} photos")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)["seconds"]
+        for name, stats in results["seconds"].items():
+            if name in baseline and baseline[name]["median"] > 0:
+                ratio = stats["median"] / baseline[name]["median"]
+                print(f"{name:<28} x{ratio:6.2f} vs baseline")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
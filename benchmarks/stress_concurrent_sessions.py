@@ -0,0 +1,152 @@
+"""多 session 同時寫入的壓力測試
+
+模擬多位收藏者、每位收藏者多個 session (執行緒 + process) 同時點擊 ➕，同時另有執行緒持續以
+load_cached() 讀取 (讀取與寫入的鎖順序不一致時會卡住，逾時即判定失敗)，
+最後檢查每張生寫真的張數都等於點擊總次數 (沒有任何一次更新遺失)。
+
+    python benchmarks/stress_concurrent_sessions.py --backend json --users 4 --processes 4 --threads 4 --taps 200
+    python benchmarks/stress_concurrent_sessions.py --backend sqlite --background
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sakamichi_storage import create_storage, get_background_writer  # noqa: E402
+
+PHOTO_IDS = [f"井上和_S1_{pose}" for pose in ("Y", "C", "H", "S", "K")]
+# 壓力測試時使用很小的日誌上限，迫使寫入途中頻繁合併 (compact)
+COMPACT_BYTES = 2 * 1024
+
+
+def user_storage(work_dir: str, backend: str, user: str):
+    base_dir = os.path.join(work_dir, user)
+    os.makedirs(base_dir, exist_ok=True)
+    return create_storage(
+        backend, os.path.join(base_dir, "sakamichi_collection_data.json"),
+        journal_file=os.path.join(base_dir, "sakamichi_collection_data.journal.jsonl"),
+        sqlite_file=os.path.join(base_dir, "sakamichi_collection_data.sqlite3"),
+        compact_bytes=COMPACT_BYTES,
+    )
+
+
+def photo_row(photo_id: str):
+    member_name, set_name, pose = photo_id.split("_")
+    return {"id": photo_id, "set_name": set_name, "member_name": member_name, "group": "乃木坂46",
+            "pose": pose, "owned_count": 0, "custom_image_url": None}
+
+
+def run_session(work_dir: str, backend: str, user: str, session_index: int, taps: int, background: bool):
+    """單一 session: 依序對各張生寫真點擊 ➕ (每 7 次夾雜一次 ➖ 與 ➕)"""
+    storage = user_storage(work_dir, backend, user)
+    if background:
+        writer = get_background_writer(0.05)
+        save_count_deltas = lambda deltas: writer.submit_count_deltas(storage, deltas)  # noqa: E731
+    else:
+        save_count_deltas = storage.save_count_deltas
+    for tap in range(taps):
+        row = photo_row(PHOTO_IDS[(session_index + tap) % len(PHOTO_IDS)])
+        save_count_deltas([(row, 1)])
+        if tap % 7 == 0:
+            save_count_deltas([(row, -1)])
+            save_count_deltas([(row, 1)])
+
+
+def run_loads(work_dir: str, backend: str, user: str, stop: threading.Event):
+    """與寫入同時進行的讀取: 重複以 load_cached() 載入 (每次寫入後快取失效，會重新解析)"""
+    storage = user_storage(work_dir, backend, user)
+    while not stop.is_set():
+        storage.load_cached()
+
+
+def run_process(work_dir: str, backend: str, users: int, process_index: int, threads: int, taps: int,
+                background: bool, loads: int):
+    workers = []
+    for user_index in range(users):
+        for thread_index in range(threads):
+            session_index = process_index * threads + thread_index
+            workers.append(threading.Thread(
+                target=run_session, args=(work_dir, backend, f"user{user_index}", session_index, taps, background)))
+    stop = threading.Event()
+    readers = [threading.Thread(target=run_loads, args=(work_dir, backend, f"user{user_index}", stop))
+               for user_index in range(users) for _ in range(loads)]
+    for thread in workers + readers:
+        thread.start()
+    for worker in workers:
+        worker.join()
+    if background:
+        get_background_writer().flush()
+    stop.set()
+    for reader in readers:
+        reader.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多 session 同時寫入壓力測試")
+    parser.add_argument("--backend", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--users", type=int, default=3)
+    parser.add_argument("--processes", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--taps", type=int, default=100)
+    parser.add_argument("--background", action="store_true", help="透過背景寫入執行緒 (合併寫入) 儲存")
+    parser.add_argument("--loads", type=int, default=1, help="每個 process 中每位收藏者同時讀取的執行緒數")
+    parser.add_argument("--timeout", type=float, default=300, help="等待各 process 結束的秒數 (逾時視為卡住)")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="sakamichi_stress_")
+    sets_by_group = {"乃木坂46": {"S1": {"members_with_poses": {"井上和": ["Y", "C", "H", "S", "K"]}}}}
+    for user_index in range(args.users):
+        user_storage(work_dir, args.backend, f"user{user_index}").save_all(
+            sets_by_group, [photo_row(photo_id) for photo_id in PHOTO_IDS])
+
+    started_at = time.perf_counter()
+    processes = [
+        multiprocessing.Process(target=run_process,
+                                args=(work_dir, args.backend, args.users, i, args.threads, args.taps, args.background,
+                                      args.loads))
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    deadline = started_at + args.timeout
+    for process in processes:
+        process.join(max(0.0, deadline - time.perf_counter()))
+        if process.is_alive():
+            for alive in processes:
+                alive.terminate()
+            raise SystemExit(f"FAILED: worker processes did not finish within {args.timeout:.0f}s (deadlock?)")
+        if process.exitcode != 0:
+            raise SystemExit(f"worker process failed with exit code {process.exitcode}")
+    elapsed = time.perf_counter() - started_at
+
+    # 每位收藏者: 每個 session 點擊 taps 次 ➕ (➖/➕ 成對抵銷)，平均分配到各張生寫真
+    sessions = args.processes * args.threads
+    expected = {photo_id: 0 for photo_id in PHOTO_IDS}
+    for session_index in range(sessions):
+        for tap in range(args.taps):
+            expected[PHOTO_IDS[(session_index + tap) % len(PHOTO_IDS)]] += 1
+
+    lost = 0
+    for user_index in range(args.users):
+        _, rows = user_storage(work_dir, args.backend, f"user{user_index}").load()
+        counts = {row["id"]: row["owned_count"] for row in rows}
+        for photo_id, expected_count in expected.items():
+            if counts.get(photo_id) != expected_count:
+                lost += 1
+                print(f"user{user_index} {photo_id}: expected {expected_count}, got {counts.get(photo_id)}")
+
+    total_writes = args.users * sessions * (args.taps + 2 * ((args.taps + 6) // 7))
+    print(f"{args.backend}: {args.users} users x {sessions} sessions, {total_writes} writes in {elapsed:.2f}s "
+          f"({total_writes / elapsed:.0f} writes/s)")
+    if lost:
+        raise SystemExit(f"FAILED: {lost} photo counts lost updates")
+    print("OK: no lost updates")
+
+
+if __name__ == "__main__":
+    main()
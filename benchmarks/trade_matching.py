@@ -0,0 +1,145 @@
+"""交換配對 (sakamichi_trade) 的效能量測
+
+以固定的亂數種子產生多位收藏者的合成收藏: 每位收藏者選一個團體與 2-8 位推しメン，
+追蹤這些成員在該團體所有系列的全部姿勢 (約 45% 0 張、35% 1 張、20% 2-4 張)，
+量測建立索引、G 矩陣、兩人互換與三人循環的耗時，並確認配對結果合法
+(給出的人確實有多餘、收到的人確實缺少)。
+
+    python benchmarks/trade_matching.py --collectors 300 --sets 1000
+    python benchmarks/trade_matching.py --collectors 20 --sets 30 --verify      # 與逐一比對的結果比較
+    python benchmarks/trade_matching.py --collectors 5 --sets 10 --write-corpus corpus/   # 輸出 JSON Lines
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sakamichi_core import Group, Pose  # noqa: E402
+from sakamichi_roster import get_roster  # noqa: E402
+from sakamichi_trade import TradeIndex  # noqa: E402
+from sakamichi_transfer import write_rows  # noqa: E402
+
+POSE_NAMES = [pose.name for pose in Pose]
+
+
+def synthetic_corpus(collector_count: int, set_count: int, seed: int = 46):
+    """{收藏者名稱: [匯出列...]} (匯出列與 sakamichi_transfer 的格式相同)"""
+    rng = random.Random(seed)
+    groups = list(Group)
+    sets_by_group = {group: [f"2024.Set{index:04d}" for index in range(set_count) if index % len(groups) == position]
+                     for position, group in enumerate(groups)}
+    members_by_group = {group: list(get_roster().member_names(group)) for group in groups}
+
+    corpus = {}
+    for collector_index in range(collector_count):
+        group = rng.choice(groups)
+        oshi = rng.sample(members_by_group[group], min(rng.randint(2, 8), len(members_by_group[group])))
+        rows = []
+        for set_name in sets_by_group[group]:
+            for member_name in oshi:
+                for pose_name in POSE_NAMES:
+                    roll = rng.random()
+                    owned_count = 0 if roll < 0.45 else 1 if roll < 0.80 else rng.randint(2, 4)
+                    rows.append({"id": f"{member_name}_{set_name}_{pose_name}", "group": group.value,
+                                 "set_name": set_name, "member_name": member_name, "pose": pose_name,
+                                 "owned_count": owned_count})
+        corpus[f"collector{collector_index:04d}"] = rows
+    return corpus
+
+
+def build_index(corpus) -> TradeIndex:
+    index = TradeIndex()
+    for name, rows in corpus.items():
+        index.add_collector(name, ((row["id"], row["owned_count"]) for row in rows))
+    return index
+
+
+def brute_force_give(corpus):
+    """G[a][b] 的對照組: 逐一比對每兩位收藏者的多餘與缺少集合"""
+    surplus = [{row["id"] for row in rows if row["owned_count"] > 1} for rows in corpus.values()]
+    missing = [{row["id"] for row in rows if row["owned_count"] == 0} for rows in corpus.values()]
+    return [[0 if a == b else len(surplus[a] & missing[b]) for b in range(len(surplus))] for a in range(len(surplus))]
+
+
+def check_trades(corpus, pairs, cycles):
+    """確認每次交換都合法，回傳交換的總張數"""
+    counts = {name: {row["id"]: row["owned_count"] for row in rows} for name, rows in corpus.items()}
+    received = {name: set() for name in corpus}
+
+    def give(giver, receiver, photo_ids):
+        for photo_id in photo_ids:
+            assert counts[giver].get(photo_id, 0) > 1, (giver, photo_id)
+            assert counts[receiver].get(photo_id) == 0 and photo_id not in received[receiver], (receiver, photo_id)
+            counts[giver][photo_id] -= 1
+            received[receiver].add(photo_id)
+        return len(photo_ids)
+
+    total = 0
+    for trade in pairs:
+        assert len(trade.a_gives) == len(trade.b_gives)
+        total += give(trade.a, trade.b, trade.a_gives) + give(trade.b, trade.a, trade.b_gives)
+    for trade in cycles:
+        assert len({len(photo_ids) for photo_ids in trade.gives}) == 1
+        for giver, receiver, photo_ids in zip(trade.members, trade.members[1:] + trade.members[:1], trade.gives):
+            total += give(giver, receiver, photo_ids)
+    return total
+
+
+def timed(function):
+    started_at = time.perf_counter()
+    result = function()
+    return time.perf_counter() - started_at, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="交換配對效能量測")
+    parser.add_argument("--collectors", type=int, default=300)
+    parser.add_argument("--sets", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=46)
+    parser.add_argument("--verify", action="store_true", help="與逐一比對的 G 矩陣比較 (收藏者多時很慢)")
+    parser.add_argument("--write-corpus", metavar="DIR", help="將合成收藏輸出為每位收藏者一個 JSON Lines 檔")
+    parser.add_argument("--output", help="結果輸出的 JSON 檔")
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(args.collectors, args.sets, args.seed)
+    if args.write_corpus:
+        os.makedirs(args.write_corpus, exist_ok=True)
+        for name, rows in corpus.items():
+            with open(os.path.join(args.write_corpus, f"{name}.jsonl"), 'w', encoding='utf-8', newline='') as f:
+                write_rows(rows, f, "jsonl")
+
+    index_seconds, index = timed(lambda: build_index(corpus))
+    matrix_seconds, give = timed(index.give_matrix)
+    if args.verify:
+        assert give.tolist() == brute_force_give(corpus)
+    pairs_seconds, pairs = timed(index.match_pairs)
+    cycles_seconds, cycles = timed(index.match_cycles)
+    traded = check_trades(corpus, pairs, cycles)
+
+    results = {
+        "collectors": len(corpus),
+        "photo_ids": len(index.photo_ids),
+        "entries": sum(len(rows) for rows in corpus.values()),
+        "index_seconds": index_seconds,
+        "give_matrix_seconds": matrix_seconds,
+        "pairs_seconds": pairs_seconds,
+        "cycles_seconds": cycles_seconds,
+        "pair_trades": len(pairs),
+        "cycle_trades": len(cycles),
+        "photos_traded": traded,
+    }
+    print(f"{results['collectors']} collectors, {results['photo_ids']} photo ids, {results['entries']} entries: "
+          f"index {index_seconds:.2f} s, G matrix {matrix_seconds:.2f} s, "
+          f"pairs {pairs_seconds:.2f} s ({len(pairs)}), cycles {cycles_seconds:.2f} s ({len(cycles)}), "
+          f"{traded} photos traded")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,60 @@
 import streamlit as st
-from enum import Enum
-import json
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional
+import copy
+import io
 import os
-import base64 
-
-# --- 0. 設定檔案路徑 ---
-DATA_FILE = "sakamichi_collection_data.json"
+import time
+from contextlib import contextmanager
+# V10.7 變更: 資料模型、儲存設定、載入/儲存與統計移至 sakamichi_core (不依賴 Streamlit)，本檔只負責介面
+from sakamichi_core import (
+    BLOB_DIR, DEFAULT_SETS_BY_GROUP, Group, Photo, PhotoCollection, Pose,
+    create_user_storage, load_collection, normalize_user_namespace, store_image_blob,
+)
+from sakamichi_history import (
+    apply_operation, count_operation, get_operation_history, image_operation, set_operation,
+)
+from sakamichi_image_server import image_url_for
+from sakamichi_profiling import RerunProfile, append_trace, profiling_requested
+from sakamichi_roster import get_roster
+from sakamichi_search import search_photos
+from sakamichi_storage import get_background_writer
+from sakamichi_transfer import export_text, format_from_path, import_collection
+from sakamichi_wantlist import find_font, format_want_list_text, render_want_list_png, want_list_size
+
+# V10.1 新增: 整頁重繪計時起點 (與卡片 fragment 的局部重繪分開量測)
+RUN_STARTED_AT = time.perf_counter()
+
+# --- 0. 設定檔案路徑 (見 sakamichi_core) ---
+# V10.3 新增: 多位收藏者。網址帶 ?user=<名稱> 時使用該收藏者的獨立資料檔
+def get_user_namespace() -> str:
+    """從網址參數取得收藏者名稱 (只保留可用於檔名的字元)"""
+    return normalize_user_namespace(st.query_params.get("user", ""))
+
+USER_NAMESPACE = get_user_namespace()
+STORAGE = create_user_storage(USER_NAMESPACE)
+
+# V10.4 新增: 寫入由背景執行緒處理 (合併 SAVE_DEBOUNCE_SECONDS 內的變更後一次寫入，
+# 以暫存檔 + fsync + 改名取代原檔)，widget callback 不再等待磁碟 I/O
+SAVE_DEBOUNCE_SECONDS = 0.3
+PERSISTENCE_WRITER = get_background_writer(SAVE_DEBOUNCE_SECONDS)
+
+# V10.16 新增: 復原/重做。每次變更記錄為可反轉的小操作 (同一位收藏者的 session 共用，重新啟動後仍保留)
+HISTORY = get_operation_history(USER_NAMESPACE)
+
+# V10.8 新增: 效能分析 (環境變數 SAKAMICHI_PROFILE=1 或網址 ?profile=1)。
+# 計時各個命名階段並記錄寫入的位元組數，顯示在側邊欄的「效能分析」並附加到 JSONL 追蹤檔
+PROFILE_ENABLED = profiling_requested(st.query_params.get("profile"))
+
+def get_profile() -> RerunProfile:
+    """目前這次重繪的效能分析 (widget callback 在頁面程式之前執行，因此存放在 session state)"""
+    profile = st.session_state.get('rerun_profile')
+    if profile is None or profile.total_ms is not None or profile.enabled != PROFILE_ENABLED:
+        profile = RerunProfile(PROFILE_ENABLED)
+        st.session_state['rerun_profile'] = profile
+    return profile
+
+PROFILE = get_profile()
+PROFILE.section("page_setup")
 
 # V8.9.3 CSS: 確保行動裝置的點擊目標大且佈局合理
 st.markdown("""
@@ -60,266 +108,66 @@ div[data-testid="stNumberInput"] {
 """, unsafe_allow_html=True)
 
 
-# --- 1. 核心資料模型 ---
-
-# 生寫真類型 (Pose)
-class Pose(Enum):
-    # (排序值, 顯示的日文名稱, 圖片檔案後綴名)
-    Y = (1, "ヨリ", "yori.jpg") 
-    C = (2, "チュウ", "chuu.jpg") 
-    H = (3, "ヒキ", "hiki.jpg") 
-    SPY = (10, "特殊ヨリ", "spyori.jpg") 
-    SPH = (11, "特殊ヒキ", "sphiki.jpg") 
-    
-    def __new__(cls, order, value, image_suffix):
-        obj = object().__new__(cls)
-        obj._value_ = value
-        obj.order = order
-        obj.image_suffix = image_suffix
-        return obj
-
-# 坂道團體 (Group)
-class Group(Enum):
-    NOGIZAKA = "乃木坂46" 
-    SAKURAZAKA = "櫻坂46" 
-    HINATAZAKA = "日向坂46" 
-
-# 固定的成員名單 (無變動) 
-ALL_MEMBERS = [
-    # 乃木坂46 (NOGIZAKA)
-    {"name": "伊藤理々杏", "group": Group.NOGIZAKA, "gen": 3}, {"name": "岩本蓮加", "group": Group.NOGIZAKA, "gen": 3},
-    {"name": "梅澤美波", "group": Group.NOGIZAKA, "gen": 3}, {"name": "吉田綾乃クリスティー", "group": Group.NOGIZAKA, "gen": 3},
-    {"name": "遠藤さくら", "group": Group.NOGIZAKA, "gen": 4}, {"name": "賀喜遥香", "group": Group.NOGIZAKA, "gen": 4},
-    {"name": "弓木奈於", "group": Group.NOGIZAKA, "gen": 4}, {"name": "金川紗耶", "group": Group.NOGIZAKA, "gen": 4},
-    {"name": "黒見明香", "group": Group.NOGIZAKA, "gen": 4}, {"name": "佐藤璃果", "group": Group.NOGIZAKA, "gen": 4},
-    {"name": "柴田柚菜", "group": Group.NOGIZAKA, "gen": 4}, {"name": "林瑠奈", "group": Group.NOGIZAKA, "gen": 4},
-    {"name": "田村真佑", "group": Group.NOGIZAKA, "gen": 4}, {"name": "筒井あやめ", "group": Group.NOGIZAKA, "gen": 4},
-    {"name": "井上和", "group": Group.NOGIZAKA, "gen": 5}, {"name": "一ノ瀬美空", "group": Group.NOGIZAKA, "gen": 5},
-    {"name": "小川彩", "group": Group.NOGIZAKA, "gen": 5}, {"name": "奥田いろは", "group": Group.NOGIZAKA, "gen": 5},
-    {"name": "川﨑桜", "group": Group.NOGIZAKA, "gen": 5}, {"name": "菅原咲月", "group": Group.NOGIZAKA, "gen": 5},
-    {"name": "冨里奈央", "group": Group.NOGIZAKA, "gen": 5}, {"name": "中西アルノ", "group": Group.NOGIZAKA, "gen": 5},
-    {"name": "五百城茉央", "group": Group.NOGIZAKA, "gen": 5}, {"name": "池田瑛紗", "group": Group.NOGIZAKA, "gen": 5}, 
-    {"name": "岡本姫奈", "group": Group.NOGIZAKA, "gen": 5}, 
-    {"name": "矢田萌華", "group": Group.NOGIZAKA, "gen": 6}, {"name": "瀬戸口心月", "group": Group.NOGIZAKA, "gen": 6},
-    {"name": "川端晃菜", "group": Group.NOGIZAKA, "gen": 6}, {"name": "海邉朱莉", "group": Group.NOGIZAKA, "gen": 6}, 
-    {"name": "長嶋凛桜", "group": Group.NOGIZAKA, "gen": 6}, {"name": "森平麗心", "group": Group.NOGIZAKA, "gen": 6}, 
-    {"name": "愛宕心響", "group": Group.NOGIZAKA, "gen": 6}, {"name": "大越ひなの", "group": Group.NOGIZAKA, "gen": 6},
-    {"name": "鈴木佑捺", "group": Group.NOGIZAKA, "gen": 6}, {"name": "小津玲奈", "group": Group.NOGIZAKA, "gen": 6},
-    {"name": "増田三莉音", "group": Group.NOGIZAKA, "gen": 6}, 
-    # 櫻坂46 (SAKURAZAKA)
-    {"name": "山﨑天", "group": Group.SAKURAZAKA, "gen": 2}, {"name": "遠藤光莉", "group": Group.SAKURAZAKA, "gen": 2},
-    {"name": "大園玲", "group": Group.SAKURAZAKA, "gen": 2}, {"name": "大沼晶保", "group": Group.SAKURAZAKA, "gen": 2},
-    {"name": "幸阪茉里乃", "group": Group.SAKURAZAKA, "gen": 2}, {"name": "武元唯衣", "group": Group.SAKURAZAKA, "gen": 2},
-    {"name": "田村保乃", "group": Group.SAKURAZAKA, "gen": 2}, {"name": "藤吉夏鈴", "group": Group.SAKURAZAKA, "gen": 2},
-    {"name": "増本綺良", "group": Group.SAKURAZAKA, "gen": 2}, {"name": "松田里奈", "group": Group.SAKURAZAKA, "gen": 2},
-    {"name": "森田ひかる", "group": Group.SAKURAZAKA, "gen": 2}, {"name": "守屋麗奈", "group": Group.SAKURAZAKA, "gen": 2},
-    {"name": "石森璃花", "group": Group.SAKURAZAKA, "gen": 3}, {"name": "遠藤理子", "group": Group.SAKURAZAKA, "gen": 3},
-    {"name": "小田倉麗奈", "group": Group.SAKURAZAKA, "gen": 3}, {"name": "小島凪紗", "group": Group.SAKURAZAKA, "gen": 3},
-    {"name": "中嶋優月", "group": Group.SAKURAZAKA, "gen": 3}, {"name": "的野美青", "group": Group.SAKURAZAKA, "gen": 3},
-    {"name": "向井純葉", "group": Group.SAKURAZAKA, "gen": 3}, {"name": "村井優", "group": Group.SAKURAZAKA, "gen": 3},
-    {"name": "山下瞳月", "group": Group.SAKURAZAKA, "gen": 3}, {"name": "谷口愛季", "group": Group.SAKURAZAKA, "gen": 3},
-    {"name": "村山美羽", "group": Group.SAKURAZAKA, "gen": 3},
-    {"name": "淺井戀乃未", "group": Group.SAKURAZAKA, "gen": 3},{"name": "稲熊ひな", "group": Group.SAKURAZAKA, "gen": 3},
-    {"name": "勝又春", "group": Group.SAKURAZAKA, "gen": 3},{"name": "佐藤愛桜", "group": Group.SAKURAZAKA, "gen": 3},
-    {"name": "中川智尋", "group": Group.SAKURAZAKA, "gen": 3},{"name": "松本和子", "group": Group.SAKURAZAKA, "gen": 3},
-    {"name": "目黒陽色", "group": Group.SAKURAZAKA, "gen": 3},{"name": "山川宇衣", "group": Group.SAKURAZAKA, "gen": 3},
-    {"name": "山田桃実", "group": Group.SAKURAZAKA, "gen": 3},
-    # 日向坂46 (HINATAZAKA)
-    {"name": "金村美玖", "group": Group.HINATAZAKA, "gen": 2},{"name": "小坂菜緒", "group": Group.HINATAZAKA, "gen": 2}, 
-    {"name": "松田好花", "group": Group.HINATAZAKA, "gen": 2}, 
-    {"name": "上村ひなの", "group": Group.HINATAZAKA, "gen": 3}, {"name": "髙橋未來虹", "group": Group.HINATAZAKA, "gen": 3}, 
-    {"name": "森本茉莉", "group": Group.HINATAZAKA, "gen": 3}, {"name": "山口陽世", "group": Group.HINATAZAKA, "gen": 3}, 
-    {"name": "清水理央", "group": Group.HINATAZAKA, "gen": 4}, {"name": "正源司陽子", "group": Group.HINATAZAKA, "gen": 4}, 
-    {"name": "平尾帆夏", "group": Group.HINATAZAKA, "gen": 4}, {"name": "藤嶌果歩", "group": Group.HINATAZAKA, "gen": 4},
-    {"name": "山下葉留花", "group": Group.HINATAZAKA, "gen": 4},{"name": "石塚瑶季", "group": Group.HINATAZAKA,"gen": 4}, 
-    {"name": "小西夏菜実", "group": Group.HINATAZAKA, "gen": 4},{"name": "竹内希来里", "group": Group.HINATAZAKA, "gen": 4}, 
-    {"name": "平岡海月", "group": Group.HINATAZAKA, "gen": 4},{"name": "宮地すみれ", "group": Group.HINATAZAKA, "gen": 4}, 
-    {"name": "渡辺莉奈", "group": Group.HINATAZAKA, "gen": 4}, 
-    {"name": "大田美月", "group": Group.HINATAZAKA, "gen": 5}, {"name": "大野愛実", "group": Group.HINATAZAKA, "gen": 5},
-    {"name": "片山紗希", "group": Group.HINATAZAKA, "gen": 5}, {"name": "蔵盛妃那乃", "group": Group.HINATAZAKA, "gen": 5},
-    {"name": "坂井新奈", "group": Group.HINATAZAKA, "gen": 5}, {"name": "佐藤優羽", "group": Group.HINATAZAKA, "gen": 5},
-    {"name": "下田衣珠季", "group": Group.HINATAZAKA, "gen": 5}, {"name": "高井俐香", "group": Group.HINATAZAKA, "gen": 5},
-    {"name": "鶴崎仁香", "group": Group.HINATAZAKA, "gen": 5}, {"name": "松尾桜", "group": Group.HINATAZAKA, "gen": 5},
-]
-# --- 動態系列管理：預設系列 (已清空所有預設系列) ---
-DEFAULT_SETS_BY_GROUP = {
-    Group.NOGIZAKA.value: {},
-    Group.SAKURAZAKA.value: {},
-    Group.HINATAZAKA.value: {}
-}
-
-class Member:
-    def __init__(self, name: str, group: Group, generation: int):
-        self.name = name
-        self.group = group
-        self.generation = generation
-        self.is_pinned = False
-    def __repr__(self):
-        return f"[{self.group.value}] {self.name}"
-
-class Photo:
-    # 圖片基底網址 (!!!請自行替換為您圖片的公開網址!!!)
-    BASE_IMAGE_URL = "https://example.com/images/sakamichi/" 
-
-    def __init__(self, set_name: str, member: Member, pose: Pose, owned_count: int = 0, custom_image_url: Optional[str] = None):
-        self.id = f"{member.name}_{set_name}_{pose.name}"
-        self.set_name = set_name
-        self.member = member
-        self.pose = pose
-        self.owned_count = owned_count
-        self.custom_image_url = custom_image_url
-        self.image_url = custom_image_url if custom_image_url else self._generate_image_url()
-
-    def _generate_image_url(self):
-        """生成圖片網址 (您需要確保您的圖片命名和上傳位置與此邏輯匹配)"""
-        member_name_for_url = self.member.name 
-        set_name_for_url = self.set_name.replace(" ", "_").replace(".", "") # 清理特殊字符
-        # 假設 URL 格式為: BASE_URL + 成員名_系列名_姿勢後綴.jpg
-        return f"{Photo.BASE_IMAGE_URL}{member_name_for_url}_{set_name_for_url}_{self.pose.image_suffix}"
-
-    def to_dict(self):
-        """轉換為字典，方便存儲為 JSON"""
-        return {
-            "id": self.id,
-            "set_name": self.set_name,
-            "member_name": self.member.name,
-            "group": self.member.group.value, 
-            "pose": self.pose.name,
-            "owned_count": self.owned_count,
-            "custom_image_url": self.custom_image_url 
-        }
-
 # --- 2. 資料儲存與載入函數 ---
 ALL_SETS_BY_GROUP: Dict[str, Dict] = {}
 
-def save_data(photos: List['Photo'], sets_by_group: Dict[str, Dict]):
-    """將收藏數據和系列定義保存到 JSON 文件"""
-    
-    collection_data = [photo.to_dict() for photo in photos]
-    sets_data = sets_by_group 
-    
-    data_to_save = {
-        "sets": sets_data,
-        "collection": collection_data
-    }
-    
-    with open(DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data_to_save, f, ensure_ascii=False, indent=4)
+def save_set_changes(group_value: str, set_name: str):
+    """將單一系列的定義和該系列的 Photo 交給背景寫入執行緒保存 (系列已刪除時一併刪除儲存中的資料)
 
-def load_data(initial_load=False):
-    """從 JSON 文件加載系列定義和收藏數據，並初始化 Photo 列表"""
-    
-    all_photos: List[Photo] = []
-    member_objects: Dict[str, Member] = {}
-    for member_info in ALL_MEMBERS:
-        name = member_info['name']
-        group_enum = member_info['group']    
-        gen = member_info['gen']
-        member = Member(name, group_enum, gen)
-        member_objects[name] = member
-            
+    V10.3 變更: 張數與自訂圖片以儲存中的最新值為準，不會覆蓋其他 session 剛寫入的變更。
+    V10.4 變更: 不在 callback 中直接寫檔 (由背景執行緒合併後寫入)。
+    V10.12 變更: 只送出變更的系列 (原本為 save_data: 每次送出全部系列與所有 Photo)。
+    """
+    set_info = st.session_state.all_sets_by_group.get(group_value, {}).get(set_name)
+    rows = [] if set_info is None else [
+        photo.to_dict() for photo in st.session_state.photo_set.for_set(set_name)
+        if photo.member.group.value == group_value
+    ]
+    with get_profile().phase("save_set_changes"), track_storage_write():
+        PERSISTENCE_WRITER.submit_set_patch(STORAGE, group_value, set_name, copy.deepcopy(set_info), rows)
+
+def save_photo_changes(photos: List['Photo'], field: str = "owned_count"):
+    """只儲存指定 Photo 的單一欄位變更 (JSON: 追加日誌；SQLite: 單列 UPDATE)"""
+    with get_profile().phase("save_photo_changes"), track_storage_write():
+        PERSISTENCE_WRITER.submit_photo_changes(STORAGE, [photo.to_dict() for photo in photos], field)
+
+def save_count_changes(changes: List[tuple]):
+    """V10.3 新增: 以增減量儲存張數變更 [(Photo, 增減量)]，多個 session 同時點擊也不會遺失"""
+    with get_profile().phase("save_count_changes"), track_storage_write():
+        PERSISTENCE_WRITER.submit_count_deltas(STORAGE, [(photo.to_dict(), delta) for photo, delta in changes])
+
+def record_operation(operation):
+    """V10.16 新增: 記錄一筆可復原的操作 (沒有變更時為 None，不記錄)"""
+    if operation is not None:
+        HISTORY.record(operation)
+        save_history()
+
+def save_history():
+    """歷史記錄的檔案寫入同樣交給背景寫入執行緒 (widget callback 不等待磁碟 I/O)"""
+    PERSISTENCE_WRITER.submit_history(STORAGE, HISTORY)
+
+@contextmanager
+def track_storage_write():
+    """寫入前確認資料是否已被其他 session 修改 (是則標記需要重新載入)，寫入後記錄新的版本"""
+    if PERSISTENCE_WRITER.version(STORAGE) != st.session_state.get('storage_version'):
+        st.session_state['storage_changed_elsewhere'] = True
+    yield
+    st.session_state['storage_version'] = PERSISTENCE_WRITER.version(STORAGE)
+
+def load_data(initial_load=False) -> PhotoCollection:
+    """從儲存後端加載系列定義和收藏數據，並初始化 Photo 集合 (含索引)
+
+    V10.7 變更: 載入邏輯移至 sakamichi_core.load_collection，這裡只同步 global 變數與 session state。
+    """
     global ALL_SETS_BY_GROUP
-    current_sets = {g: sets for g, sets in DEFAULT_SETS_BY_GROUP.items()}    
-    
-    saved_collection_data = []
+    with get_profile().phase("load_data"):
+        all_photos, ALL_SETS_BY_GROUP = load_collection(STORAGE, PERSISTENCE_WRITER)
 
-    if os.path.exists(DATA_FILE):
-        try:
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                full_data = json.load(f)
-            
-            if 'sets' in full_data and full_data['sets']:
-                current_sets = full_data['sets']
-                
-            if 'collection' in full_data:
-                saved_collection_data = full_data['collection']    
-                
-            
-        except json.JSONDecodeError:
-            print("Warning: JSON Decode Error, resetting sets to default.")
-        except Exception as e:
-            print(f"Warning: Unexpected error loading JSON: {e}")
-            
-    # 將讀取到的系列數據同步到 global 變數和 session state (初始化時)
-    ALL_SETS_BY_GROUP = current_sets
+    # 將讀取到的系列數據同步到 session state (初始化時)
     if initial_load:
-        st.session_state.all_sets_by_group = current_sets
-        st.session_state.all_sets_by_group_str = current_sets
-        
-    VALID_POSE_KEYS = set(p.name for p in Pose)
-
-    for group_value, sets in ALL_SETS_BY_GROUP.items():
-        try:
-            group_enum = Group(group_value)
-        except ValueError:
-            continue
+        st.session_state.all_sets_by_group = ALL_SETS_BY_GROUP
+        st.session_state.all_sets_by_group_str = ALL_SETS_BY_GROUP
 
-        for set_name, set_info in sets.items():
-            
-            members_with_poses = set_info.get("members_with_poses", {})
-            
-            # --- 處理舊結構 (如果 JSON 中只有 member_list 和 poses) ---
-            if not members_with_poses:
-                member_names_for_set = set_info.get("member_list", [])
-                pose_names_for_set = set_info.get("poses", [])
-                
-                if member_names_for_set and pose_names_for_set:
-                    # 如果是舊結構，轉換為新結構
-                    members_with_poses = {
-                        m_name: [p for p in pose_names_for_set if p in VALID_POSE_KEYS]
-                        for m_name in member_names_for_set
-                    }
-                    # 順便清理舊鍵，將新結構寫入 set_info (避免舊數據汙染)
-                    if "member_list" in set_info: del set_info["member_list"]
-                    if "poses" in set_info: del set_info["poses"]
-                    set_info["members_with_poses"] = members_with_poses
-
-            # --- 遍歷新結構並生成 Photo 物件 ---
-            for member_name, pose_names_for_member in members_with_poses.items():
-                
-                if member_name in member_objects and member_objects[member_name].group == group_enum:
-                    member = member_objects[member_name]
-                    
-                    for pose_name in pose_names_for_member:
-                        try:
-                            if pose_name in VALID_POSE_KEYS:
-                                pose = Pose[pose_name]    
-                                photo = Photo(set_name, member, pose)
-                                all_photos.append(photo)
-                            
-                        except KeyError:
-                            continue
-    
-    # Map saved status by photo ID
-    saved_status = {
-        d['id']: {
-            'owned_count': d['owned_count'],
-            'custom_image_url': d.get('custom_image_url')
-        } 
-        for d in saved_collection_data if 'owned_count' in d
-    }
-            
-    for photo in all_photos:
-        if photo.id in saved_status:
-            status = saved_status[photo.id]
-            photo.owned_count = status['owned_count']
-            
-            if status.get('custom_image_url'):
-                photo.custom_image_url = status['custom_image_url']
-                photo.image_url = status['custom_image_url']
-                
-            elif not status.get('custom_image_url') and photo.custom_image_url:
-                 photo.custom_image_url = None
-                 photo.image_url = photo._generate_image_url()
-        
-        elif photo.custom_image_url:
-             photo.custom_image_url = None
-             photo.image_url = photo._generate_image_url()
-
-    # 確保第一次載入後，如果有資料，則儲存一次，確保格式正確
-    if initial_load or not os.path.exists(DATA_FILE) or not any(ALL_SETS_BY_GROUP.values()):
-        save_data(all_photos, ALL_SETS_BY_GROUP)
-        
     return all_photos
 # -------------------- load_data 函數結束 --------------------
 
@@ -333,7 +181,7 @@ def update_photo_count_and_save():
     if not photo_id:
         return 
 
-    updated_photo = next((ph for ph in st.session_state.photo_set if ph.id == photo_id), None)
+    updated_photo = st.session_state.photo_set.get(photo_id)
     
     if updated_photo:
         # 1. 處理張數 (如果 number_input 被修改)
@@ -343,13 +191,15 @@ def update_photo_count_and_save():
         is_changed = (new_count != updated_photo.owned_count)
         
         if is_changed:
-            updated_photo.owned_count = new_count
-            save_data(st.session_state.photo_set, st.session_state.all_sets_by_group)
+            delta = st.session_state.photo_set.set_count(updated_photo, new_count)
+            save_count_changes([(updated_photo, delta)])
+            record_operation(count_operation(f"{photo_id} 張數 → {new_count}", [(updated_photo, delta)]))
             # 確保 session state 中的 number_input 值與實際儲存值一致
             st.session_state[f"count_{photo_id}_num_input"] = updated_photo.owned_count 
 
 def set_update_count_tracker(p_id):
     """設置追蹤器，確保 on_change 能找到正確的 ID。用於 number_input。"""
+    mark_photo_tap(p_id)
     st.session_state['last_updated_photo_id'] = p_id
     update_photo_count_and_save()
 
@@ -357,7 +207,7 @@ def set_update_count_tracker(p_id):
 def update_photo_file_and_save(photo_id: str):
     """V9.4 修正: 處理圖片檔案上傳的變更並儲存，只在 file_uploader 變動時呼叫。"""
     
-    updated_photo = next((ph for ph in st.session_state.photo_set if ph.id == photo_id), None)
+    updated_photo = st.session_state.photo_set.get(photo_id)
     
     if updated_photo is None:
         return 
@@ -373,65 +223,72 @@ def update_photo_file_and_save(photo_id: str):
             uploaded_file.seek(0) 
             bytes_data = uploaded_file.read()
             file_type = uploaded_file.type
-            base64_encoded_data = base64.b64encode(bytes_data).decode('utf-8')
-            new_custom_image_source = f"data:{file_type};base64,{base64_encoded_data}"
+            # V9.6 變更: 圖片存入 blob 目錄 (相同內容只存一份)，Photo 只保存參照
+            new_custom_image_source = store_image_blob(bytes_data, file_type)
         except Exception:
             # 在行動裝置上，檔案讀取失敗時靜默跳過，不影響其他操作
             return
 
     # 2. 只有當新圖片源存在且與舊的不同時才更新
     if new_custom_image_source is not None and new_custom_image_source != updated_photo.custom_image_url:
+        previous_image = updated_photo.custom_image_url
         updated_photo.custom_image_url = new_custom_image_source
-        updated_photo.image_url = new_custom_image_source
         
         # 保存數據
-        save_data(st.session_state.photo_set, st.session_state.all_sets_by_group)
+        save_photo_changes([updated_photo], field="custom_image_url")
+        record_operation(image_operation(f"{photo_id} 上傳圖片", updated_photo, previous_image))
         
 def set_update_file_tracker(p_id):
     """設置追蹤器，並呼叫專門處理檔案上傳的函數。"""
+    mark_photo_tap(p_id)
     update_photo_file_and_save(p_id)
 
 def decrement_count(p_id):
     """將數量減 1，只修改狀態並儲存，依賴 Streamlit 自動刷新。"""
+    mark_photo_tap(p_id)
     current_count = st.session_state.get(f"count_{p_id}_num_input", 0) 
     new_count = max(0, current_count - 1)
     
     if current_count != new_count:
         st.session_state[f"count_{p_id}_num_input"] = new_count
         
-        updated_photo = next((ph for ph in st.session_state.photo_set if ph.id == p_id), None)
+        updated_photo = st.session_state.photo_set.get(p_id)
         if updated_photo:
-            updated_photo.owned_count = new_count
-            save_data(st.session_state.photo_set, st.session_state.all_sets_by_group)
+            delta = st.session_state.photo_set.set_count(updated_photo, new_count)
+            save_count_changes([(updated_photo, delta)])
+            record_operation(count_operation(f"{p_id} ➖1", [(updated_photo, delta)]))
             # 移除 st.rerun()
 
 def increment_count(p_id):
     """將數量加 1，只修改狀態並儲存，依賴 Streamlit 自動刷新。"""
+    mark_photo_tap(p_id)
     current_count = st.session_state.get(f"count_{p_id}_num_input", 0)
     new_count = current_count + 1
     
     if current_count != new_count:
         st.session_state[f"count_{p_id}_num_input"] = new_count
         
-        updated_photo = next((ph for ph in st.session_state.photo_set if ph.id == p_id), None)
+        updated_photo = st.session_state.photo_set.get(p_id)
         if updated_photo:
-            updated_photo.owned_count = new_count
-            save_data(st.session_state.photo_set, st.session_state.all_sets_by_group)
+            delta = st.session_state.photo_set.set_count(updated_photo, new_count)
+            save_count_changes([(updated_photo, delta)])
+            record_operation(count_operation(f"{p_id} ➕1", [(updated_photo, delta)]))
             # 移除 st.rerun()
 
 def clear_custom_image(photo_id: str):
-    """清除自訂圖片的 Base64 數據，只修改狀態並儲存，依賴 Streamlit 自動刷新。"""
-    
-    updated_photo = next((ph for ph in st.session_state.photo_set if ph.id == photo_id), None)
+    """清除自訂圖片的參照 (blob 檔案可能被其他 Photo 共用，因此保留)，只修改狀態並儲存，依賴 Streamlit 自動刷新。"""
+    mark_photo_tap(photo_id)
+    updated_photo = st.session_state.photo_set.get(photo_id)
     
     if updated_photo and updated_photo.custom_image_url: 
+        previous_image = updated_photo.custom_image_url
         updated_photo.custom_image_url = None
-        updated_photo.image_url = updated_photo._generate_image_url()
         
         # 重置 file uploader 狀態在 Streamlit 中很複雜且不被推薦，
         # 我們依賴於 Streamlit 自動刷新後 file_uploader 自身狀態的重置。
         
-        save_data(st.session_state.photo_set, st.session_state.all_sets_by_group)
+        save_photo_changes([updated_photo], field="custom_image_url")
+        record_operation(image_operation(f"{photo_id} 清除圖片", updated_photo, previous_image))
         
         # 移除 st.rerun()
     else:
@@ -439,15 +296,16 @@ def clear_custom_image(photo_id: str):
 
 def set_count_to_zero(photo_id: str):
     """將指定的 Photo 張數設定為 0，只修改狀態並儲存，依賴 Streamlit 自動刷新。"""
-    
-    updated_photo = next((ph for ph in st.session_state.photo_set if ph.id == photo_id), None)
+    mark_photo_tap(photo_id)
+    updated_photo = st.session_state.photo_set.get(photo_id)
     
     if updated_photo and updated_photo.owned_count != 0: 
-        updated_photo.owned_count = 0
+        delta = st.session_state.photo_set.set_count(updated_photo, 0)
         
         st.session_state[f"count_{photo_id}_num_input"] = 0 
         
-        save_data(st.session_state.photo_set, st.session_state.all_sets_by_group)
+        save_count_changes([(updated_photo, delta)])
+        record_operation(count_operation(f"{photo_id} 清零張數", [(updated_photo, delta)]))
         
         # 移除 st.rerun()
     else:
@@ -462,27 +320,32 @@ def set_n_sets_collected(member_name: str, current_set_name: str, target_n: int)
         return
     
     target_count = max(1, target_n) 
-    photos_updated = 0
+    count_changes = []
     
-    for photo in st.session_state.photo_set:
-        if photo.member.name == member_name and photo.set_name == current_set_name:
-            
-            # 只有在當前數量少於目標數量時才更新
-            if photo.owned_count < target_count: 
-                photo.owned_count = target_count
-                photos_updated += 1
-            
-            # 無論是否更新，都確保 session state 同步
-            st.session_state[f"count_{photo.id}_num_input"] = photo.owned_count
+    for photo in st.session_state.photo_set.for_member_set(member_name, current_set_name):
+        # 只有在當前數量少於目標數量時才更新
+        if photo.owned_count < target_count: 
+            delta = st.session_state.photo_set.set_count(photo, target_count)
+            count_changes.append((photo, delta))
+        
+        # 無論是否更新，都確保 session state 同步
+        st.session_state[f"count_{photo.id}_num_input"] = photo.owned_count
             
-    if photos_updated > 0:
-        st.success(f"已將 **{member_name}** 在 **{current_set_name}** 中的 {photos_updated} 張生寫真數量設為 {target_count} (共 {target_n} 套)。")
-        save_data(st.session_state.photo_set, st.session_state.all_sets_by_group)
+    if count_changes:
+        st.success(f"已將 **{member_name}** 在 **{current_set_name}** 中的 {len(count_changes)} 張生寫真數量設為 {target_count} (共 {target_n} 套)。")
+        save_count_changes(count_changes)
+        record_operation(count_operation(f"{member_name} {current_set_name} 一鍵收齊 {target_n} 套", count_changes))
         # 移除 st.rerun()
         
     else:
         st.info(f"**{member_name}** 在 **{current_set_name}** 中的生寫真數量已達到或超過目標的 {target_n} 套，無需修改。")
 
+def set_active_member():
+    """記錄成員導覽列目前選中的成員 (只有該成員的生寫真會被繪製)"""
+    new_member_name = st.session_state.get("member_nav_radio")
+    if new_member_name:
+        st.session_state.active_member_name = new_member_name
+
 def toggle_pin_and_save(member_name: str):
     """切換成員的釘選狀態，依賴 Streamlit 自動刷新。"""
     
@@ -521,12 +384,6 @@ def load_edit_set_data():
         
         members_with_poses = current_info.get("members_with_poses", {})
         
-        if not members_with_poses and current_info.get("member_list") and current_info.get("poses"):
-            members_with_poses = {
-                m_name: current_info["poses"]
-                for m_name in current_info["member_list"]
-            }
-        
         st.session_state.edit_current_group_value = group_value 
         st.session_state.edit_current_members_with_poses = members_with_poses 
         
@@ -546,20 +403,23 @@ def load_edit_set_data():
         st.session_state.edit_selected_members = []
         
 def get_available_member_names(group_identifier: str) -> List[str]:
-    """獲取指定團體的現役成員名稱列表 (輸入為團體中文名稱字串)"""
-    
-    try:
-        group_enum = Group(group_identifier)
-    except ValueError:
-        return []
+    """獲取指定團體的現役成員名稱列表 (輸入為團體中文名稱字串)
 
-    available_members = sorted(list(m['name'] for m in ALL_MEMBERS if m['group'] == group_enum))
-    
-    return available_members
+    V10.17 變更: 直接取用成員名單預先排序的結果 (不存在的團體為空列表)。
+    """
+    return list(get_roster().member_names(group_identifier, sort=True))
+
+def apply_set_edit(group_value: str, set_name: str, previous_info: Optional[Dict], label: str):
+    """V10.12 新增: 系列定義變更後，只增刪該系列的 Photo 並儲存 (不重新讀檔，也不需要額外的 rerun)
 
-# 設置狀態標記，用於觸發主程式碼中的 reload
-def trigger_data_reload():
-    st.session_state['data_needs_reload'] = True
+    V10.16 變更: 同時記錄可復原的操作 (previous_info 為變更前的系列定義，新增時為 None)。
+    """
+    set_info = st.session_state.all_sets_by_group.get(group_value, {}).get(set_name)
+    record_operation(set_operation(label, st.session_state.photo_set, group_value, set_name, previous_info, set_info))
+    st.session_state.photo_set.apply_set_definition(
+        group_value, set_name, set_info.get("members_with_poses", {}) if set_info is not None else None)
+    st.session_state.all_sets_by_group_str = st.session_state.all_sets_by_group
+    save_set_changes(group_value, set_name)
 
 def add_new_set():
     """新增系列邏輯，設置狀態標記並保存。"""
@@ -588,19 +448,18 @@ def add_new_set():
     new_set_id = f"{group_key}|{new_set_name}"
     
     st.session_state.all_sets_by_group = current_sets
-    save_data(st.session_state.photo_set, st.session_state.all_sets_by_group)
+    apply_set_edit(group_key, new_set_name, None, f"新增系列 {new_set_name}")
     
     # 設定 UI 狀態，切換到編輯頁面
     st.session_state['tracking_set_id'] = new_set_id 
     st.session_state.manage_tab_state = "編輯/刪除現有系列" 
     st.session_state.manage_radio_tabs = "編輯/刪除現有系列" 
     st.session_state.edit_set_id = new_set_id 
+    # 編輯頁面的成員與姿勢改為新系列 (空白) 的內容
+    load_edit_set_data()
     
     if 'new_set_name_simple' in st.session_state:
         del st.session_state['new_set_name_simple']
-        
-    # **重點：設置需要刷新狀態**
-    trigger_data_reload()
 
 def edit_existing_set():
     """編輯系列邏輯，設置狀態標記並保存。"""
@@ -646,13 +505,12 @@ def edit_existing_set():
             "members_with_poses": new_members_with_poses 
         }
         
-        # 清理舊鍵 (兼容性處理)
-        if "member_list" in st.session_state.all_sets_by_group[group_value][set_name]:
-            del st.session_state.all_sets_by_group[group_value][set_name]["member_list"]
-        if "poses" in st.session_state.all_sets_by_group[group_value][set_name]:
-            del st.session_state.all_sets_by_group[group_value][set_name]["poses"]
-        
-        save_data(st.session_state.photo_set, st.session_state.all_sets_by_group)
+        apply_set_edit(group_value, set_name, current_info, f"編輯系列 {set_name}")
+        # 此系列重新加入的姿勢張數為 0，同步已存在的張數輸入框
+        for photo in st.session_state.photo_set.for_set(set_name):
+            count_key = f"count_{photo.id}_num_input"
+            if count_key in st.session_state:
+                st.session_state[count_key] = photo.owned_count
         
         st.success(f"成功更新系列: {set_name}！總共設定了 {len(new_members_with_poses)} 位成員的 {total_poses_count} 張生寫真項目。" + ("數據已變更並重新計算。" if is_changed else "數據未變更，介面已更新。"))
         
@@ -661,9 +519,6 @@ def edit_existing_set():
         # === V9.1 修正: 強制同步成員多選框的狀態 (解決更新後丟失成員選擇的問題) ===
         st.session_state['edit_selected_members'] = list(new_members_with_poses.keys())
         # =======================================================================
-        
-        # **重點：設置需要刷新狀態**
-        trigger_data_reload()
 
 def hard_reload_after_delete():
     """清除所有 Streamlit UI 狀態鍵，模擬頁面首次載入，並強制 st.rerun() (主程式碼中檢查此標記)"""
@@ -677,10 +532,7 @@ def hard_reload_after_delete():
     for key in set(keys_to_delete): 
         if key in st.session_state:
              del st.session_state[key]
-             
-    st.session_state.photo_set = load_data(initial_load=True)
-    st.session_state['final_reload_after_delete'] = True 
-    # 這裡的 st.rerun() 移到頂層檢查區塊
+    # V10.12 變更: 刪除時已直接移除該系列的 Photo，按鈕觸發的 rerun 即會顯示最新狀態，不再重新讀檔
 
 def delete_existing_set_on_edit():
     """刪除系列邏輯，設置狀態標記並保存。"""
@@ -694,9 +546,9 @@ def delete_existing_set_on_edit():
     
     if group_value in st.session_state.all_sets_by_group and set_name in st.session_state.all_sets_by_group[group_value]:
         
-        del st.session_state.all_sets_by_group[group_value][set_name]
+        deleted_info = st.session_state.all_sets_by_group[group_value].pop(set_name)
         
-        save_data(st.session_state.photo_set, st.session_state.all_sets_by_group)
+        apply_set_edit(group_value, set_name, deleted_info, f"刪除系列 {set_name}")
         
         if 'edit_set_id' in st.session_state:
             del st.session_state['edit_set_id']
@@ -710,6 +562,49 @@ def delete_existing_set_on_edit():
     else:
         st.error(f"找不到要刪除的系列: {set_name}。團體鍵 {group_value} 驗證失敗。")
 
+def apply_history_step(undo: bool):
+    """V10.16 新增: 復原 (undo=True) 或重做一筆操作，只套用並儲存該操作涉及的 Photo 與系列"""
+    operation = HISTORY.pop_undo() if undo else HISTORY.pop_redo()
+    if operation is None:
+        return
+    photos = st.session_state.photo_set
+    count_changes, image_changes, set_changes = apply_operation(
+        photos, st.session_state.all_sets_by_group, operation, undo)
+    if set_changes:
+        # 套用時記錄了被移除 Photo 的張數 (再次重做/復原時還原)
+        HISTORY.update_top(operation, undone=undo)
+    save_history()
+
+    if count_changes:
+        save_count_changes(count_changes)
+    if image_changes:
+        save_photo_changes(image_changes, field="custom_image_url")
+    changed_photos = [photo for photo, _ in count_changes]
+    for group_value, set_name in set_changes:
+        save_set_changes(group_value, set_name)
+        changed_photos.extend(photos.for_set(set_name))
+    if set_changes:
+        st.session_state.all_sets_by_group_str = st.session_state.all_sets_by_group
+        # 編輯中的系列被變更時重新載入編輯頁面的成員與姿勢 (被刪除時與刪除系列相同，清除選擇)
+        for group_value, set_name in set_changes:
+            if st.session_state.get('edit_set_id') != f"{group_value}|{set_name}":
+                continue
+            if set_name in st.session_state.all_sets_by_group.get(group_value, {}):
+                load_edit_set_data()
+            else:
+                del st.session_state['edit_set_id']
+    for photo in changed_photos:
+        count_key = f"count_{photo.id}_num_input"
+        if count_key in st.session_state:
+            st.session_state[count_key] = photo.owned_count
+    st.session_state['history_message'] = f"{'已復原' if undo else '已重做'}: {operation.get('label', '')}"
+
+def undo_last_operation():
+    apply_history_step(undo=True)
+
+def redo_last_operation():
+    apply_history_step(undo=False)
+
 # 獨立格式化函數
 def format_set_display(option_id: str) -> str:
     """格式化系列選項的顯示名稱：團體 - 系列名稱"""
@@ -722,41 +617,57 @@ def format_set_display(option_id: str) -> str:
     return option_id
 
 # 核心功能：計算收藏進度 (V8.9.5 增加姿勢細項統計)
-def calculate_progress(photos: List[Photo], selected_set: Optional[str] = None) -> Dict[str, Dict]:
-    """計算所有成員在指定系列中的收藏進度，並細化到每個姿勢的張數"""
-    progress: Dict[str, Dict] = {}
-    
-    # 建立所有可能的姿勢名稱到初始計數的映射
-    initial_pose_stats = {pose.name: 0 for pose in Pose}
-    
-    filtered_photos = photos
-    if selected_set and selected_set != "所有系列總計":
-        filtered_photos = [p for p in photos if p.set_name == selected_set]
-        
-    for photo in filtered_photos:
-        name = photo.member.name
-        if name not in progress:
-            # 初始化時，複製一份初始姿勢統計
-            progress[name] = {
-                'group': photo.member.group.value, 
-                'total_needed': 0, 
-                'total_collected': 0,
-                'pose_collected': initial_pose_stats.copy() 
-            }
-        
-        progress[name]['total_needed'] += 1 
-        progress[name]['total_collected'] += photo.owned_count 
-        
-        # V8.9.5 新增: 統計每個姿勢的收集張數
-        pose_name = photo.pose.name
-        progress[name]['pose_collected'][pose_name] += photo.owned_count
-        
-    return progress
+def sync_count_inputs():
+    """將已存在的張數輸入框同步為目前的張數 (重新載入資料後使用)"""
+    for photo in st.session_state.photo_set:
+        count_key = f"count_{photo.id}_num_input"
+        if count_key in st.session_state:
+            st.session_state[count_key] = photo.owned_count
+
+def switch_user_namespace():
+    """V10.3 新增: 切換收藏者 (更新網址參數，下一次 rerun 會載入該收藏者的資料)"""
+    user_name = st.session_state.get("user_namespace_input", "").strip()
+    if user_name:
+        st.query_params["user"] = user_name
+    elif "user" in st.query_params:
+        del st.query_params["user"]
+
+def import_uploaded_collection():
+    """V10.11 新增: 匯入上傳的 CSV / JSON Lines (逐列解析、最後儲存一次)，完成後重新載入收藏"""
+    uploaded_file = st.session_state.get("import_file")
+    if uploaded_file is None:
+        return
+    try:
+        fmt = format_from_path(uploaded_file.name)
+        uploaded_file.seek(0)
+        text_file = io.TextIOWrapper(uploaded_file, encoding='utf-8-sig', newline='')
+        try:
+            result = import_collection(STORAGE, text_file, fmt, PERSISTENCE_WRITER)
+        finally:
+            # 不關閉上傳的檔案 (由 file_uploader 管理)
+            text_file.detach()
+    except (ValueError, UnicodeDecodeError) as e:
+        st.session_state['import_result'] = {"error": str(e)}
+        return
+    st.session_state['import_result'] = result
+    st.session_state.photo_set = load_data(initial_load=True)
+    st.session_state.storage_version = PERSISTENCE_WRITER.version(STORAGE)
+    sync_count_inputs()
 
 # --- 5. 初始化數據 ---
 
+# V10.3 新增: 收藏者變更時，清除上一位收藏者的資料與畫面狀態
+if st.session_state.get('user_namespace', USER_NAMESPACE) != USER_NAMESPACE:
+    for key in list(st.session_state.keys()):
+        if key in ('photo_set', 'all_sets_by_group', 'all_sets_by_group_str', 'tracking_set_id',
+                   'active_member_name', 'member_nav_radio', 'edit_set_id', 'storage_version') \
+                or key.startswith("count_"):
+            del st.session_state[key]
+st.session_state['user_namespace'] = USER_NAMESPACE
+
 if 'photo_set' not in st.session_state:
-    st.session_state.photo_set = []
+    st.session_state.storage_version = PERSISTENCE_WRITER.version(STORAGE)
+    st.session_state.photo_set = PhotoCollection()
     st.session_state.all_sets_by_group = {}
     st.session_state.all_sets_by_group_str = {}
     
@@ -765,9 +676,10 @@ if 'photo_set' not in st.session_state:
     st.session_state.all_sets_by_group_str = ALL_SETS_BY_GROUP 
     
     if not st.session_state.photo_set and not st.session_state.all_sets_by_group:
-         st.session_state.photo_set = []
-         st.session_state.all_sets_by_group = DEFAULT_SETS_BY_GROUP 
-         st.session_state.all_sets_by_group_str = DEFAULT_SETS_BY_GROUP 
+         st.session_state.photo_set = PhotoCollection()
+         # 複製預設系列定義 (模組層級的常數由所有 session 共用，新增系列時不可直接修改)
+         st.session_state.all_sets_by_group = copy.deepcopy(DEFAULT_SETS_BY_GROUP)
+         st.session_state.all_sets_by_group_str = st.session_state.all_sets_by_group
 
 VALID_TABS = ["新增系列", "編輯/刪除現有系列"]
 if 'manage_tab_state' not in st.session_state or st.session_state.manage_tab_state not in VALID_TABS:
@@ -785,28 +697,16 @@ if 'edit_selected_members' not in st.session_state:
 if 'edit_set_id' not in st.session_state:
     st.session_state['edit_set_id'] = None
     
-if 'data_needs_reload' not in st.session_state:
-    st.session_state['data_needs_reload'] = False
-    
-if 'final_reload_after_delete' not in st.session_state:
-    st.session_state['final_reload_after_delete'] = False
-    
 # --- 5. 初始化數據 結束 ---
 
 # --- 6. 頂層強制刷新檢查 (V8.9.6 新增) ---
-# 只有在頂層檢查並呼叫 st.rerun() 才是有效的
-if st.session_state.get('data_needs_reload'):
-    # 重新載入數據，並更新 session state 中相關的系列列表
-    st.session_state.photo_set = load_data()
-    st.session_state.all_sets_by_group_str = st.session_state.all_sets_by_group
-    st.session_state['data_needs_reload'] = False # 重置標記，防止無限循環
-    st.rerun() # 在頂層呼叫 rerun
-    
-if st.session_state.get('final_reload_after_delete'):
-     st.session_state.photo_set = load_data()
-     st.session_state.all_sets_by_group_str = st.session_state.all_sets_by_group
-     st.session_state['final_reload_after_delete'] = False
-     st.rerun()
+# V10.12 變更: 系列的新增/編輯/刪除直接修改 Photo 集合，不再設定重新載入標記並呼叫 st.rerun()
+# V10.3 新增: 其他 session (或其他裝置) 修改了同一份收藏時，重新載入以顯示最新張數
+if st.session_state.pop('storage_changed_elsewhere', False) or \
+        st.session_state.get('storage_version') != PERSISTENCE_WRITER.version(STORAGE):
+    st.session_state.storage_version = PERSISTENCE_WRITER.version(STORAGE)
+    st.session_state.photo_set = load_data(initial_load=True)
+    sync_count_inputs()
 # --- 頂層強制刷新檢查 結束 ---
 
 
@@ -817,6 +717,15 @@ def draw_sidebar_controls():
     """
     with st.container():
         st.header("🎛️ 追蹤控制")
+
+        # V10.3 新增: 每位收藏者有獨立的收藏資料 (留空為預設收藏)
+        st.text_input(
+            "收藏者:",
+            value=USER_NAMESPACE,
+            key="user_namespace_input",
+            on_change=switch_user_namespace,
+            placeholder="留空使用預設收藏",
+        )
         
         all_set_options_ids = []
         current_sets_data = st.session_state.get('all_sets_by_group_str', {}) 
@@ -859,11 +768,84 @@ def draw_sidebar_controls():
         if not all_set_options_ids:
             st.warning("目前沒有任何系列，請在「管理系列」區塊新增。")
 
+        # V10.16 新增: 復原/重做 (滑鼠移到按鈕上顯示將復原/重做的操作)
+        col_undo, col_redo = st.columns(2)
+        with col_undo:
+            st.button("↩️ 復原", key="undo_button", on_click=undo_last_operation, disabled=not HISTORY.can_undo(),
+                      help=HISTORY.undo_label(), use_container_width=True)
+        with col_redo:
+            st.button("↪️ 重做", key="redo_button", on_click=redo_last_operation, disabled=not HISTORY.can_redo(),
+                      help=HISTORY.redo_label(), use_container_width=True)
+        history_message = st.session_state.pop('history_message', None)
+        if history_message:
+            st.caption(history_message)
+
+        # V10.14 新增: 跨所有系列的搜尋 (結果顯示在頁面上方)
+        st.text_input(
+            "🔍 搜尋生寫真:",
+            key="search_query",
+            placeholder="例: 井上和 ヒキ 0張 / 山下瞳月 / >=2",
+            help="以空白分隔條件: 成員、團體 (乃木坂)、期別 (5期)、姿勢 (ヒキ 或 H)、系列名稱、"
+                 "張數 (0張、>=2、未收藏、已收藏)。同類條件為「或」，不同類條件為「且」。",
+        )
+
+        # V10.11 新增: 匯入/匯出 (每張生寫真一列；匯出檔只在按下下載時才產生)
+        with st.expander("📦 匯入/匯出"):
+            col_csv, col_jsonl = st.columns(2)
+            for col, fmt in ((col_csv, "csv"), (col_jsonl, "jsonl")):
+                with col:
+                    st.download_button(
+                        f"下載 {fmt.upper()}",
+                        data=lambda fmt=fmt: export_text(STORAGE, fmt, PERSISTENCE_WRITER),
+                        file_name=f"sakamichi_collection.{fmt}",
+                        mime="text/csv" if fmt == "csv" else "application/jsonl",
+                        key=f"export_{fmt}",
+                        use_container_width=True,
+                    )
+            st.file_uploader(
+                "匯入 CSV / JSON Lines (張數以檔案為準)",
+                type=["csv", "jsonl", "ndjson"],
+                key="import_file",
+                on_change=import_uploaded_collection,
+            )
+            import_result = st.session_state.get('import_result')
+            if import_result and "error" in import_result:
+                st.error(f"匯入失敗: {import_result['error']}")
+            elif import_result:
+                st.success(f"已匯入 {import_result['imported']} 列，略過 {import_result['skipped']} 列")
+                for error in import_result['errors']:
+                    st.caption(error)
+
+        # V10.15 新增: 未收藏清單 (目前追蹤的系列，或所有系列)，由姿勢位元遮罩求得
+        if selected_set_name_for_app:
+            with st.expander("📝 未收藏清單"):
+                want_group = st.selectbox("團體:", ["全部"] + [group.value for group in Group], key="want_list_group")
+                want_list = st.session_state.photo_set.want_list(
+                    selected_set_name_for_app, None if want_group == "全部" else want_group)
+                st.caption(f"{selected_set_name_for_app}: 尚未擁有 {want_list_size(want_list)} 張")
+                if want_list:
+                    want_text = format_want_list_text(want_list)
+                    st.download_button("下載文字", data=want_text, file_name="sakamichi_want_list.txt",
+                                       mime="text/plain", key="want_list_txt", use_container_width=True)
+                    if find_font() is not None:
+                        st.download_button(
+                            "下載圖片",
+                            data=lambda want_list=want_list: render_want_list_png(want_list),
+                            file_name="sakamichi_want_list.png",
+                            mime="image/png",
+                            key="want_list_png",
+                            use_container_width=True,
+                        )
+                    else:
+                        st.caption("找不到日文字型，無法輸出圖片 (可用 SAKAMICHI_FONT 指定字型檔)。")
+                    st.code("\n".join(want_text.splitlines()[:30]), language=None)
+
         st.markdown("---")
         st.header("現役成員名單")
+        roster = get_roster()
         for group in Group:
             st.subheader(group.value)
-            group_members = [m['name'] for m in ALL_MEMBERS if m['group'] == group] 
+            group_members = roster.member_names(group)
             if group_members:
                 st.markdown(", ".join(group_members))
                 
@@ -871,58 +853,31 @@ def draw_sidebar_controls():
 # --- 側邊欄繪製函數結束 ---
 
 
-# --- 8. Streamlit APP 頁面佈局 ---
+# --- 7.5 追蹤頁面繪製函數 (V10.1 新增) ---
 
-st.set_page_config(layout="wide", page_title="坂道生寫真收藏")
-st.title("坂道生寫真收藏")
-st.markdown("---")
-
-
-# A. 側邊欄控制項 
-with st.sidebar:
-    selected_set = draw_sidebar_controls()
-
-
-# B. 收藏進度總覽 
-has_any_set = selected_set is not None
-
-st.header(f"生寫真總覽: {selected_set if selected_set else '無系列追蹤'}")
-
-if has_any_set:
-    progress_data = calculate_progress(st.session_state.photo_set, selected_set)
-
-    # V8.9.5 修正：定義所有可能的姿勢欄位
-    POSE_COLUMNS_MAP = {
-        pose.name: f"{pose.value} 張數" for pose in sorted(Pose, key=lambda p: p.order)
-    }
-    all_pose_keys = list(POSE_COLUMNS_MAP.keys())
-
-
-    progress_table_data = []
-    for name, data in progress_data.items():
-        collected = data['total_collected']
-        needed = data['total_needed']
-        
-        completion_percentage = (min(collected, needed) / needed) * 100 if needed > 0 else 0
-        
-        row = {
-            "成員": name,
-        }
-        
-        # 動態加入姿勢張數
-        for pose_key in all_pose_keys:
-            header_name = POSE_COLUMNS_MAP[pose_key]
-            collected_count = data['pose_collected'].get(pose_key, 0)
-            row[header_name] = collected_count
-            
-        # 加入總計和完成度
-        row["總擁有張數"] = collected
-        row["總目標張數"] = needed
-        row["完成度"] = completion_percentage
-        
-        progress_table_data.append(row)
+# V8.9.5 修正：定義所有可能的姿勢欄位
+POSE_COLUMNS_MAP = {
+    pose.name: f"{pose.value} 張數" for pose in sorted(Pose, key=lambda p: p.order)
+}
 
-    progress_table_data = sorted(progress_table_data, key=lambda x: x['完成度'], reverse=True)
+def draw_progress_table(selected_set: str):
+    """繪製收藏進度表"""
+    # V10.6 變更: 直接由分組統計的陣列建立表格欄位 (依完成度排序)，不再逐一建立每位成員的 dict
+    profile = get_profile()
+    with profile.phase("progress_summary"):
+        summary = st.session_state.photo_set.progress(selected_set)
+    catalog = st.session_state.photo_set.catalog
+
+    with profile.phase("progress_table_build"):
+        order = summary.sorted_member_indices()
+        progress_table_data = {}
+        if len(order):
+            progress_table_data["成員"] = [catalog.members[code] for code in order]
+            for pose_code, pose_key in enumerate(catalog.pose_names):
+                progress_table_data[POSE_COLUMNS_MAP[pose_key]] = summary.pose_collected[order, pose_code]
+            progress_table_data["總擁有張數"] = summary.collected[order]
+            progress_table_data["總目標張數"] = summary.needed[order]
+            progress_table_data["完成度"] = summary.completion[order]
 
     if progress_table_data:
         
@@ -960,14 +915,287 @@ if has_any_set:
         # 決定表格顯示的順序
         display_order = ["成員"] + list(POSE_COLUMNS_MAP.values()) + ["總擁有張數", "總目標張數", "完成度"]
         
+        with profile.phase("progress_table_render"):
+            st.dataframe(
+                progress_table_data,
+                column_config=column_config_dict,
+                column_order=display_order,
+                hide_index=True,
+            )
+        draw_progress_totals(summary, selected_set)
+    else:
+         st.info("所選系列沒有任何生寫真項目被定義，請在「管理系列」區塊進行設定。")
+
+def draw_progress_totals(summary, selected_set: str):
+    """各團體的合計 (所有系列總計時另列出各系列的合計)，直接取用分組統計的陣列"""
+    catalog = st.session_state.photo_set.catalog
+    group_codes = [code for code in range(len(summary.group_needed)) if summary.group_needed[code] > 0]
+    for column, group_code in zip(st.columns(len(group_codes) or 1), group_codes):
+        needed = int(summary.group_needed[group_code])
+        collected = int(summary.group_collected[group_code])
+        column.metric(catalog.groups[group_code], f"{collected} / {needed}",
+                      help="團體合計的擁有張數 / 目標張數")
+
+    if selected_set != "所有系列總計":
+        return
+    set_needed, set_collected = summary.set_totals()
+    set_codes = set_needed.nonzero()[0]
+    if not len(set_codes):
+        return
+    with st.expander("各系列進度"):
         st.dataframe(
-            progress_table_data,
-            column_config=column_config_dict,
-            column_order=display_order,
+            {
+                "系列": [catalog.sets[code] for code in set_codes],
+                "總擁有張數": set_collected[set_codes],
+                "總目標張數": set_needed[set_codes],
+                "完成度": [min(int(set_collected[code]), int(set_needed[code])) / int(set_needed[code]) * 100
+                        for code in set_codes],
+            },
+            column_config={
+                "總擁有張數": st.column_config.NumberColumn("總擁有張數", format="%d"),
+                "總目標張數": st.column_config.NumberColumn("總目標張數", format="%d"),
+                "完成度": st.column_config.ProgressColumn("完成度", format="%f%%", min_value=0, max_value=100),
+            },
             hide_index=True,
         )
-    else:
-         st.info("所選系列沒有任何生寫真項目被定義，請在「管理系列」區塊進行設定。")
+
+# 搜尋結果表格最多顯示的列數
+SEARCH_RESULT_LIMIT = 1000
+
+def draw_search_results(query_text: str):
+    """V10.14 新增: 顯示全域搜尋的結果 (由型錄的反向索引取交集，不逐一掃描 Photo)"""
+    with get_profile().phase("search"):
+        result = search_photos(st.session_state.photo_set, query_text)
+    if result.unknown_terms:
+        st.warning(f"無法辨識的條件 (已忽略): {' '.join(result.unknown_terms)}")
+    if not len(result):
+        st.info("沒有符合的生寫真。")
+        return
+
+    set_names = result.set_names()
+    st.markdown(f"符合 **{len(result)}** 張 (已擁有 {result.total_owned()} 張)，"
+                f"共 {len(set_names)} 個系列: {', '.join(set_names[:20])}{' …' if len(set_names) > 20 else ''}")
+    photos = result.photo_list(SEARCH_RESULT_LIMIT)
+    st.dataframe(
+        {
+            "系列": [photo.set_name for photo in photos],
+            "團體": [photo.member.group.value for photo in photos],
+            "成員": [photo.member.name for photo in photos],
+            "姿勢": [photo.pose.value for photo in photos],
+            "張數": [photo.owned_count for photo in photos],
+        },
+        hide_index=True,
+        use_container_width=True,
+    )
+    if len(result) > SEARCH_RESULT_LIMIT:
+        st.caption(f"只顯示前 {SEARCH_RESULT_LIMIT} 張，請加上條件縮小範圍。")
+
+def draw_member_header(member_name: str, selected_set: str):
+    """繪製成員標題與總擁有張數"""
+    current_collected = st.session_state.photo_set.progress(selected_set).collected_for(member_name)
+    st.markdown(f"## {member_name} - 總擁有張數: {current_collected} 張")
+
+def mark_photo_tap(photo_id: str):
+    """記錄卡片上的操作 (供 fragment 重繪時同步統計並量測點擊到重繪的時間)"""
+    st.session_state['pending_tap'] = {'photo_id': photo_id, 'started_at': time.perf_counter()}
+
+def record_render_timing(timing_name: str, started_at: float):
+    """記錄重繪耗時 (毫秒)，並更新側邊欄的顯示"""
+    timings = st.session_state.setdefault('render_timings', {})
+    timings[timing_name] = (time.perf_counter() - started_at) * 1000
+    draw_render_timings()
+
+def draw_render_timings():
+    timings = st.session_state.get('render_timings', {})
+    if timings:
+        TIMING_SLOT.caption(
+            f"⏱️ 點擊→卡片重繪: {timings.get('tap_to_render_ms', 0):.1f} ms ｜ "
+            f"整頁重繪: {timings.get('full_rerun_ms', 0):.1f} ms"
+        )
+
+def finish_profile(rerun_kind: str):
+    """V10.8 新增: 結束這次重繪的效能分析，附加到追蹤檔並更新側邊欄面板"""
+    profile = get_profile()
+    if not profile.enabled:
+        return
+    # 背景寫入在 callback 之後才完成，這裡列出上次面板更新後完成的寫入
+    writes, last_seq = PERSISTENCE_WRITER.writes_since(STORAGE, st.session_state.get('profile_write_seq', 0))
+    st.session_state['profile_write_seq'] = last_seq
+    profile.add_writes(writes)
+    record = profile.finish()
+    try:
+        append_trace(profile.as_record(rerun=rerun_kind, user=USER_NAMESPACE, photos=len(st.session_state.photo_set)))
+    except OSError as e:
+        print(f"Warning: Failed to append profile trace: {e}")
+    st.session_state['last_profile'] = dict(record, rerun=rerun_kind)
+    draw_profile_panel()
+
+def draw_profile_panel():
+    record = st.session_state.get('last_profile')
+    if not PROFILE_ENABLED or not record:
+        return
+    with PROFILE_SLOT.container():
+        with st.expander("🛠️ 效能分析", expanded=False):
+            st.caption(f"{'整頁重繪' if record['rerun'] == 'full' else '卡片重繪'}: {record['total_ms']:.1f} ms")
+            lines = [f"- `{name}`: {ms:.1f} ms" + (f" (x{record['calls'][name]})" if record['calls'][name] > 1 else "")
+                     for name, ms in sorted(record['phases_ms'].items(), key=lambda item: -item[1])]
+            st.markdown("\n".join(lines) if lines else "沒有記錄的階段")
+            st.caption(f"💾 寫入: {len(record['writes'])} 次，共 {record['bytes_written']:,} bytes")
+            for write in record['writes']:
+                st.caption(f"{write['kind']}: {write['rows']} 列，{write['bytes']:,} bytes，{write['ms']:.1f} ms")
+
+def card_image_source(image_source: str) -> str:
+    """V10.10 新增: 本機 blob 檔案改用圖片伺服器的固定網址 (瀏覽器以 ETag/Cache-Control 快取，重複瀏覽不再下載)
+
+    圖片伺服器未設定 (預設) 或無法使用時，仍交給 st.image 直接讀檔。
+    """
+    if not image_source.startswith(BLOB_DIR + os.sep):
+        return image_source
+    return image_url_for(image_source, st.context.headers.get("Host")) or image_source
+
+@st.fragment
+def draw_photo_card(photo_id: str, selected_set: str):
+    """單張生寫真卡片。以 fragment 包裝，卡片上的操作只會重繪此卡片與受影響的統計，不會重跑整頁"""
+    photo = st.session_state.photo_set.get(photo_id)
+    if photo is None:
+        return
+
+    caption = f"姿勢: **{photo.pose.value}**"
+    if selected_set == "所有系列總計":
+        caption += f" (ID: {photo.id})"
+
+    with st.container(border=True): 
+        
+        col_image, col_controls = st.columns([0.6, 0.4]) 
+        
+        with col_image:
+            # V10.9 變更: 顯示卡片大小的縮圖，原圖可在「新增/清除圖片」中查看
+            st.image(card_image_source(photo.thumbnail_url), caption=caption) 
+        
+        with col_controls:
+            # 數量輸入和 +/- 按鈕分三欄顯示
+            col_dec, col_input, col_inc = st.columns([0.25, 0.5, 0.25])
+            
+            count_key = f"count_{photo.id}_num_input"
+            if count_key not in st.session_state:
+                st.session_state[count_key] = photo.owned_count
+
+            with col_dec:
+                st.button(
+                    "➖", 
+                    key=f"dec_{photo.id}", 
+                    on_click=decrement_count, 
+                    args=(photo.id,),
+                    use_container_width=True,
+                    type="secondary"
+                )
+            
+            with col_input:
+                st.number_input(
+                    "張數", 
+                    min_value=0,
+                    value=st.session_state[count_key],
+                    key=count_key,
+                    step=1,
+                    # V9.4 修正: 使用專門的數量更新追蹤器
+                    on_change=set_update_count_tracker,
+                    args=(photo.id,),
+                    label_visibility="collapsed",
+                    help=f"張數: {photo.pose.value}", 
+                )
+                
+            with col_inc:
+                st.button(
+                    "➕", 
+                    key=f"inc_{photo.id}", 
+                    on_click=increment_count, 
+                    args=(photo.id,), 
+                    type="primary",
+                    use_container_width=True
+                )
+            
+            # V9.0 變更: 清零張數移到外面
+            st.button(
+                "清零張數", 
+                key=f"set_zero_{photo.id}", 
+                on_click=set_count_to_zero, 
+                args=(photo.id,), 
+                use_container_width=True,
+                type="secondary"
+            )
+            
+            with st.expander("新增/清除圖片"):
+                file_key = f"file_uploader_{photo.id}"
+                st.file_uploader(
+                    "上傳自訂圖片 (JPG/PNG)",
+                    type=["jpg", "jpeg", "png"],
+                    key=file_key,
+                    # V9.4 修正: 使用專門的檔案更新追蹤器
+                    on_change=set_update_file_tracker, 
+                    args=(photo.id,),
+                    accept_multiple_files=False,
+                    label_visibility="collapsed"
+                )
+                col_clear_img, col_original = st.columns([0.5, 0.5])
+                if photo.custom_image_url:
+                    with col_clear_img:
+                        st.button("清除圖片", key=f"clear_img_{photo.id}", on_click=clear_custom_image, args=(photo.id,), use_container_width=True)
+                    with col_original:
+                        show_original = st.toggle("顯示原圖", key=f"show_original_{photo.id}")
+                    if show_original:
+                        st.image(card_image_source(photo.image_url))
+
+    # 此卡片的操作觸發了重繪：只更新進度表與成員標題，不重跑整頁
+    pending_tap = st.session_state.get('pending_tap')
+    if pending_tap and pending_tap['photo_id'] == photo_id:
+        del st.session_state['pending_tap']
+        with PROGRESS_SLOT.container():
+            draw_progress_table(selected_set)
+        with MEMBER_HEADER_SLOT.container():
+            draw_member_header(photo.member.name, selected_set)
+        record_render_timing('tap_to_render_ms', pending_tap['started_at'])
+        finish_profile("fragment")
+# --- 追蹤頁面繪製函數結束 ---
+
+
+# --- 8. Streamlit APP 頁面佈局 ---
+
+st.set_page_config(layout="wide", page_title="坂道生寫真收藏")
+st.title("坂道生寫真收藏")
+st.markdown("---")
+
+
+# A. 側邊欄控制項 
+PROFILE.section("page_sidebar")
+with st.sidebar:
+    selected_set = draw_sidebar_controls()
+    TIMING_SLOT = st.empty()
+    draw_render_timings()
+    PROFILE_SLOT = st.empty()
+    draw_profile_panel()
+
+
+# A2. 全域搜尋 (V10.14 新增)
+search_query_text = st.session_state.get("search_query", "").strip()
+if search_query_text:
+    PROFILE.section("page_search")
+    st.header(f"🔍 搜尋: {search_query_text}")
+    draw_search_results(search_query_text)
+    st.markdown("---")
+
+
+# B. 收藏進度總覽 
+PROFILE.section("page_progress")
+has_any_set = selected_set is not None
+
+st.header(f"生寫真總覽: {selected_set if selected_set else '無系列追蹤'}")
+
+# V10.1 新增: 進度表放在固定的 placeholder 中，生寫真卡片 (fragment) 變更張數後可以只重繪這一塊
+PROGRESS_SLOT = st.empty()
+
+if has_any_set:
+    with PROGRESS_SLOT.container():
+        draw_progress_table(selected_set)
 else:
      st.info("請在下方的「管理系列」區塊新增至少一個系列來開始追蹤。")
 
@@ -976,19 +1204,19 @@ st.markdown("---")
 
 
 # C. 追蹤頁面
+PROFILE.section("page_member_cards")
 
 if selected_set:
     member_objects_dict = {}
-    current_set_photos = [p for p in st.session_state.photo_set if p.set_name == selected_set or selected_set == "所有系列總計"]
+    if selected_set == "所有系列總計":
+        current_set_photos = list(st.session_state.photo_set)
+    else:
+        current_set_photos = st.session_state.photo_set.for_set(selected_set)
 
-    for photo in st.session_state.photo_set:
+    for photo in current_set_photos:
         if photo.member.name not in member_objects_dict:
             member_objects_dict[photo.member.name] = photo.member
             
-    for photo in current_set_photos:
-        name = photo.member.name
-        photo.member.is_pinned = st.session_state.get(f"pin_{name}", False)
-        
     member_groups = {}
     for photo in current_set_photos:
         name = photo.member.name
@@ -998,7 +1226,8 @@ if selected_set:
 
     member_names = sorted(
         list(member_groups.keys()), 
-        key=lambda name: (not member_objects_dict[name].is_pinned, name)
+        # V10.2 變更: Member 物件由所有 session 共用，釘選狀態只從 session state 讀取
+        key=lambda name: (not st.session_state.get(f"pin_{name}", False), name)
     )
 
     if member_names:
@@ -1025,233 +1254,96 @@ if selected_set:
                         use_container_width=True
                     )
                 
-        st.markdown("<hr>", unsafe_allow_html=True) # 分隔釘選列和 Tab
-
-        tabs = st.tabs(member_names)
+        st.markdown("<hr>", unsafe_allow_html=True) # 分隔釘選列和成員導覽
+
+        # V10.0 變更: 以成員導覽列取代 st.tabs，只建立目前選中成員的生寫真元件
+        # (st.tabs 會為每位成員建立所有元件，即使畫面上只看得到一個分頁)
+        if st.session_state.get('active_member_name') not in member_names:
+            st.session_state.active_member_name = member_names[0]
+
+        st.radio(
+            "選擇成員",
+            member_names,
+            key="member_nav_radio",
+            index=member_names.index(st.session_state.active_member_name),
+            on_change=set_active_member,
+            horizontal=True,
+            label_visibility="collapsed"
+        )
 
-        for i, name in enumerate(member_names):
-            member = member_objects_dict[name]
-            with tabs[i]: 
-                
-                # --- V8.9.3: 批量操作使用 Expander ---
-                current_collected = progress_data.get(name, {}).get('total_collected', 0)
-                st.markdown(f"## {name} - 總擁有張數: {current_collected} 張")
+        name = st.session_state.active_member_name
+        member = member_objects_dict[name]
+        with st.container(): 
+            
+            # --- V8.9.3: 批量操作使用 Expander ---
+            MEMBER_HEADER_SLOT = st.empty()
+            with MEMBER_HEADER_SLOT.container():
+                draw_member_header(name, selected_set)
+            
+            with st.expander("批量新增總套數"):
                 
-                with st.expander("批量新增總套數"):
+                if selected_set == "所有系列總計":
+                    st.warning("⚠️ 在「所有系列總計」模式下無法進行一鍵收齊操作。請在側邊欄選擇特定系列。")
+                else:
+                    col_target, col_set_n = st.columns([0.5, 0.5])
                     
-                    if selected_set == "所有系列總計":
-                        st.warning("⚠️ 在「所有系列總計」模式下無法進行一鍵收齊操作。請在側邊欄選擇特定系列。")
-                    else:
-                        col_target, col_set_n = st.columns([0.5, 0.5])
+                    with col_target:
+                        st.number_input(
+                            "目標擁有套數 N",
+                            min_value=1,
+                            value=1,
+                            key=f"target_n_{name}", 
+                            step=1, 
+                        )
+                        target_n = st.session_state[f"target_n_{name}"]
                         
-                        with col_target:
-                            st.number_input(
-                                "目標擁有套數 N",
-                                min_value=1,
-                                value=1,
-                                key=f"target_n_{name}", 
-                                step=1, 
-                            )
-                            target_n = st.session_state[f"target_n_{name}"]
-                            
-                        with col_set_n:
-                            st.markdown("<br>", unsafe_allow_html=True) 
-                            st.button(
-                                f"一鍵收齊 {target_n} 套",
-                                key=f"set_n_btn_{name}", 
-                                on_click=set_n_sets_collected, 
-                                args=(name, selected_set, target_n), 
-                                type="primary",
-                                use_container_width=True
-                            )
-                            
-                st.markdown("---") 
-                # -------------------- 成員生寫真列表 --------------------
-                
-                photos_for_member = sorted(
-                    member_groups[name], 
-                    key=lambda p: (p.pose.order, p.set_name if selected_set == "所有系列總計" else "")
-                )
-
-                # 顯示
-                if selected_set == "所有系列總計":
-                    # 在 "所有系列總計" 模式下，按系列分組顯示
-                    grouped_by_set = {}
-                    for p in photos_for_member:
-                        if p.set_name not in grouped_by_set:
-                            grouped_by_set[p.set_name] = []
-                        grouped_by_set[p.set_name].append(p)
+                    with col_set_n:
+                        st.markdown("<br>", unsafe_allow_html=True) 
+                        st.button(
+                            f"一鍵收齊 {target_n} 套",
+                            key=f"set_n_btn_{name}", 
+                            on_click=set_n_sets_collected, 
+                            args=(name, selected_set, target_n), 
+                            type="primary",
+                            use_container_width=True
+                        )
                         
-                    set_names_sorted = sorted(grouped_by_set.keys())
+            st.markdown("---") 
+            # -------------------- 成員生寫真列表 --------------------
+            
+            photos_for_member = sorted(
+                member_groups[name], 
+                key=lambda p: (p.pose.order, p.set_name if selected_set == "所有系列總計" else "")
+            )
 
-                    for set_name in set_names_sorted:
-                        st.subheader(f"系列: {set_name}")
-                        
-                        for photo in grouped_by_set[set_name]:
-                            
-                            with st.container(border=True): 
-                                
-                                col_image, col_controls = st.columns([0.6, 0.4]) 
-                                
-                                with col_image:
-                                    st.image(photo.image_url, caption=f"姿勢: **{photo.pose.value}** (ID: {photo.id})") 
-                                
-                                with col_controls:
-                                    # 數量輸入和 +/- 按鈕分三欄顯示
-                                    col_dec, col_input, col_inc = st.columns([0.25, 0.5, 0.25])
-                                    
-                                    count_key = f"count_{photo.id}_num_input"
-                                    if count_key not in st.session_state:
-                                        st.session_state[count_key] = photo.owned_count
-
-                                    with col_dec:
-                                        st.button(
-                                            "➖", 
-                                            key=f"dec_{photo.id}", 
-                                            on_click=decrement_count, 
-                                            args=(photo.id,),
-                                            use_container_width=True,
-                                            type="secondary"
-                                        )
-                                    
-                                    with col_input:
-                                        st.number_input(
-                                            "張數", 
-                                            min_value=0,
-                                            value=st.session_state[count_key],
-                                            key=count_key,
-                                            step=1,
-                                            # V9.4 修正: 使用專門的數量更新追蹤器
-                                            on_change=set_update_count_tracker,
-                                            args=(photo.id,),
-                                            label_visibility="collapsed",
-                                            help=f"張數: {photo.pose.value}", 
-                                        )
-                                        
-                                    with col_inc:
-                                        st.button(
-                                            "➕", 
-                                            key=f"inc_{photo.id}", 
-                                            on_click=increment_count, 
-                                            args=(photo.id,), 
-                                            type="primary",
-                                            use_container_width=True
-                                        )
-                                    
-                                    # V9.0 變更: 清零張數移到外面
-                                    st.button(
-                                        "清零張數", 
-                                        key=f"set_zero_{photo.id}", 
-                                        on_click=set_count_to_zero, 
-                                        args=(photo.id,), 
-                                        use_container_width=True,
-                                        type="secondary"
-                                    )
-                                    
-                                    # 額外功能 (Expander 內容修改)
-                                    with st.expander("新增/清除圖片"):
-                                        file_key = f"file_uploader_{photo.id}"
-                                        st.file_uploader(
-                                            "上傳自訂圖片 (JPG/PNG)",
-                                            type=["jpg", "jpeg", "png"],
-                                            key=file_key,
-                                            # V9.4 修正: 使用專門的檔案更新追蹤器
-                                            on_change=set_update_file_tracker, 
-                                            args=(photo.id,),
-                                            accept_multiple_files=False,
-                                            label_visibility="collapsed"
-                                        )
-                                        col_clear_img, _ = st.columns([0.5, 0.5])
-                                        if photo.custom_image_url:
-                                            with col_clear_img:
-                                                st.button("清除圖片", key=f"clear_img_{photo.id}", on_click=clear_custom_image, args=(photo.id,), use_container_width=True)
-                                        
+            # 顯示
+            if selected_set == "所有系列總計":
+                # 在 "所有系列總計" 模式下，按系列分組顯示
+                grouped_by_set = {}
+                for p in photos_for_member:
+                    if p.set_name not in grouped_by_set:
+                        grouped_by_set[p.set_name] = []
+                    grouped_by_set[p.set_name].append(p)
+                    
+                set_names_sorted = sorted(grouped_by_set.keys())
 
+                for set_name in set_names_sorted:
+                    st.subheader(f"系列: {set_name}")
+                    
+                    for photo in grouped_by_set[set_name]:
+                        draw_photo_card(photo.id, selected_set)
 
-                else:
-                    # 單一系列模式下的行動友善佈局
-                    for photo in photos_for_member:
-                        
-                        with st.container(border=True): 
-                            
-                            col_image, col_controls = st.columns([0.6, 0.4]) 
-                            
-                            with col_image:
-                                st.image(photo.image_url, caption=f"姿勢: **{photo.pose.value}**") 
-                            
-                            with col_controls:
-                                col_dec, col_input, col_inc = st.columns([0.25, 0.5, 0.25])
-                                
-                                count_key = f"count_{photo.id}_num_input"
-                                if count_key not in st.session_state:
-                                    st.session_state[count_key] = photo.owned_count
-
-                                with col_dec:
-                                    st.button(
-                                        "➖", 
-                                        key=f"dec_{photo.id}", 
-                                        on_click=decrement_count, 
-                                        args=(photo.id,),
-                                        use_container_width=True,
-                                        type="secondary"
-                                    )
-                                
-                                with col_input:
-                                    st.number_input(
-                                        "張數", 
-                                        min_value=0,
-                                        value=st.session_state[count_key],
-                                        key=count_key,
-                                        step=1,
-                                        # V9.4 修正: 使用專門的數量更新追蹤器
-                                        on_change=set_update_count_tracker,
-                                        args=(photo.id,),
-                                        label_visibility="collapsed",
-                                        help=f"張數: {photo.pose.value}", 
-                                    )
-                                    
-                                with col_inc:
-                                    st.button(
-                                        "➕", 
-                                        key=f"inc_{photo.id}", 
-                                        on_click=increment_count, 
-                                        args=(photo.id,), 
-                                        type="primary",
-                                        use_container_width=True
-                                    )
-                                
-                                # V9.0 變更: 清零張數移到外面
-                                st.button(
-                                    "清零張數", 
-                                    key=f"set_zero_{photo.id}", 
-                                    on_click=set_count_to_zero, 
-                                    args=(photo.id,), 
-                                    use_container_width=True,
-                                    type="secondary"
-                                )
-                                
-                                with st.expander("新增/清除圖片"):
-                                    file_key = f"file_uploader_{photo.id}"
-                                    st.file_uploader(
-                                        "上傳自訂圖片 (JPG/PNG)",
-                                        type=["jpg", "jpeg", "png"],
-                                        key=file_key,
-                                        # V9.4 修正: 使用專門的檔案更新追蹤器
-                                        on_change=set_update_file_tracker, 
-                                        args=(photo.id,),
-                                        accept_multiple_files=False,
-                                        label_visibility="collapsed"
-                                    )
-                                    col_clear_img, _ = st.columns([0.5, 0.5])
-                                    if photo.custom_image_url:
-                                        with col_clear_img:
-                                            st.button("清除圖片", key=f"clear_img_{photo.id}", on_click=clear_custom_image, args=(photo.id,), use_container_width=True)
+            else:
+                # 單一系列模式下的行動友善佈局
+                for photo in photos_for_member:
+                    draw_photo_card(photo.id, selected_set)
 
 else:
     st.info("請先在「管理系列」區塊選擇或新增一個系列來開始追蹤。")
 
 st.markdown("---")
 # E. 管理系列介面
+PROFILE.section("page_manage_sets")
 
 st.header("⚙️ 管理系列")
 st.markdown("在這裡新增、編輯或刪除您要追蹤的生寫真系列。")
@@ -1339,13 +1431,20 @@ elif st.session_state.manage_tab_state == "編輯/刪除現有系列":
              
              # --- 成員選擇器 ---
              available_members = get_available_member_names(group_value)
-             
+
              current_selected_members = st.session_state.get('edit_selected_members', [])
-             
+
+             # V10.17 修正: 系列中已畢業 (不在現役名單) 的成員仍須列為選項，否則預設值不在選項中
+             retired_members = [name for name in current_selected_members if name not in available_members]
+
+             def format_member_display(member_name):
+                 return f"{member_name} (已畢業)" if member_name in retired_members else member_name
+
              selected_members_for_edit = st.multiselect(
                  f"選擇要配置姿勢的 {group_value} 成員:",
-                 options=available_members,
-                 default=current_selected_members, 
+                 options=available_members + retired_members,
+                 default=current_selected_members,
+                 format_func=format_member_display,
                  key="edit_selected_members", 
                  help="只有在這裡選擇的成員，才會顯示在下方進行姿勢設定。"
              )
@@ -1436,7 +1535,7 @@ elif st.session_state.manage_tab_state == "編輯/刪除現有系列":
                          delete_existing_set_on_edit()
                          st.session_state['confirm_delete'] = False
                      else:
-                         st.warning("⚠️ 再次點擊以確認刪除，此操作無法復原！")
+                         st.warning("⚠️ 再次點擊以確認刪除 (刪除後可在側邊欄按 ↩️ 復原 還原)。")
                          st.session_state['confirm_delete'] = True
                  else:
                      st.session_state['confirm_delete'] = False
@@ -1449,4 +1548,8 @@ elif st.session_state.manage_tab_state == "編輯/刪除現有系列":
                      st.session_state['reload_after_delete_trigger'] = False
             
     else:
-        st.info("目前沒有可編輯的系列，請在「新增系列」區塊建立一個。")
\ No newline at end of file
+        st.info("目前沒有可編輯的系列，請在「新增系列」區塊建立一個。")
+
+# V10.1 新增: 記錄整頁重繪耗時 (卡片 fragment 的局部重繪另外記錄為 tap_to_render_ms)
+record_render_timing('full_rerun_ms', RUN_STARTED_AT)
+finish_profile("full")
@@ -0,0 +1,494 @@
+"""坂道生寫真收藏追蹤器 - 精簡型錄 (不依賴 Streamlit)
+
+所有 Photo 的資料以欄位陣列保存，不再為每張生寫真建立一個帶 __dict__ 的物件:
+- 成員、系列以 InternTable 轉為小整數代碼，姿勢以固定順序的代碼表示
+- 張數存放在 array('i')，自訂圖片參照只為有設定的列保存 (稀疏 dict)
+- Photo ID 與圖片網址字串只在需要時才組出
+
+ID 格式與 Photo.id 相同: f"{成員}_{系列}_{姿勢}" (成員名稱與姿勢代碼不含底線，系列名稱可以含底線)。
+
+收藏進度由 summarize() 以 NumPy 對欄位陣列做分組加總 (bincount) 算出並依系列快取；之後的張數變更只以增減量
+更新快取中的統計 (O(1))，系列的新增/移除列只捨棄該系列的統計，所有系列總計同樣以增減量更新，不會重新掃描。
+搜尋使用 index() 的反向索引 (第一次搜尋時建立，之後隨新增/移除/張數變更同步更新)。
+每個 (系列, 成員) 另外以姿勢位元遮罩記錄「系列中有的姿勢」與「已擁有的姿勢」，未收藏清單只需位元運算。
+"""
+from array import array
+import sys
+from typing import Any, Callable, Collection, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+# 已移除 (可重複使用) 的列
+FREE_MEMBER_CODE = 0xFFFF
+
+
+class InternTable:
+    """字串 <-> 小整數代碼的對照表 (代碼一經分配就不會改變)"""
+
+    def __init__(self, values: Sequence[str] = ()):
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+        for value in values:
+            self.code(value)
+
+    def code(self, value: str) -> int:
+        """取得代碼 (不存在時新增)"""
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(sys.intern(value))
+        return code
+
+    def lookup(self, value: str) -> Optional[int]:
+        """取得代碼 (不存在時回傳 None，不新增)"""
+        return self.codes.get(value)
+
+    def __getitem__(self, code: int) -> str:
+        return self.values[code]
+
+    def __len__(self):
+        return len(self.values)
+
+
+class PhotoCatalog:
+    """以欄位陣列保存的 Photo 型錄，每張生寫真以一個列索引 (slot) 表示"""
+
+    def __init__(self, pose_names: Sequence[str]):
+        self.members = InternTable()
+        self.sets = InternTable()
+        self.groups = InternTable()
+        # 成員代碼 -> 團體代碼
+        self.member_group_codes = array('B')
+        self.pose_names = list(pose_names)
+        self.pose_codes_by_name = {name: code for code, name in enumerate(self.pose_names)}
+
+        # 各列的欄位 (列索引相同即為同一張生寫真)
+        self.member_codes = array('H')
+        self.set_codes = array('I')
+        self.pose_codes = array('B')
+        self.counts = array('i')
+        self.custom_refs: Dict[int, str] = {}
+
+        # (系列, 成員) -> 各姿勢的列索引 (保留加入順序)；系列 -> 成員 (保留加入順序)
+        self._slots_by_pair: Dict[int, array] = {}
+        self._members_by_set: Dict[int, Dict[int, None]] = {}
+        # (系列, 成員) -> 姿勢位元遮罩 (第 n 位為姿勢代碼 n): 系列中有的姿勢 / 已擁有 (張數 > 0) 的姿勢
+        self._defined_masks: Dict[int, int] = {}
+        self._owned_masks: Dict[int, int] = {}
+        self._free_slots: List[int] = []
+        self._size = 0
+
+        # summarize() 的結果 (系列名稱 -> 統計，None 為所有系列總計)，隨新增/移除/張數變更同步更新
+        self._summaries: Dict[Optional[str], "ProgressSummary"] = {}
+        # 反向索引 (搜尋用)，第一次呼叫 index() 時才建立
+        self._index: Optional["CatalogIndex"] = None
+
+    def __len__(self):
+        return self._size
+
+    @staticmethod
+    def _pair_key(set_code: int, member_code: int) -> int:
+        return (set_code << 16) | member_code
+
+    def add(self, member_name: str, set_name: str, pose_name: str,
+            owned_count: int = 0, custom_ref: Optional[str] = None, group_name: str = "") -> int:
+        """加入一張生寫真並回傳列索引 (已存在時更新張數與圖片參照)"""
+        slot = self.find(member_name, set_name, pose_name)
+        if slot is None:
+            member_code = self.members.code(member_name)
+            if member_code == len(self.member_group_codes):
+                self.member_group_codes.append(self.groups.code(group_name))
+            set_code = self.sets.code(set_name)
+            pose_code = self.pose_codes_by_name[pose_name]
+            if self._free_slots:
+                slot = self._free_slots.pop()
+                self.member_codes[slot] = member_code
+                self.set_codes[slot] = set_code
+                self.pose_codes[slot] = pose_code
+            else:
+                slot = len(self.counts)
+                self.member_codes.append(member_code)
+                self.set_codes.append(set_code)
+                self.pose_codes.append(pose_code)
+                self.counts.append(0)
+            pair_key = self._pair_key(set_code, member_code)
+            if pair_key not in self._slots_by_pair:
+                self._slots_by_pair[pair_key] = array('I')
+                self._members_by_set.setdefault(set_code, {})[member_code] = None
+            self._slots_by_pair[pair_key].append(slot)
+            self._defined_masks[pair_key] = self._defined_masks.get(pair_key, 0) | (1 << pose_code)
+            self._size += 1
+            if self._index is not None:
+                self._index.add(slot, member_code, set_code, pose_code, 0)
+            self._update_summaries(slot, 1, 0)
+
+        self.set_count(slot, owned_count)
+        self.set_custom_ref(slot, custom_ref)
+        return slot
+
+    def set_count(self, slot: int, owned_count: int):
+        if self._index is not None:
+            self._index.move_count(slot, self.counts[slot], owned_count)
+        self._update_summaries(slot, 0, owned_count - self.counts[slot])
+        self.counts[slot] = owned_count
+        self._update_owned_mask(slot, owned_count)
+
+    def _update_summaries(self, slot: int, needed_delta: int, count_delta: int):
+        """以增減量更新快取中包含此列的統計 (列的新增/移除會捨棄該系列的統計，下次 summarize() 時重新計算)"""
+        if not self._summaries or not (needed_delta or count_delta):
+            return
+        set_name = self.sets[self.set_codes[slot]]
+        if needed_delta:
+            self._summaries.pop(set_name, None)
+        for summary in (self._summaries.get(None), self._summaries.get(set_name)):
+            if summary is not None:
+                summary.apply_delta(self.member_codes[slot], self.pose_codes[slot], needed_delta, count_delta)
+
+    def _update_owned_mask(self, slot: int, owned_count: int):
+        pair_key = self._pair_key(self.set_codes[slot], self.member_codes[slot])
+        bit = 1 << self.pose_codes[slot]
+        owned = self._owned_masks.get(pair_key, 0)
+        owned = owned | bit if owned_count > 0 else owned & ~bit
+        if owned:
+            self._owned_masks[pair_key] = owned
+        else:
+            self._owned_masks.pop(pair_key, None)
+
+    def remove(self, slot: int):
+        """移除列 (列索引之後可被重複使用)"""
+        set_code, member_code = self.set_codes[slot], self.member_codes[slot]
+        if member_code == FREE_MEMBER_CODE:
+            return
+        pair_key = self._pair_key(set_code, member_code)
+        slots = self._slots_by_pair[pair_key]
+        slots.remove(slot)
+        self._update_owned_mask(slot, 0)
+        if slots:
+            self._defined_masks[pair_key] &= ~(1 << self.pose_codes[slot])
+        else:
+            del self._defined_masks[pair_key]
+            del self._slots_by_pair[pair_key]
+            members = self._members_by_set[set_code]
+            del members[member_code]
+            if not members:
+                del self._members_by_set[set_code]
+        if self._index is not None:
+            self._index.remove(slot, member_code, set_code, self.pose_codes[slot], self.counts[slot])
+        self._update_summaries(slot, -1, -self.counts[slot])
+
+        self.member_codes[slot] = FREE_MEMBER_CODE
+        self.counts[slot] = 0
+        self.custom_refs.pop(slot, None)
+        self._free_slots.append(slot)
+        self._size -= 1
+
+    def find(self, member_name: str, set_name: str, pose_name: str) -> Optional[int]:
+        """以 (成員, 系列, 姿勢) 取得列索引"""
+        member_code = self.members.lookup(member_name)
+        set_code = self.sets.lookup(set_name)
+        pose_code = self.pose_codes_by_name.get(pose_name)
+        if member_code is None or set_code is None or pose_code is None:
+            return None
+        for slot in self._slots_by_pair.get(self._pair_key(set_code, member_code), ()):
+            if self.pose_codes[slot] == pose_code:
+                return slot
+        return None
+
+    def find_id(self, photo_id: str) -> Optional[int]:
+        """以 Photo ID 取得列索引"""
+        parts = split_photo_id(photo_id)
+        return self.find(*parts) if parts else None
+
+    def photo_id(self, slot: int) -> str:
+        return f"{self.member_name(slot)}_{self.set_name(slot)}_{self.pose_name(slot)}"
+
+    def member_name(self, slot: int) -> str:
+        return self.members[self.member_codes[slot]]
+
+    def set_name(self, slot: int) -> str:
+        return self.sets[self.set_codes[slot]]
+
+    def pose_name(self, slot: int) -> str:
+        return self.pose_names[self.pose_codes[slot]]
+
+    def set_custom_ref(self, slot: int, custom_ref: Optional[str]):
+        if custom_ref:
+            self.custom_refs[slot] = custom_ref
+        else:
+            self.custom_refs.pop(slot, None)
+
+    def slots(self) -> Iterator[int]:
+        """依系列、成員、姿勢的加入順序列出所有列"""
+        for set_code, members in self._members_by_set.items():
+            for member_code in members:
+                yield from self._slots_by_pair[self._pair_key(set_code, member_code)]
+
+    def slots_for_member_set(self, member_name: str, set_name: str) -> List[int]:
+        member_code = self.members.lookup(member_name)
+        set_code = self.sets.lookup(set_name)
+        if member_code is None or set_code is None:
+            return []
+        return list(self._slots_by_pair.get(self._pair_key(set_code, member_code), ()))
+
+    def slots_for_set(self, set_name: str) -> List[int]:
+        set_code = self.sets.lookup(set_name)
+        slots: List[int] = []
+        for member_code in self._members_by_set.get(set_code, {}) if set_code is not None else ():
+            slots.extend(self._slots_by_pair[self._pair_key(set_code, member_code)])
+        return slots
+
+    def summarize(self, set_name: Optional[str] = None) -> "ProgressSummary":
+        """指定系列 (None 為所有系列總計) 的收藏進度 (快取，之後的變更會同步更新到回傳的統計)"""
+        summary = self._summaries.get(set_name)
+        if summary is None:
+            summary = self._summaries[set_name] = ProgressSummary(self, set_name)
+        return summary
+
+    def pose_masks(self, member_name: str, set_name: str) -> Tuple[int, int]:
+        """(系列中有的姿勢, 已擁有的姿勢) 位元遮罩"""
+        member_code = self.members.lookup(member_name)
+        set_code = self.sets.lookup(set_name)
+        if member_code is None or set_code is None:
+            return 0, 0
+        pair_key = self._pair_key(set_code, member_code)
+        return self._defined_masks.get(pair_key, 0), self._owned_masks.get(pair_key, 0)
+
+    def missing_masks(self, set_codes: Optional[Iterable[int]] = None,
+                      group_code: Optional[int] = None) -> Iterator[Tuple[int, int, int]]:
+        """依系列、成員的加入順序列出尚未擁有的姿勢 (系列代碼, 成員代碼, 位元遮罩)，已收齊的組合略過"""
+        defined_masks, owned_masks = self._defined_masks, self._owned_masks
+        for set_code in (self._members_by_set if set_codes is None else set_codes):
+            for member_code in self._members_by_set.get(set_code, ()):
+                if group_code is not None and self.member_group_codes[member_code] != group_code:
+                    continue
+                pair_key = (set_code << 16) | member_code
+                missing = defined_masks[pair_key] & ~owned_masks.get(pair_key, 0)
+                if missing:
+                    yield set_code, member_code, missing
+
+    def pose_names_for_mask(self, mask: int) -> List[str]:
+        """位元遮罩中的姿勢代碼名稱 (依姿勢代碼順序)"""
+        return [name for code, name in enumerate(self.pose_names) if mask >> code & 1]
+
+    def index(self) -> "CatalogIndex":
+        """搜尋用的反向索引 (第一次呼叫時建立)"""
+        if self._index is None:
+            self._index = CatalogIndex(self)
+        return self._index
+
+    def nbytes(self) -> int:
+        """欄位陣列本身佔用的位元組數 (不含索引與對照表)"""
+        return sum(column.itemsize * len(column)
+                   for column in (self.member_codes, self.set_codes, self.pose_codes, self.counts))
+
+
+def split_photo_id(photo_id: str) -> Optional[Tuple[str, str, str]]:
+    """將 Photo ID 拆為 (成員, 系列, 姿勢)"""
+    member_name, sep, rest = photo_id.partition("_")
+    set_name, sep2, pose_name = rest.rpartition("_")
+    if not sep or not sep2:
+        return None
+    return member_name, set_name, pose_name
+
+
+class CatalogIndex:
+    """型錄欄位的反向索引: 代碼 -> 列索引集合，查詢以集合交集求得，不需逐列掃描
+
+    - by_member / by_set / by_pose: 成員、系列、姿勢代碼 -> 列
+    - by_count: 張數 -> 列 (張數的種類很少，範圍條件只需合併幾個集合)
+
+    團體、期別等成員屬性由呼叫端換算成成員代碼 (合併這些成員的集合)。
+    """
+
+    def __init__(self, catalog: PhotoCatalog):
+        self.by_member: Dict[int, Set[int]] = {}
+        self.by_set: Dict[int, Set[int]] = {}
+        self.by_pose: Dict[int, Set[int]] = {}
+        self.by_count: Dict[int, Set[int]] = {}
+        for slot in catalog.slots():
+            self.add(slot, catalog.member_codes[slot], catalog.set_codes[slot], catalog.pose_codes[slot],
+                     catalog.counts[slot])
+
+    def add(self, slot: int, member_code: int, set_code: int, pose_code: int, count: int):
+        self.by_member.setdefault(member_code, set()).add(slot)
+        self.by_set.setdefault(set_code, set()).add(slot)
+        self.by_pose.setdefault(pose_code, set()).add(slot)
+        self.by_count.setdefault(count, set()).add(slot)
+
+    def remove(self, slot: int, member_code: int, set_code: int, pose_code: int, count: int):
+        for postings, code in ((self.by_member, member_code), (self.by_set, set_code),
+                               (self.by_pose, pose_code), (self.by_count, count)):
+            slots = postings.get(code)
+            if slots is not None:
+                slots.discard(slot)
+                if not slots:
+                    del postings[code]
+
+    def move_count(self, slot: int, old_count: int, new_count: int):
+        if old_count == new_count:
+            return
+        slots = self.by_count.get(old_count)
+        if slots is not None:
+            slots.discard(slot)
+            if not slots:
+                del self.by_count[old_count]
+        self.by_count.setdefault(new_count, set()).add(slot)
+
+    @staticmethod
+    def _union(postings: Dict[int, Set[int]], codes: Iterable[int]) -> Set[int]:
+        matched = [postings[code] for code in codes if code in postings]
+        if len(matched) == 1:
+            return matched[0]
+        return set().union(*matched)
+
+    def query(self, member_codes: Optional[Collection[int]] = None, set_codes: Optional[Collection[int]] = None,
+              pose_codes: Optional[Collection[int]] = None,
+              count_filter: Optional[Callable[[int], bool]] = None) -> Set[int]:
+        """符合所有條件的列 (同一欄位的多個代碼為「或」，不同欄位為「且」；None 表示不限制)
+
+        回傳的集合可能是索引本身，呼叫端不得修改。
+        """
+        candidates = []
+        if member_codes is not None:
+            candidates.append(self._union(self.by_member, member_codes))
+        if set_codes is not None:
+            candidates.append(self._union(self.by_set, set_codes))
+        if pose_codes is not None:
+            candidates.append(self._union(self.by_pose, pose_codes))
+        if count_filter is not None:
+            candidates.append(self._union(self.by_count, [count for count in self.by_count if count_filter(count)]))
+        if not candidates:
+            return self._union(self.by_set, list(self.by_set))
+        # 由最小的集合開始取交集
+        candidates.sort(key=len)
+        return candidates[0].intersection(*candidates[1:]) if len(candidates) > 1 else candidates[0]
+
+
+class ProgressSummary:
+    """收藏進度的分組統計 (各欄位為 NumPy 陣列，索引為成員代碼)
+
+    - needed / collected: 各成員的目標張數 (姿勢數) 與擁有張數
+    - pose_needed / pose_collected: 成員 x 姿勢 的目標張數與擁有張數
+    - completion: 完成度 (%)，擁有張數超過目標時以 100% 計
+    - group_needed / group_collected: 各團體代碼的合計
+    - set_totals(): 各系列代碼的 (目標張數, 擁有張數)，需要時才計算
+
+    建立後由 PhotoCatalog 以 apply_delta() 同步更新 (不重新分組加總)。
+    """
+
+    def __init__(self, catalog: PhotoCatalog, set_name: Optional[str] = None):
+        import numpy as np  # 只有在需要統計時才載入 NumPy
+
+        member_count = len(catalog.members)
+        pose_count = len(catalog.pose_names)
+        member_codes = np.frombuffer(catalog.member_codes, dtype=np.uint16)
+        pose_codes = np.frombuffer(catalog.pose_codes, dtype=np.uint8)
+        counts = np.frombuffer(catalog.counts, dtype=np.int32)
+
+        # 指定系列時只取該系列的列；所有系列總計時略過已移除的列
+        if set_name is not None:
+            slots = np.array(catalog.slots_for_set(set_name), dtype=np.intp)
+            member_codes, pose_codes, counts = member_codes[slots], pose_codes[slots], counts[slots]
+        elif catalog._free_slots:
+            live = member_codes != FREE_MEMBER_CODE
+            member_codes, pose_codes, counts = member_codes[live], pose_codes[live], counts[live]
+
+        # 以 (成員, 姿勢) 為鍵做兩次分組加總，成員合計再由姿勢合計相加而得
+        keys = member_codes.astype(np.intp) * pose_count + pose_codes
+        cells = member_count * pose_count
+        self.pose_needed = np.bincount(keys, minlength=cells).astype(np.int64).reshape(member_count, pose_count)
+        self.pose_collected = np.bincount(keys, weights=counts.astype(np.float64),
+                                          minlength=cells).astype(np.int64).reshape(member_count, pose_count)
+        self.needed = self.pose_needed.sum(axis=1)
+        self.collected = self.pose_collected.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.completion = np.where(self.needed > 0,
+                                       np.minimum(self.collected, self.needed) / self.needed * 100, 0.0)
+
+        # 成員數量的小陣列，複製一份保存 (保留 frombuffer 的檢視會使型錄陣列無法再 append)
+        group_codes = np.frombuffer(catalog.member_group_codes, dtype=np.uint8).copy()
+        self.group_needed = np.bincount(group_codes, weights=self.needed, minlength=len(catalog.groups)).astype(np.int64)
+        self.group_collected = np.bincount(group_codes, weights=self.collected,
+                                           minlength=len(catalog.groups)).astype(np.int64)
+
+        self.catalog = catalog
+        self.member_group_codes = group_codes
+        # 有目標張數的成員 (依成員代碼，即第一次出現的順序)
+        self.member_indices = np.flatnonzero(self.needed)
+
+    def apply_delta(self, member_code: int, pose_code: int, needed_delta: int, count_delta: int):
+        """一列的目標張數 (新增/移除列) 與擁有張數的增減量，只更新該成員與其團體的數值"""
+        if member_code >= len(self.needed) or self.catalog.member_group_codes[member_code] >= len(self.group_needed):
+            self._grow()
+        group_code = self.member_group_codes[member_code]
+        if needed_delta:
+            was_needed = self.needed[member_code] > 0
+            self.pose_needed[member_code, pose_code] += needed_delta
+            self.needed[member_code] += needed_delta
+            self.group_needed[group_code] += needed_delta
+            if was_needed != (self.needed[member_code] > 0):
+                self.member_indices = self.needed.nonzero()[0]
+        if count_delta:
+            self.pose_collected[member_code, pose_code] += count_delta
+            self.collected[member_code] += count_delta
+            self.group_collected[group_code] += count_delta
+        needed = self.needed[member_code]
+        self.completion[member_code] = min(self.collected[member_code], needed) / needed * 100 if needed > 0 else 0.0
+
+    def _grow(self):
+        """型錄加入新成員或團體後，將各陣列補齊到目前的成員數與團體數 (新增的部分為 0)"""
+        import numpy as np
+
+        catalog = self.catalog
+        extra_members = len(catalog.members) - len(self.needed)
+        extra_groups = len(catalog.groups) - len(self.group_needed)
+        self.pose_needed = np.pad(self.pose_needed, ((0, extra_members), (0, 0)))
+        self.pose_collected = np.pad(self.pose_collected, ((0, extra_members), (0, 0)))
+        self.needed = np.pad(self.needed, (0, extra_members))
+        self.collected = np.pad(self.collected, (0, extra_members))
+        self.completion = np.pad(self.completion, (0, extra_members))
+        self.group_needed = np.pad(self.group_needed, (0, extra_groups))
+        self.group_collected = np.pad(self.group_collected, (0, extra_groups))
+        self.member_group_codes = np.frombuffer(catalog.member_group_codes, dtype=np.uint8).copy()
+
+    def __len__(self):
+        return len(self.member_indices)
+
+    def set_totals(self):
+        """各系列代碼的 (目標張數, 擁有張數) 陣列 (不受 set_name 篩選影響)"""
+        import numpy as np
+
+        catalog = self.catalog
+        set_codes = np.frombuffer(catalog.set_codes, dtype=np.uint32)
+        counts = np.frombuffer(catalog.counts, dtype=np.int32)
+        if catalog._free_slots:
+            live = np.frombuffer(catalog.member_codes, dtype=np.uint16) != FREE_MEMBER_CODE
+            set_codes, counts = set_codes[live], counts[live]
+        needed = np.bincount(set_codes, minlength=len(catalog.sets))
+        collected = np.bincount(set_codes, weights=counts.astype(np.float64),
+                                minlength=len(catalog.sets)).astype(np.int64)
+        return needed, collected
+
+    def collected_for(self, member_name: str) -> int:
+        """指定成員的擁有張數 (不在此範圍內時為 0)"""
+        member_code = self.catalog.members.lookup(member_name)
+        # 統計建立後才加入型錄的成員不在陣列範圍內
+        return int(self.collected[member_code]) if member_code is not None and member_code < len(self.collected) else 0
+
+    def sorted_member_indices(self):
+        """依完成度由高到低排列的成員代碼 (同分時保留原順序)"""
+        import numpy as np
+
+        return self.member_indices[np.argsort(-self.completion[self.member_indices], kind='stable')]
+
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        """轉換為 {成員: {'group', 'total_needed', 'total_collected', 'pose_collected'}} (舊版 calculate_progress 格式)"""
+        catalog = self.catalog
+        return {
+            catalog.members[code]: {
+                'group': catalog.groups[self.member_group_codes[code]],
+                'total_needed': int(self.needed[code]),
+                'total_collected': int(self.collected[code]),
+                'pose_collected': {pose_name: int(self.pose_collected[code, pose_code])
+                                   for pose_code, pose_name in enumerate(catalog.pose_names)},
+            }
+            for code in self.member_indices
+        }
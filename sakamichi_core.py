@@ -0,0 +1,416 @@
+"""坂道生寫真收藏追蹤器 - 核心邏輯 (不依賴 Streamlit)
+
+資料模型 (Pose, Photo, PhotoCollection；Group、Member 與成員名單見 sakamichi_roster)、圖片 blob、儲存設定、
+載入/儲存與收藏進度統計都在這裡，可直接在腳本、測試與效能量測中使用:
+
+    from sakamichi_core import create_user_storage, load_collection, calculate_progress
+    photos, sets_by_group = load_collection(create_user_storage(""))
+    print(calculate_progress(photos, "所有系列總計"))
+
+sakamichi_app.py 只負責 Streamlit 介面。NumPy 只在第一次計算收藏進度時才載入。
+"""
+import base64
+import copy
+import hashlib
+import os
+import re
+import uuid
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+
+from sakamichi_catalog import PhotoCatalog, ProgressSummary
+from sakamichi_images import get_thumbnail_pool
+from sakamichi_roster import Group, Member, get_roster
+from sakamichi_storage import BackgroundWriter, StorageBackend, create_storage
+
+# --- 0. 設定檔案路徑 ---
+DATA_FILE = "sakamichi_collection_data.json"
+
+# V9.5 新增: 變更日誌 (append-only)。張數/圖片變更只追加一行小記錄，不再重寫整個 DATA_FILE
+USE_CHANGE_JOURNAL = True
+JOURNAL_FILE = "sakamichi_collection_data.journal.jsonl"
+# 日誌超過此大小 (bytes) 時，合併回 DATA_FILE 並清空日誌
+JOURNAL_COMPACT_BYTES = 256 * 1024
+
+# V9.8 新增: 儲存後端 ("json" 為原本的 DATA_FILE；"sqlite" 第一次啟動時會自動匯入既有的 JSON)
+STORAGE_BACKEND = os.environ.get("SAKAMICHI_STORAGE", "json")
+SQLITE_FILE = "sakamichi_collection_data.sqlite3"
+
+# V10.3 新增: 多位收藏者。指定收藏者名稱時使用 USERS_DIR/<名稱>/ 下的獨立資料檔，
+# 未指定時沿用上方的預設檔案。每個資料位置有各自的寫入鎖，不同收藏者互不阻塞。
+USERS_DIR = "sakamichi_users"
+
+# V9.6 新增: 上傳的自訂圖片以內容雜湊命名存放在此目錄，JSON 只保存 "blob:<雜湊>.<副檔名>" 參照
+BLOB_DIR = "sakamichi_blobs"
+BLOB_REF_PREFIX = "blob:"
+
+# 「所有系列總計」選項 (收藏進度不篩選系列)
+ALL_SETS_OPTION = "所有系列總計"
+
+
+def normalize_user_namespace(user_name: str) -> str:
+    """收藏者名稱轉為可用於目錄名稱的字串 (空字串為預設收藏)"""
+    return re.sub(r"[^\w\-]", "_", user_name.strip())[:64]
+
+
+def create_user_storage(namespace: str, backend: Optional[str] = None) -> StorageBackend:
+    """建立指定收藏者的儲存後端 (空字串為預設收藏)"""
+    base_dir = os.path.join(USERS_DIR, namespace) if namespace else ""
+    if base_dir:
+        os.makedirs(base_dir, exist_ok=True)
+    return create_storage(
+        backend or STORAGE_BACKEND, os.path.join(base_dir, DATA_FILE),
+        journal_file=os.path.join(base_dir, JOURNAL_FILE) if USE_CHANGE_JOURNAL else None,
+        sqlite_file=os.path.join(base_dir, SQLITE_FILE),
+        compact_bytes=JOURNAL_COMPACT_BYTES,
+    )
+
+
+# --- 1. 核心資料模型 ---
+
+# 生寫真類型 (Pose)
+class Pose(Enum):
+    # (排序值, 顯示的日文名稱, 圖片檔案後綴名)
+    Y = (1, "ヨリ", "yori.jpg") 
+    C = (2, "チュウ", "chuu.jpg") 
+    H = (3, "ヒキ", "hiki.jpg") 
+    SPY = (10, "特殊ヨリ", "spyori.jpg") 
+    SPH = (11, "特殊ヒキ", "sphiki.jpg") 
+    
+    def __new__(cls, order, value, image_suffix):
+        obj = object().__new__(cls)
+        obj._value_ = value
+        obj.order = order
+        obj.image_suffix = image_suffix
+        return obj
+
+# V10.17 變更: 團體與成員名單移至 sakamichi_roster (名單由 roster.json 載入，不再寫在程式中)
+# --- 動態系列管理：預設系列 (已清空所有預設系列) ---
+DEFAULT_SETS_BY_GROUP = {
+    Group.NOGIZAKA.value: {},
+    Group.SAKURAZAKA.value: {},
+    Group.HINATAZAKA.value: {}
+}
+
+class Photo:
+    """V10.5 變更: Photo 改為 PhotoCollection 型錄中一列的輕量檢視 (__slots__，不保存自己的欄位)
+
+    ID 與圖片網址只在讀取時組出；張數請透過 PhotoCollection.set_count 修改 (同步更新進度統計)。
+    """
+    __slots__ = ('_collection', '_slot')
+
+    # 圖片基底網址 (!!!請自行替換為您圖片的公開網址!!!)
+    BASE_IMAGE_URL = "https://example.com/images/sakamichi/" 
+
+    def __init__(self, collection: 'PhotoCollection', slot: int):
+        self._collection = collection
+        self._slot = slot
+
+    def __eq__(self, other):
+        return isinstance(other, Photo) and self._collection is other._collection and self._slot == other._slot
+
+    def __hash__(self):
+        return hash((id(self._collection), self._slot))
+
+    def __repr__(self):
+        return f"Photo({self.id}, owned_count={self.owned_count})"
+
+    @property
+    def id(self) -> str:
+        return self._collection.catalog.photo_id(self._slot)
+
+    @property
+    def set_name(self) -> str:
+        return self._collection.catalog.set_name(self._slot)
+
+    @property
+    def member(self) -> Member:
+        return self._collection.member_objects[self._collection.catalog.member_name(self._slot)]
+
+    @property
+    def pose(self) -> Pose:
+        return Pose[self._collection.catalog.pose_name(self._slot)]
+
+    @property
+    def owned_count(self) -> int:
+        return self._collection.catalog.counts[self._slot]
+
+    @property
+    def custom_image_url(self) -> Optional[str]:
+        return self._collection.catalog.custom_refs.get(self._slot)
+
+    @custom_image_url.setter
+    def custom_image_url(self, image_ref: Optional[str]):
+        self._collection.catalog.set_custom_ref(self._slot, image_ref)
+
+    @property
+    def image_url(self) -> str:
+        custom_image_url = self.custom_image_url
+        return resolve_image_ref(custom_image_url) if custom_image_url else self._generate_image_url()
+
+    @property
+    def thumbnail_url(self) -> str:
+        """V10.9 新增: 卡片顯示用的圖片 (自訂圖片使用縮圖，縮圖尚未產生時暫時使用原圖)"""
+        custom_image_url = self.custom_image_url
+        if custom_image_url and custom_image_url.startswith(BLOB_REF_PREFIX):
+            original_path = resolve_image_ref(custom_image_url)
+            return get_thumbnail_pool().thumbnail_for(original_path) or original_path
+        return self.image_url
+
+    def _generate_image_url(self):
+        """生成圖片網址 (您需要確保您的圖片命名和上傳位置與此邏輯匹配)"""
+        member_name_for_url = self.member.name 
+        set_name_for_url = self.set_name.replace(" ", "_").replace(".", "") # 清理特殊字符
+        # 假設 URL 格式為: BASE_URL + 成員名_系列名_姿勢後綴.jpg
+        return f"{Photo.BASE_IMAGE_URL}{member_name_for_url}_{set_name_for_url}_{self.pose.image_suffix}"
+
+    def to_dict(self):
+        """轉換為字典，方便存儲為 JSON"""
+        return {
+            "id": self.id,
+            "set_name": self.set_name,
+            "member_name": self.member.name,
+            "group": self.member.group.value, 
+            "pose": self.pose.name,
+            "owned_count": self.owned_count,
+            "custom_image_url": self.custom_image_url 
+        }
+
+class PhotoCollection:
+    """V9.7 新增: Photo 集合，提供以 ID、(成員, 系列)、系列、團體查詢，取代每次點擊時的線性搜尋
+
+    V10.5 變更: 資料存放在精簡型錄 (PhotoCatalog: 代碼 + 陣列)，查詢時才建立 Photo 檢視。
+    """
+
+    def __init__(self, member_objects: Optional[Dict[str, Member]] = None):
+        self.catalog = PhotoCatalog([pose.name for pose in Pose])
+        self.member_objects: Dict[str, Member] = dict(member_objects or {})
+
+    def __iter__(self):
+        return (Photo(self, slot) for slot in self.catalog.slots())
+
+    def __len__(self):
+        return len(self.catalog)
+
+    def __contains__(self, photo_id: str):
+        return self.catalog.find_id(photo_id) is not None
+
+    def add(self, set_name: str, member: Member, pose: Pose, owned_count: int = 0,
+            custom_image_url: Optional[str] = None) -> Photo:
+        """加入 Photo (相同 ID 會先移除舊的) 並回傳其檢視"""
+        self.remove(f"{member.name}_{set_name}_{pose.name}")
+        self.member_objects.setdefault(member.name, member)
+        slot = self.catalog.add(member.name, set_name, pose.name, owned_count, custom_image_url, member.group.value)
+        return Photo(self, slot)
+
+    def remove(self, photo_id: str) -> bool:
+        """移除指定 ID 的 Photo，回傳是否存在"""
+        slot = self.catalog.find_id(photo_id)
+        if slot is None:
+            return False
+        self.catalog.remove(slot)
+        return True
+
+    def set_count(self, photo: Photo, new_count: int) -> int:
+        """更新 Photo 張數，回傳張數增減量"""
+        delta = new_count - photo.owned_count
+        self.catalog.set_count(photo._slot, new_count)
+        return delta
+
+    def apply_set_definition(self, group_value: str, set_name: str,
+                             members_with_poses: Optional[Dict[str, List[str]]]) -> Tuple[int, int]:
+        """V10.12 新增: 依系列定義增刪此系列的 Photo (None 代表刪除整個系列)，回傳 (新增數, 移除數)
+
+        只處理這個系列 (與團體) 的列，耗時與系列大小成正比；保留的 Photo 張數與自訂圖片不變，
+        新增的 Photo 張數為 0。不屬於該團體的成員與不存在的姿勢會被忽略 (與載入時相同)。
+        """
+        all_members = get_member_objects()
+        wanted: List[Tuple[Member, Pose]] = []
+        for member_name, pose_names in (members_with_poses or {}).items():
+            member = self.member_objects.get(member_name) or all_members.get(member_name)
+            if member is None or member.group.value != group_value:
+                continue
+            wanted.extend((member, Pose[pose_name]) for pose_name in pose_names if pose_name in Pose.__members__)
+
+        wanted_keys = {(member.name, pose.name) for member, pose in wanted}
+        existing_keys = set()
+        removed = 0
+        for slot in self.catalog.slots_for_set(set_name):
+            member = self.member_objects.get(self.catalog.member_name(slot))
+            if member is None or member.group.value != group_value:
+                continue
+            key = (member.name, self.catalog.pose_name(slot))
+            if key in wanted_keys:
+                existing_keys.add(key)
+            else:
+                self.catalog.remove(slot)
+                removed += 1
+
+        added = 0
+        for member, pose in wanted:
+            if (member.name, pose.name) not in existing_keys:
+                self.add(set_name, member, pose)
+                existing_keys.add((member.name, pose.name))
+                added += 1
+        return added, removed
+
+    def progress(self, selected_set: Optional[str] = None) -> ProgressSummary:
+        """V10.6 新增: 指定系列 (或「所有系列總計」) 的收藏進度，以 NumPy 對欄位陣列分組加總"""
+        if not selected_set or selected_set == ALL_SETS_OPTION:
+            selected_set = None
+        return self.catalog.summarize(selected_set)
+
+    def want_list(self, selected_set: Optional[str] = None,
+                  group_value: Optional[str] = None) -> Dict[str, Dict[str, List[Pose]]]:
+        """V10.15 新增: 尚未擁有的生寫真 {系列: {成員: [姿勢...]}} (依系列、成員的加入順序，已收齊的成員不列出)
+
+        由型錄隨張數變更同步維護的姿勢位元遮罩求得 (系列中有的姿勢 & ~已擁有的姿勢)，不需逐張檢查張數。
+        """
+        catalog = self.catalog
+        set_codes = None
+        if selected_set and selected_set != ALL_SETS_OPTION:
+            set_code = catalog.sets.lookup(selected_set)
+            set_codes = [set_code] if set_code is not None else []
+        group_code = catalog.groups.lookup(group_value) if group_value else None
+        if group_value and group_code is None:
+            return {}
+
+        poses_by_mask: Dict[int, List[Pose]] = {}
+        wanted: Dict[str, Dict[str, List[Pose]]] = {}
+        for set_code, member_code, mask in catalog.missing_masks(set_codes, group_code):
+            poses = poses_by_mask.get(mask)
+            if poses is None:
+                poses = poses_by_mask[mask] = sorted((Pose[name] for name in catalog.pose_names_for_mask(mask)),
+                                                     key=lambda pose: pose.order)
+            wanted.setdefault(catalog.sets[set_code], {})[catalog.members[member_code]] = poses
+        return wanted
+
+    def get(self, photo_id: str) -> Optional[Photo]:
+        slot = self.catalog.find_id(photo_id)
+        return Photo(self, slot) if slot is not None else None
+
+    def for_member_set(self, member_name: str, set_name: str) -> List[Photo]:
+        return [Photo(self, slot) for slot in self.catalog.slots_for_member_set(member_name, set_name)]
+
+    def for_set(self, set_name: str) -> List[Photo]:
+        return [Photo(self, slot) for slot in self.catalog.slots_for_set(set_name)]
+
+
+# --- 2. 資料儲存與載入函數 ---
+# 上傳檔案的 MIME 類型對應的副檔名
+IMAGE_EXTENSIONS = {"image/jpeg": "jpg", "image/jpg": "jpg", "image/png": "png"}
+
+def store_image_blob(data: bytes, mime_type: str) -> str:
+    """將圖片以內容雜湊 (SHA-256) 命名存入 BLOB_DIR，相同內容只存一份，回傳參照字串
+
+    V10.9 變更: 存入後在背景產生卡片用的縮圖 (不等待完成)。
+    """
+    extension = IMAGE_EXTENSIONS.get(mime_type, "bin")
+    file_name = f"{hashlib.sha256(data).hexdigest()}.{extension}"
+    blob_path = os.path.join(BLOB_DIR, file_name)
+
+    if not os.path.exists(blob_path):
+        os.makedirs(BLOB_DIR, exist_ok=True)
+        # 先寫到暫存檔再改名，避免中斷時留下不完整的圖片 (暫存檔名唯一: 多個工作階段可能同時上傳同一張圖片)
+        tmp_path = f"{blob_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, blob_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    get_thumbnail_pool().submit(blob_path)
+    return BLOB_REF_PREFIX + file_name
+
+def resolve_image_ref(image_ref: str) -> str:
+    """將 custom_image_url 轉換為 st.image 可以顯示的來源 (blob 參照 -> 本機檔案路徑)"""
+    if image_ref.startswith(BLOB_REF_PREFIX):
+        return os.path.join(BLOB_DIR, image_ref[len(BLOB_REF_PREFIX):])
+    return image_ref
+
+def migrate_inline_image(image_ref: Optional[str]) -> Optional[str]:
+    """舊版資料的 Base64 data URI 轉存為 blob，回傳新的參照 (非 data URI 則原樣回傳)"""
+    if not image_ref or not image_ref.startswith("data:"):
+        return image_ref
+    try:
+        header, encoded = image_ref.split(",", 1)
+        mime_type = header[len("data:"):].split(";", 1)[0]
+        return store_image_blob(base64.b64decode(encoded), mime_type)
+    except (ValueError, OSError):
+        print("Warning: Failed to migrate inline image, keeping data URI.")
+        return image_ref
+
+
+def get_member_objects() -> Dict[str, Member]:
+    """V10.2 新增: 成員物件只在 process 內建立一次，所有 session 共用 (Member 為唯讀資料)
+
+    V10.17 變更: 由成員名單 (sakamichi_roster) 提供；名單資料檔未變更時為同一份對照表 (請勿修改)。
+    """
+    return get_roster().by_name
+
+def load_collection(storage: StorageBackend,
+                    writer: Optional[BackgroundWriter] = None) -> Tuple[PhotoCollection, Dict[str, Dict]]:
+    """從儲存後端加載系列定義和收藏數據，回傳 (Photo 集合, 系列定義)
+
+    writer 為背景寫入執行緒時，會先寫完此儲存位置尚未寫入的變更 (不等待其他使用者的寫入)，確保讀到最新資料。
+
+    V10.2 變更: 解析結果由同一 process 的所有 session 共用 (以資料檔 mtime/size 為鍵)，
+    每個 session 只複製系列定義並建立自己的 Photo；載入本身不再寫回檔案。
+    V10.5 變更: Photo 直接寫入精簡型錄 (張數/圖片參照在加入時一併設定)。
+    V10.13 變更: 舊格式 (member_list/poses、內嵌 Base64 圖片) 改由儲存層依 schema_version 備份並轉換一次
+    (見 sakamichi_migrations)，這裡直接解碼，不再逐一檢查與寫回。
+    """
+    
+    member_objects = get_member_objects()
+    all_photos = PhotoCollection(member_objects)
+            
+    # 預設系列定義由所有 session 共用，複製後才交給呼叫端修改
+    current_sets = copy.deepcopy(DEFAULT_SETS_BY_GROUP)
+    
+    # V10.4 新增: 先寫完背景執行緒中尚未寫入的變更，確保讀到最新資料
+    if writer is not None:
+        writer.flush(storage=storage)
+    saved_sets, saved_collection_data = storage.load_cached()
+    if saved_sets:
+        # 系列定義會被各 session 的編輯功能直接修改，因此複製一份，不影響共用快取
+        current_sets = copy.deepcopy(saved_sets)
+        
+    # Map saved status by photo ID
+    saved_status = {d['id']: d for d in saved_collection_data}
+    VALID_POSE_KEYS = set(p.name for p in Pose)
+
+    for group_value, sets in current_sets.items():
+        for set_name, set_info in sets.items():
+            for member_name, pose_names_for_member in set_info["members_with_poses"].items():
+                # 共用的 Member 可能是在較早的 rerun 建立的 (Enum 類別不同)，因此以團體名稱比較；
+                # 已不在成員名單中的成員與不存在的姿勢略過
+                member = member_objects.get(member_name)
+                if member is None or member.group.value != group_value:
+                    continue
+                for pose_name in pose_names_for_member:
+                    if pose_name in VALID_POSE_KEYS:
+                        status = saved_status.get(f"{member_name}_{set_name}_{pose_name}")
+                        if status is None:
+                            all_photos.add(set_name, member, Pose[pose_name])
+                        else:
+                            all_photos.add(set_name, member, Pose[pose_name], status.get('owned_count') or 0,
+                                           status.get('custom_image_url'))
+        
+    return all_photos, current_sets
+
+
+def save_collection(storage: StorageBackend, photos: PhotoCollection, sets_by_group: Dict[str, Dict]):
+    """將系列定義和 Photo 列表直接寫入儲存後端 (張數與自訂圖片以儲存中的最新值為準)"""
+    storage.save_sets(sets_by_group, [photo.to_dict() for photo in photos])
+
+
+def calculate_progress(photos: PhotoCollection, selected_set: Optional[str] = None) -> Dict[str, Dict]:
+    """取得所有成員在指定系列中的收藏進度 (細化到每個姿勢的張數)
+
+    V9.9 變更: 直接讀取 PhotoCollection 隨變更同步維護的統計，不再每次重新掃描所有 Photo。
+    V10.6 變更: 統計改由欄位陣列的分組加總產生 (畫面上的表格直接使用 PhotoCollection.progress)。
+    """
+    return photos.progress(selected_set).as_dict()
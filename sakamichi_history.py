@@ -0,0 +1,284 @@
+"""坂道生寫真收藏追蹤器 - 復原/重做 (不依賴 Streamlit)
+
+每次變更記錄為一筆可反轉的小操作 (JSON 可序列化的 dict)，不保存整份收藏的快照:
+
+- counts: 張數增減量 [[Photo ID, 增減量], ...] (➕/➖、輸入張數、清零、一鍵收齊)
+- image:  自訂圖片參照的變更 [[Photo ID, 變更前, 變更後], ...]
+- set:    系列定義的變更前/後 (None 為不存在)，以及因此被移除的 Photo 的張數與自訂圖片
+
+復原/重做只套用該筆操作，耗時與操作大小成正比 (與收藏大小無關)。歷史保存在每位收藏者的
+HISTORY_FILE (append-only JSON Lines: do / undo / redo 記錄)，重新啟動後重播即可還原；
+超過筆數或大小上限時捨棄最舊的操作，檔案過大時改寫為目前的內容。
+記錄先保存在記憶體，由 write_pending() 寫入檔案 (介面交給背景寫入執行緒呼叫，不在 callback 中等待磁碟 I/O)。
+"""
+import copy
+import json
+import os
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from sakamichi_core import USERS_DIR, Photo, PhotoCollection
+
+HISTORY_FILE = "sakamichi_history.jsonl"
+# 最多保留的操作數 (復原 + 重做) 與其 JSON 大小總和 (bytes)
+HISTORY_LIMIT = 100
+HISTORY_MAX_BYTES = 512 * 1024
+
+Operation = Dict[str, Any]
+# 操作套用後需要儲存的變更: (張數變更 [(Photo, 增減量)], 自訂圖片變更的 Photo, 變更的系列 [(團體, 系列)])
+AppliedChanges = Tuple[List[Tuple[Photo, int]], List[Photo], List[Tuple[str, str]]]
+
+
+def history_path(namespace: str) -> str:
+    """收藏者的歷史檔路徑 (空字串為預設收藏)"""
+    return os.path.join(USERS_DIR, namespace, HISTORY_FILE) if namespace else HISTORY_FILE
+
+
+def _encode(operation: Operation) -> str:
+    return json.dumps(operation, ensure_ascii=False, separators=(",", ":"))
+
+
+class OperationHistory:
+    """有上限的復原/重做堆疊，變更時追加記錄到 path (None 時只保存在記憶體)"""
+
+    def __init__(self, path: Optional[str] = None, limit: int = HISTORY_LIMIT, max_bytes: int = HISTORY_MAX_BYTES):
+        self.path = path
+        self.limit = limit
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        # 檔案寫入的鎖 (依序寫入；堆疊的操作只需要 _lock，不會等待檔案 I/O)
+        self._write_lock = threading.Lock()
+        # 尚未寫入檔案的記錄 (記錄時即編碼: 之後套用操作時可能修改 op 的內容)
+        self._unwritten: List[str] = []
+        # 元素為 (操作, 操作的 JSON)；復原堆疊的最舊操作在左邊
+        self._undo: deque = deque()
+        self._redo: List[Tuple[Operation, str]] = []
+        self._bytes = 0
+        if path and os.path.exists(path):
+            self._replay()
+
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def undo_label(self) -> Optional[str]:
+        return self._undo[-1][0].get("label") if self._undo else None
+
+    def redo_label(self) -> Optional[str]:
+        return self._redo[-1][0].get("label") if self._redo else None
+
+    def record(self, operation: Operation):
+        """記錄一筆新操作 (清除重做堆疊)"""
+        with self._lock:
+            self._push(operation)
+            self._append({"action": "do", "op": operation})
+
+    def pop_undo(self) -> Optional[Operation]:
+        """取出最近的操作並移到重做堆疊 (呼叫端負責反向套用)"""
+        with self._lock:
+            if not self._undo:
+                return None
+            entry = self._undo.pop()
+            self._redo.append(entry)
+            self._append({"action": "undo"})
+            return entry[0]
+
+    def pop_redo(self) -> Optional[Operation]:
+        """取出最近復原的操作並移回復原堆疊 (呼叫端負責再次套用)"""
+        with self._lock:
+            if not self._redo:
+                return None
+            entry = self._redo.pop()
+            self._undo.append(entry)
+            self._append({"action": "redo"})
+            return entry[0]
+
+    def update_top(self, operation: Operation, undone: bool):
+        """套用時補上的內容 (例如被移除的 Photo 張數) 寫回堆疊頂端的操作"""
+        with self._lock:
+            stack = self._redo if undone else self._undo
+            if stack and stack[-1][0] is operation:
+                encoded = _encode(operation)
+                self._bytes += len(encoded) - len(stack[-1][1])
+                stack[-1] = (operation, encoded)
+                self._append({"action": "update", "op": operation})
+
+    def _push(self, operation: Operation):
+        encoded = _encode(operation)
+        self._bytes -= sum(len(entry[1]) for entry in self._redo)
+        self._redo.clear()
+        self._undo.append((operation, encoded))
+        self._bytes += len(encoded)
+        while self._undo and (len(self._undo) > self.limit or self._bytes > self.max_bytes):
+            self._bytes -= len(self._undo.popleft()[1])
+
+    # --- 檔案 ---
+    def _append(self, record: Dict[str, Any]):
+        if self.path:
+            self._unwritten.append(_encode(record) + "\n")
+
+    def write_pending(self) -> int:
+        """將尚未寫入的記錄追加到檔案 (檔案過大時改寫為目前的內容)，回傳寫入的位元組數"""
+        with self._write_lock:
+            with self._lock:
+                lines, self._unwritten = self._unwritten, []
+            if not lines:
+                return 0
+            encoded = "".join(lines).encode('utf-8')
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # 歷史只是輔助資料，不 fsync (程式中斷時最多遺失最後幾筆)
+            with open(self.path, 'ab') as f:
+                f.write(encoded)
+            written = len(encoded)
+            if os.path.getsize(self.path) > self.max_bytes * 2:
+                written += self._rewrite()
+            return written
+
+    def _replay(self):
+        """依序重播檔案中的記錄 (忽略寫到一半的損壞行)"""
+        # update 記錄取代最近一次 undo/redo 移動的那一筆操作
+        moved_to = None
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                action = record.get("action") if isinstance(record, dict) else None
+                if action == "do" and isinstance(record.get("op"), dict):
+                    self._push(record["op"])
+                    moved_to = None
+                elif action == "undo" and self._undo:
+                    self._redo.append(self._undo.pop())
+                    moved_to = self._redo
+                elif action == "redo" and self._redo:
+                    self._undo.append(self._redo.pop())
+                    moved_to = self._undo
+                elif action == "update" and moved_to and isinstance(record.get("op"), dict):
+                    encoded = _encode(record["op"])
+                    self._bytes += len(encoded) - len(moved_to[-1][1])
+                    moved_to[-1] = (record["op"], encoded)
+
+    def _rewrite(self) -> int:
+        """以目前的堆疊改寫檔案: 依序 do 所有操作 (重做堆疊由頂端開始)，再 undo 重做堆疊的筆數"""
+        # 使用堆疊中保存的 JSON (操作套用時可能正被其他執行緒修改，不在這裡重新編碼)
+        with self._lock:
+            entries = list(self._undo) + list(reversed(self._redo))
+            redo_count = len(self._redo)
+            # 改寫的內容已包含尚未寫入的記錄
+            self._unwritten = []
+        lines = ['{"action":"do","op":' + encoded + '}\n' for _, encoded in entries]
+        lines += [_encode({"action": "undo"}) + "\n"] * redo_count
+        encoded = "".join(lines).encode('utf-8')
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(encoded)
+        os.replace(temp_path, self.path)
+        return len(encoded)
+
+
+_HISTORIES: Dict[str, OperationHistory] = {}
+_HISTORIES_LOCK = threading.Lock()
+
+
+def get_operation_history(namespace: str) -> OperationHistory:
+    """同一 process 中同一位收藏者共用的歷史 (多個 session 的操作依序記錄)"""
+    path = history_path(namespace)
+    with _HISTORIES_LOCK:
+        if path not in _HISTORIES:
+            _HISTORIES[path] = OperationHistory(path)
+        return _HISTORIES[path]
+
+
+# --- 建立操作 ---
+def count_operation(label: str, changes: List[Tuple[Photo, int]]) -> Optional[Operation]:
+    """張數變更 [(Photo, 增減量)] 的操作 (沒有變更時為 None)"""
+    deltas = [[photo.id, delta] for photo, delta in changes if delta]
+    return {"kind": "counts", "label": label, "changes": deltas} if deltas else None
+
+
+def image_operation(label: str, photo: Photo, before: Optional[str]) -> Optional[Operation]:
+    """自訂圖片參照由 before 變為目前值的操作"""
+    if before == photo.custom_image_url:
+        return None
+    return {"kind": "image", "label": label, "changes": [[photo.id, before, photo.custom_image_url]]}
+
+
+def set_operation(label: str, photos: PhotoCollection, group_value: str, set_name: str,
+                  before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> Optional[Operation]:
+    """系列定義由 before 變為 after 的操作 (需在套用到 photos 之前建立，以保存將被移除的 Photo)"""
+    if before == after:
+        return None
+    operation = {"kind": "set", "label": label, "group": group_value, "set_name": set_name,
+                 "before": copy.deepcopy(before), "after": copy.deepcopy(after), "status": {}}
+    _capture_removed(operation, photos, after)
+    return operation
+
+
+def _capture_removed(operation: Operation, photos: PhotoCollection, target: Optional[Dict[str, Any]]):
+    """記錄套用 target 後會被移除、且有張數或自訂圖片的 Photo 的狀態 {Photo ID: [張數, 自訂圖片]}"""
+    members_with_poses = (target or {}).get("members_with_poses", {})
+    for photo in photos.for_set(operation["set_name"]):
+        if photo.member.group.value != operation["group"]:
+            continue
+        if photo.pose.name in members_with_poses.get(photo.member.name, ()):
+            continue
+        if photo.owned_count or photo.custom_image_url:
+            operation["status"][photo.id] = [photo.owned_count, photo.custom_image_url]
+        else:
+            operation["status"].pop(photo.id, None)
+
+
+# --- 套用操作 ---
+def apply_operation(photos: PhotoCollection, sets_by_group: Dict[str, Dict], operation: Operation,
+                    undo: bool) -> AppliedChanges:
+    """反向 (undo=True) 或正向套用操作到 photos 與 sets_by_group，回傳需要儲存的變更
+
+    張數以增減量套用 (其他 session 之後的變更不會被覆蓋)；已不存在的 Photo 會被略過。
+    """
+    count_changes: List[Tuple[Photo, int]] = []
+    image_changes: List[Photo] = []
+    set_changes: List[Tuple[str, str]] = []
+    kind = operation.get("kind")
+
+    if kind == "counts":
+        sign = -1 if undo else 1
+        for photo_id, delta in operation["changes"]:
+            photo = photos.get(photo_id)
+            if photo is not None:
+                applied = photos.set_count(photo, max(0, photo.owned_count + sign * delta))
+                if applied:
+                    count_changes.append((photo, applied))
+
+    elif kind == "image":
+        for photo_id, before, after in operation["changes"]:
+            photo = photos.get(photo_id)
+            if photo is not None:
+                photo.custom_image_url = before if undo else after
+                image_changes.append(photo)
+
+    elif kind == "set":
+        group_value, set_name = operation["group"], operation["set_name"]
+        target = operation["before"] if undo else operation["after"]
+        _capture_removed(operation, photos, target)
+        sets = sets_by_group.setdefault(group_value, {})
+        if target is None:
+            sets.pop(set_name, None)
+        else:
+            sets[set_name] = copy.deepcopy(target)
+        existing_ids = {photo.id for photo in photos.for_set(set_name)}
+        photos.apply_set_definition(group_value, set_name, target["members_with_poses"] if target else None)
+        # 重新加入的 Photo 還原被移除前的張數與自訂圖片
+        for photo_id, (owned_count, custom_image_url) in operation["status"].items():
+            photo = photos.get(photo_id)
+            if photo is not None and photo_id not in existing_ids:
+                photos.set_count(photo, owned_count)
+                photo.custom_image_url = custom_image_url
+        set_changes.append((group_value, set_name))
+
+    return count_changes, image_changes, set_changes
@@ -0,0 +1,157 @@
+"""坂道生寫真收藏追蹤器 - 自訂圖片的 HTTP 伺服器 (不依賴 Streamlit)
+
+st.image 讀取本機檔案時，每次重繪都會重新讀檔並經由 Streamlit 的媒體端點傳給瀏覽器。
+blob 與縮圖都以內容雜湊命名 (同一網址的內容永遠不變)，因此改由這個小型伺服器以固定網址提供，
+回應帶有 ETag 與一年的 immutable Cache-Control，瀏覽器重複瀏覽時不需再下載 (If-None-Match 回 304)。
+
+伺服器預設停用 (卡片由 st.image 經由 Streamlit 提供圖片)，需明確設定才會使用:
+
+- SAKAMICHI_IMAGE_PORT: sakamichi_app.py 在背景執行緒啟動伺服器 (預設只監聽 127.0.0.1，
+  此時只有從本機瀏覽時才使用伺服器的網址)
+- SAKAMICHI_IMAGE_BASE_URL: 經由反向代理 (例如 HTTPS) 對外提供時的基底網址，伺服器可單獨執行:
+
+    python sakamichi_image_server.py --port 8599
+"""
+import argparse
+import os
+import re
+import shutil
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from sakamichi_core import BLOB_DIR
+
+# 環境變數: 監聽的埠號 (未設定或 "off" 時不啟動，卡片改由 st.image 直接讀檔)、監聽位址、對外的基底網址
+IMAGE_SERVER_PORT = os.environ.get("SAKAMICHI_IMAGE_PORT", "")
+IMAGE_SERVER_HOST = os.environ.get("SAKAMICHI_IMAGE_HOST", "127.0.0.1")
+IMAGE_BASE_URL = os.environ.get("SAKAMICHI_IMAGE_BASE_URL", "")
+
+LOOPBACK_HOSTS = {"localhost", "127.0.0.1", "::1", "[::1]"}
+
+URL_PREFIX = "/blobs/"
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+CONTENT_TYPES = {"jpg": "image/jpeg", "png": "image/png", "webp": "image/webp", "bin": "application/octet-stream"}
+# 只提供內容雜湊命名的檔案 (原圖與縮圖)，不接受其他路徑
+BLOB_NAME_PATTERN = re.compile(r"^[0-9a-f]{64}(\.thumb)?\.(jpg|png|webp|bin)$")
+
+
+class ImageRequestHandler(BaseHTTPRequestHandler):
+    """GET/HEAD /blobs/<雜湊>.<副檔名>"""
+
+    blob_dir = BLOB_DIR
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def _serve(self, send_body: bool):
+        file_name = self.path.split("?", 1)[0][len(URL_PREFIX):] if self.path.startswith(URL_PREFIX) else ""
+        if not BLOB_NAME_PATTERN.match(file_name):
+            self.send_error(404)
+            return
+        file_path = os.path.join(self.blob_dir, file_name)
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            self.send_error(404)
+            return
+
+        # 檔名即內容雜湊，可直接作為 ETag
+        etag = f'"{file_name}"'
+        if etag in self.headers.get("If-None-Match", ""):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", CACHE_CONTROL)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPES[file_name.rsplit(".", 1)[1]])
+        self.send_header("Content-Length", str(size))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", CACHE_CONTROL)
+        self.end_headers()
+        if send_body:
+            with open(file_path, 'rb') as f:
+                shutil.copyfileobj(f, self.wfile)
+
+    def log_message(self, format, *args):
+        # 不輸出每個請求的記錄
+        pass
+
+
+class ImageServer:
+    """在背景執行緒執行的圖片伺服器"""
+
+    def __init__(self, blob_dir: str, host: str = IMAGE_SERVER_HOST, port: int = 0):
+        handler = type("BlobRequestHandler", (ImageRequestHandler,), {"blob_dir": os.path.abspath(blob_dir)})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="sakamichi-images", daemon=True)
+
+    def start(self) -> "ImageServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+_IMAGE_SERVER: Optional[ImageServer] = None
+_IMAGE_SERVER_STARTED = False
+_IMAGE_SERVER_LOCK = threading.Lock()
+
+
+def get_image_server(blob_dir: str = BLOB_DIR) -> Optional[ImageServer]:
+    """同一 process 共用的圖片伺服器；未設定埠號或無法啟動 (例如埠號被占用) 時回傳 None"""
+    global _IMAGE_SERVER, _IMAGE_SERVER_STARTED
+    with _IMAGE_SERVER_LOCK:
+        if not _IMAGE_SERVER_STARTED:
+            _IMAGE_SERVER_STARTED = True
+            if IMAGE_SERVER_PORT and IMAGE_SERVER_PORT.lower() != "off":
+                try:
+                    _IMAGE_SERVER = ImageServer(blob_dir, port=int(IMAGE_SERVER_PORT)).start()
+                except (OSError, ValueError) as e:
+                    print(f"Warning: Image server not started, images are sent through Streamlit: {e}")
+        return _IMAGE_SERVER
+
+
+def image_url_for(file_path: str, request_host: Optional[str] = None) -> Optional[str]:
+    """blob 檔案的網址；無法提供網址時回傳 None (呼叫端改為直接讀檔)
+
+    設定 SAKAMICHI_IMAGE_BASE_URL 時 (伺服器單獨執行或經由反向代理) 直接使用該基底網址，
+    否則以瀏覽器連線的主機名稱 (request_host，即 Host 標頭) 加上本 process 圖片伺服器的埠號；
+    伺服器只監聽本機位址時，只有瀏覽器也在本機 (Host 為 localhost 等) 才使用。
+    """
+    path = URL_PREFIX + os.path.basename(file_path)
+    if IMAGE_BASE_URL:
+        get_image_server()
+        return IMAGE_BASE_URL.rstrip("/") + path
+    server = get_image_server()
+    if server is None:
+        return None
+    host = request_host or "localhost"
+    hostname = host if host.endswith("]") else host.rsplit(":", 1)[0]
+    if IMAGE_SERVER_HOST in LOOPBACK_HOSTS and hostname not in LOOPBACK_HOSTS:
+        return None
+    return f"http://{hostname}:{server.port}{path}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以固定網址與快取標頭提供自訂圖片")
+    parser.add_argument("--blob-dir", default=BLOB_DIR)
+    parser.add_argument("--host", default=IMAGE_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=8599)
+    args = parser.parse_args()
+    server = ImageServer(args.blob_dir, args.host, args.port)
+    print(f"Serving {args.blob_dir} on port {server.port}")
+    server.httpd.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""坂道生寫真收藏追蹤器 - 自訂圖片縮圖 (不依賴 Streamlit)
+
+上傳的原圖 (手機相機解析度) 保存在 blob 目錄；卡片只顯示縮小到卡片大小、重新編碼為 WebP 的縮圖，
+存放在原圖旁 (<雜湊>.thumb.webp)。縮圖由背景 thread pool 產生，上傳的 callback 不需等待；
+縮圖尚未完成 (或圖片無法解碼) 時，卡片暫時顯示原圖；無法解碼的原圖以內容雜湊記錄，之後不再重試。
+Pillow 只在第一次產生縮圖時才載入。
+"""
+import importlib.util
+import os
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Set
+
+# 沒有 Pillow 時不產生縮圖，卡片直接顯示原圖
+HAS_PILLOW = importlib.util.find_spec("PIL") is not None
+
+# 卡片圖片最高顯示 180px，保留兩倍解析度給高密度螢幕
+THUMBNAIL_SIZE = (360, 360)
+THUMBNAIL_SUFFIX = ".thumb.webp"
+THUMBNAIL_QUALITY = 80
+
+
+def blob_digest(blob_path: str) -> str:
+    """原圖的內容雜湊 (blob 檔名去掉副檔名)"""
+    return os.path.splitext(os.path.basename(blob_path))[0]
+
+
+def thumbnail_path(blob_path: str) -> str:
+    """原圖對應的縮圖檔案路徑"""
+    return os.path.splitext(blob_path)[0] + THUMBNAIL_SUFFIX
+
+
+def make_thumbnail(blob_path: str, size=THUMBNAIL_SIZE) -> Optional[str]:
+    """產生縮圖並回傳路徑 (已存在時直接回傳)；無法產生時回傳 None"""
+    target = thumbnail_path(blob_path)
+    if os.path.exists(target):
+        return target
+    if not HAS_PILLOW or not os.path.exists(blob_path):
+        return None
+    from PIL import Image, ImageOps
+
+    tmp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+    try:
+        with Image.open(blob_path) as image:
+            # JPEG 直接以縮小的比例解碼，省下完整解碼手機照片的時間與記憶體
+            image.draft("RGB", size)
+            # 依 EXIF 方向旋轉 (手機直拍的照片)
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail(size, Image.Resampling.LANCZOS)
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if image.mode in ("LA", "P", "PA") else "RGB")
+            image.save(tmp_path, "WEBP", quality=THUMBNAIL_QUALITY, method=4)
+        os.replace(tmp_path, target)
+        return target
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        print(f"Warning: Failed to create thumbnail for {blob_path}: {e}")
+        return None
+
+
+class ThumbnailPool:
+    """在背景 thread pool 產生縮圖，同一張原圖同時只排入一次，無法產生縮圖的原圖不再排入"""
+
+    def __init__(self, max_workers: int = 2):
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="sakamichi-thumbnail")
+        # 工作已完成時 add_done_callback 會立即在呼叫端執行 _done，因此使用可重入的鎖
+        self._lock = threading.RLock()
+        self._pending: Dict[str, Future] = {}
+        # 無法產生縮圖 (無法解碼) 的原圖內容雜湊；內容相同的檔案結果也相同，不需重試
+        self._failed: Set[str] = set()
+
+    def submit(self, blob_path: str) -> Optional[Future]:
+        """排入縮圖產生工作 (縮圖已存在時不做事)"""
+        if not HAS_PILLOW or os.path.exists(thumbnail_path(blob_path)):
+            return None
+        with self._lock:
+            if blob_digest(blob_path) in self._failed:
+                return None
+            future = self._pending.get(blob_path)
+            if future is None:
+                future = self._executor.submit(make_thumbnail, blob_path)
+                self._pending[blob_path] = future
+                future.add_done_callback(lambda done, path=blob_path: self._done(path, done))
+            return future
+
+    def _done(self, blob_path: str, future: Future):
+        with self._lock:
+            self._pending.pop(blob_path, None)
+            # 原圖存在卻無法產生縮圖時記錄下來 (原圖尚未寫入完成的情況則下次再試)
+            failed = not future.cancelled() and future.exception() is None and future.result() is None
+            if failed and os.path.exists(blob_path):
+                self._failed.add(blob_digest(blob_path))
+
+    def thumbnail_for(self, blob_path: str) -> Optional[str]:
+        """已產生的縮圖路徑；尚未產生時排入背景工作並回傳 None (無法產生縮圖的原圖不再排入)"""
+        target = thumbnail_path(blob_path)
+        if os.path.exists(target):
+            return target
+        self.submit(blob_path)
+        return None
+
+
+_THUMBNAIL_POOL: Optional[ThumbnailPool] = None
+_THUMBNAIL_POOL_LOCK = threading.Lock()
+
+
+def get_thumbnail_pool() -> ThumbnailPool:
+    """同一 process 共用的縮圖 thread pool"""
+    global _THUMBNAIL_POOL
+    with _THUMBNAIL_POOL_LOCK:
+        if _THUMBNAIL_POOL is None:
+            _THUMBNAIL_POOL = ThumbnailPool()
+        return _THUMBNAIL_POOL
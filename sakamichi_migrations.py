@@ -0,0 +1,91 @@
+"""坂道生寫真收藏追蹤器 - 資料格式版本與一次性轉換 (不依賴 Streamlit)
+
+資料檔記錄格式版本 (JSON: 檔案中的 "schema_version"；SQLite: PRAGMA user_version，未記錄時為 0)。
+儲存後端載入時只比較版本號: 低於 SCHEMA_VERSION 時，在寫入鎖內先備份原檔，依序套用尚未套用的轉換並寫回，
+之後的載入直接解碼，不再逐一檢查舊格式。
+
+新增轉換: 以 @migration(新版本, 說明) 註冊一個函數 (接收並回傳 (sets_by_group, rows))，
+版本號必須接續最後一個步驟，SCHEMA_VERSION 會自動跟著增加。
+"""
+import os
+import shutil
+from typing import Any, Callable, Dict, List, Tuple
+
+# 與 sakamichi_storage 的 SetsByGroup / CollectionRows 相同 (sakamichi_storage 會匯入本模組)
+SetsByGroup = Dict[str, Dict[str, Dict[str, Any]]]
+CollectionRows = List[Dict[str, Any]]
+MigrationStep = Callable[[SetsByGroup, CollectionRows], Tuple[SetsByGroup, CollectionRows]]
+
+# 依版本排序的轉換步驟: [(套用後的版本, 說明, 函數)]
+MIGRATIONS: List[Tuple[int, str, MigrationStep]] = []
+
+
+def migration(version: int, description: str) -> Callable[[MigrationStep], MigrationStep]:
+    """註冊轉換步驟 (套用後資料成為 version 版)"""
+    def register(step: MigrationStep) -> MigrationStep:
+        expected = len(MIGRATIONS) + 1
+        if version != expected:
+            raise ValueError(f"Migration version {version} out of order (expected {expected})")
+        MIGRATIONS.append((version, description, step))
+        return step
+    return register
+
+
+def normalize_set_info(set_info: Dict[str, Any]) -> Dict[str, Any]:
+    """將舊結構 (member_list + poses) 轉換為 members_with_poses 結構"""
+    if set_info.get("members_with_poses"):
+        return {"members_with_poses": set_info["members_with_poses"]}
+
+    member_names = set_info.get("member_list", [])
+    pose_names = set_info.get("poses", [])
+    return {"members_with_poses": {m_name: list(pose_names) for m_name in member_names} if pose_names else {}}
+
+
+@migration(1, "member_list/poses -> members_with_poses")
+def migrate_set_structure(sets_by_group: SetsByGroup, rows: CollectionRows) -> Tuple[SetsByGroup, CollectionRows]:
+    # V8.x 以前的系列只有 member_list 與 poses (所有成員共用同一組姿勢)
+    sets_by_group = {
+        group_name: {set_name: normalize_set_info(set_info) for set_name, set_info in sets.items()}
+        for group_name, sets in sets_by_group.items()
+    }
+    return sets_by_group, rows
+
+
+@migration(2, "inline Base64 images -> blob references")
+def migrate_inline_images(sets_by_group: SetsByGroup, rows: CollectionRows) -> Tuple[SetsByGroup, CollectionRows]:
+    # V9.6 以前的自訂圖片以 data URI 直接存在收藏列中
+    from sakamichi_core import migrate_inline_image  # sakamichi_core 依賴儲存層，在此才匯入
+
+    for row in rows:
+        row['custom_image_url'] = migrate_inline_image(row.get('custom_image_url'))
+    return sets_by_group, rows
+
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(sets_by_group: SetsByGroup, rows: CollectionRows,
+            from_version: int) -> Tuple[SetsByGroup, CollectionRows, List[str]]:
+    """依序套用 from_version 之後的轉換，回傳 (sets_by_group, rows, 套用的步驟說明)"""
+    applied = []
+    for version, description, step in MIGRATIONS:
+        if version > from_version:
+            sets_by_group, rows = step(sets_by_group, rows)
+            applied.append(description)
+    return sets_by_group, rows, applied
+
+
+def backup_files(paths: List[str], from_version: int) -> List[str]:
+    """轉換前備份資料檔 (<檔名>.schema<版本>.bak)，回傳備份路徑
+
+    同一版本的備份已存在時 (先前的轉換中斷) 保留原本的備份，它才是轉換前的原檔。
+    """
+    backups = []
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        backup_path = f"{path}.schema{from_version}.bak"
+        if not os.path.exists(backup_path):
+            shutil.copy2(path, backup_path)
+        backups.append(backup_path)
+    return backups
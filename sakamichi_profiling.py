@@ -0,0 +1,88 @@
+"""坂道生寫真收藏追蹤器 - 每次重繪的效能分析 (不依賴 Streamlit)
+
+啟用時 (環境變數 SAKAMICHI_PROFILE=1 或網址 ?profile=1)，以 phase() 量測一次重繪中各個命名階段的耗時，
+並與儲存層記錄的寫入位元組數一起附加到 JSONL 追蹤檔，供離線分析。停用時 phase() 幾乎沒有額外成本。
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+PROFILE_ENV = "SAKAMICHI_PROFILE"
+TRACE_FILE = os.environ.get("SAKAMICHI_PROFILE_TRACE", "sakamichi_profile.jsonl")
+
+
+def profiling_requested(query_value: Optional[str] = None) -> bool:
+    """環境變數或網址參數是否要求啟用效能分析"""
+    return os.environ.get(PROFILE_ENV, "") not in ("", "0") or query_value in ("1", "true")
+
+
+class RerunProfile:
+    """一次重繪的階段計時 (同名階段的耗時會累加)"""
+
+    def __init__(self, enabled: bool, started_at: Optional[float] = None):
+        self.enabled = enabled
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self.writes: List[Dict[str, Any]] = []
+        self.total_ms: Optional[float] = None
+        self._section: Optional[Tuple[str, float]] = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(name, started_at)
+
+    def section(self, name: Optional[str]):
+        """結束目前的頁面區段並開始下一個 (None 只結束)，頂層程式依序呼叫即可，不需要縮排整段程式"""
+        if not self.enabled:
+            return
+        if self._section is not None:
+            self._add(*self._section)
+        self._section = (name, time.perf_counter()) if name is not None else None
+
+    def _add(self, name: str, started_at: float):
+        elapsed_ms = (time.perf_counter() - started_at) * 1000
+        self.phases[name] = self.phases.get(name, 0.0) + elapsed_ms
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def add_writes(self, writes: List[Dict[str, Any]]):
+        """加入此次重繪期間完成的寫入記錄 (來自 BackgroundWriter.writes_since)"""
+        self.writes.extend(writes)
+
+    @property
+    def bytes_written(self) -> int:
+        return sum(write['bytes'] for write in self.writes)
+
+    def finish(self) -> Dict[str, Any]:
+        """結束計時並回傳可寫入追蹤檔的記錄"""
+        self.section(None)
+        self.total_ms = (time.perf_counter() - self.started_at) * 1000
+        return self.as_record()
+
+    def as_record(self, **extra: Any) -> Dict[str, Any]:
+        record = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "total_ms": self.total_ms,
+            "phases_ms": self.phases,
+            "calls": self.calls,
+            "writes": self.writes,
+            "bytes_written": self.bytes_written,
+        }
+        record.update(extra)
+        return record
+
+
+def append_trace(record: Dict[str, Any], trace_file: str = TRACE_FILE):
+    """將一筆記錄附加到 JSONL 追蹤檔"""
+    with open(trace_file, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
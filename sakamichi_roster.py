@@ -0,0 +1,136 @@
+"""坂道生寫真收藏追蹤器 - 成員名單 (不依賴 Streamlit)
+
+成員名單存放在 roster.json (環境變數 SAKAMICHI_ROSTER 可指定其他檔案)，依團體 → 期別列出成員:
+
+    {"version": 1,
+     "groups": {"乃木坂46": {"5": ["井上和", ...]}, ...},
+     "graduated": {"乃木坂46": {"3": ["..."]}}}
+
+新的期別、畢業 (移到 graduated) 只需修改資料檔，不需修改程式。畢業成員仍可被查詢
+(既有收藏中的生寫真照常顯示)，但不會出現在現役成員名單與系列編輯的成員選項中。
+
+名單在載入時一次建立 名稱 → Member、團體 → 成員、(團體, 期別) → 成員 的對照表，之後的查詢都是 dict 查找；
+get_roster() 以檔案的 mtime/size 判斷是否變更，資料未變更時一律回傳同一份 Roster (不重新建立)。
+"""
+import json
+import os
+import threading
+from enum import Enum
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+ROSTER_FILE = os.environ.get("SAKAMICHI_ROSTER") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "roster.json")
+
+
+# 坂道團體 (Group)
+class Group(Enum):
+    NOGIZAKA = "乃木坂46"
+    SAKURAZAKA = "櫻坂46"
+    HINATAZAKA = "日向坂46"
+
+
+class Member:
+    def __init__(self, name: str, group: Group, generation: int, graduated: bool = False):
+        self.name = name
+        self.group = group
+        self.generation = generation
+        self.graduated = graduated
+    def __repr__(self):
+        return f"[{self.group.value}] {self.name}"
+
+
+GroupKey = Union[Group, str]
+
+
+def _group_value(group: GroupKey) -> str:
+    return group.value if isinstance(group, Group) else group
+
+
+class Roster:
+    """成員名單與預先建立的對照表 (唯讀，所有 session 共用)"""
+
+    def __init__(self, members: Iterable[Member]):
+        self.by_name: Dict[str, Member] = {}
+        for member in members:
+            self.by_name.setdefault(member.name, member)
+        active = [member for member in self.by_name.values() if not member.graduated]
+        # 現役成員 (依資料檔順序)，與依名稱排序的名稱 (系列編輯的成員選項)
+        self._by_group: Dict[str, Tuple[Member, ...]] = {
+            group.value: tuple(member for member in active if member.group is group) for group in Group}
+        self._sorted_names: Dict[str, Tuple[str, ...]] = {
+            group_value: tuple(sorted(member.name for member in members))
+            for group_value, members in self._by_group.items()}
+        self._by_generation: Dict[Tuple[str, int], Tuple[Member, ...]] = {}
+        for member in active:
+            key = (member.group.value, member.generation)
+            self._by_generation[key] = self._by_generation.get(key, ()) + (member,)
+
+    def __len__(self):
+        return len(self.by_name)
+
+    def __contains__(self, name: str):
+        return name in self.by_name
+
+    def get(self, name: str) -> Optional[Member]:
+        """成員 (包含畢業成員；不存在時為 None)"""
+        return self.by_name.get(name)
+
+    def group_members(self, group: GroupKey) -> Tuple[Member, ...]:
+        """團體的現役成員 (依資料檔順序)"""
+        return self._by_group.get(_group_value(group), ())
+
+    def member_names(self, group: GroupKey, sort: bool = False) -> Tuple[str, ...]:
+        """團體的現役成員名稱 (sort=True 時依名稱排序)"""
+        if sort:
+            return self._sorted_names.get(_group_value(group), ())
+        return tuple(member.name for member in self.group_members(group))
+
+    def generation_members(self, group: GroupKey, generation: int) -> Tuple[Member, ...]:
+        """團體某一期的現役成員"""
+        return self._by_generation.get((_group_value(group), generation), ())
+
+
+def parse_roster(data: Dict) -> Roster:
+    """由資料檔內容建立 Roster；無法辨識的團體或期別會略過並顯示警告"""
+    members = []
+    for section, graduated in (("groups", False), ("graduated", True)):
+        for group_value, generations in (data.get(section) or {}).items():
+            try:
+                group = Group(group_value)
+            except ValueError:
+                print(f"Warning: Unknown group {group_value!r} in roster, skipped.")
+                continue
+            for generation, names in generations.items():
+                try:
+                    generation = int(generation)
+                except ValueError:
+                    print(f"Warning: Invalid generation {generation!r} for {group_value} in roster, skipped.")
+                    continue
+                members.extend(Member(name, group, generation, graduated) for name in names)
+    # 同時列在 groups 與 graduated 時視為畢業
+    graduated_names = {member.name for member in members if member.graduated}
+    return Roster(member for member in members if member.graduated or member.name not in graduated_names)
+
+
+def load_roster(path: Optional[str] = None) -> Roster:
+    with open(path or ROSTER_FILE, 'r', encoding='utf-8') as f:
+        return parse_roster(json.load(f))
+
+
+_ROSTER_CACHE: Dict[str, Tuple[Tuple, Roster]] = {}
+_ROSTER_LOCK = threading.Lock()
+
+
+def get_roster(path: Optional[str] = None) -> Roster:
+    """同一 process 共用的成員名單；資料檔變更 (mtime/size 不同) 後的第一次呼叫才重新載入
+
+    path 省略時於呼叫時讀取 ROSTER_FILE (可在執行期間改為其他資料檔)。
+    """
+    path = path or ROSTER_FILE
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _ROSTER_LOCK:
+        cached = _ROSTER_CACHE.get(path)
+        if cached is None or cached[0] != signature:
+            cached = _ROSTER_CACHE[path] = (signature, load_roster(path))
+        return cached[1]
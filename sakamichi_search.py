@@ -0,0 +1,152 @@
+"""坂道生寫真收藏追蹤器 - 全域搜尋 (不依賴 Streamlit)
+
+以空白分隔的條件查詢所有系列的生寫真，同一類條件為「或」，不同類條件為「且」:
+
+- 成員: 井上和 (完整名稱；也可只輸入部分名稱，例如 井上)
+- 團體: 乃木坂46 / 乃木坂、櫻坂46 / 櫻坂、日向坂46 / 日向坂
+- 期別: 5期 / 5期生
+- 姿勢: ヒキ 或代碼 H
+- 系列: 系列名稱 (完整名稱或部分名稱，例如 2024)
+- 張數: 0張、=0、>=2、≥2、<1；未收藏 (0 張)、已收藏 (1 張以上)
+
+例如「井上和 ヒキ 0張」、「山下瞳月」、「>=2」。查詢只做型錄反向索引 (PhotoCatalog.index) 的集合交集，
+不逐一掃描 Photo；成員、團體、期別都換算成成員代碼後查詢。
+"""
+import operator
+import re
+from typing import Callable, Dict, List, Optional, Set
+
+from sakamichi_core import Group, Photo, PhotoCollection, Pose, get_member_objects
+
+# 張數條件: 比較運算子或「張」後綴 (只有數字時視為系列名稱的一部分，例如 2024)，例如 >=2、張數≥2、0張
+COUNT_PATTERN = re.compile(r"^(?:張數|owned)?(?:(>=|≥|<=|≤|>|<|==|=)(\d+)張?|(\d+)張)$")
+COUNT_OPERATORS: Dict[str, Callable[[int, int], bool]] = {
+    ">=": operator.ge, "≥": operator.ge, "<=": operator.le, "≤": operator.le,
+    ">": operator.gt, "<": operator.lt, "==": operator.eq, "=": operator.eq,
+}
+COUNT_KEYWORDS = {"未收藏": ("=", 0), "已收藏": (">=", 1)}
+GENERATION_PATTERN = re.compile(r"^(\d+)期生?$")
+
+# 團體名稱 (可省略 46；櫻坂也接受「桜坂」)
+GROUP_ALIASES = {group.value: group.value for group in Group}
+GROUP_ALIASES.update({group.value.replace("46", ""): group.value for group in Group})
+GROUP_ALIASES["桜坂"] = GROUP_ALIASES["桜坂46"] = Group.SAKURAZAKA.value
+POSE_ALIASES = {**{pose.value: pose.name for pose in Pose}, **{pose.name.upper(): pose.name for pose in Pose}}
+
+
+class SearchQuery:
+    """解析後的查詢: 各欄位符合的代碼集合 (None 為不限制) 與無法辨識的條件"""
+
+    def __init__(self):
+        self.member_codes: Optional[Set[int]] = None
+        self.set_codes: Optional[Set[int]] = None
+        self.pose_codes: Optional[Set[int]] = None
+        self.count_conditions: List[Callable[[int], bool]] = []
+        self.unknown_terms: List[str] = []
+
+    def restrict_members(self, codes: Set[int]):
+        """成員、團體、期別條件都限制成員代碼 (不同類的條件取交集)"""
+        self.member_codes = codes if self.member_codes is None else self.member_codes & codes
+
+    def has_conditions(self) -> bool:
+        return (self.member_codes is not None or self.set_codes is not None or self.pose_codes is not None
+                or bool(self.count_conditions))
+
+    def count_filter(self) -> Optional[Callable[[int], bool]]:
+        if not self.count_conditions:
+            return None
+        conditions = self.count_conditions
+        return lambda count: any(condition(count) for condition in conditions)
+
+
+def parse_query(text: str, photos: PhotoCollection) -> SearchQuery:
+    """將查詢字串解析為代碼條件 (成員、系列以目前型錄中的名稱比對)"""
+    catalog = photos.catalog
+    query = SearchQuery()
+    member_objects = {**get_member_objects(), **photos.member_objects}
+    # 同一類的多個條件為「或」: 先收集，最後再與其他類別取交集
+    named_members: Set[int] = set()
+    groups: Set[str] = set()
+    generations: Set[int] = set()
+
+    for term in text.split():
+        count_match = COUNT_PATTERN.match(term)
+        generation_match = GENERATION_PATTERN.match(term)
+        if term in COUNT_KEYWORDS or count_match:
+            op, value = COUNT_KEYWORDS.get(term) or (count_match.group(1) or "=",
+                                                      int(count_match.group(2) or count_match.group(3)))
+            query.count_conditions.append(lambda count, compare=COUNT_OPERATORS[op], value=value: compare(count, value))
+        elif generation_match:
+            generations.add(int(generation_match.group(1)))
+        elif term in GROUP_ALIASES:
+            groups.add(GROUP_ALIASES[term])
+        elif term.upper() in POSE_ALIASES or term in POSE_ALIASES:
+            pose_name = POSE_ALIASES.get(term) or POSE_ALIASES[term.upper()]
+            query.pose_codes = (query.pose_codes or set()) | {catalog.pose_codes_by_name[pose_name]}
+        elif catalog.members.lookup(term) is not None:
+            named_members.add(catalog.members.lookup(term))
+        elif catalog.sets.lookup(term) is not None:
+            query.set_codes = (query.set_codes or set()) | {catalog.sets.lookup(term)}
+        else:
+            # 部分名稱: 先比對成員，再比對系列
+            partial_members = {code for code, name in enumerate(catalog.members.values) if term in name}
+            partial_sets = {code for code, name in enumerate(catalog.sets.values) if term in name}
+            if partial_members:
+                named_members |= partial_members
+            elif partial_sets:
+                query.set_codes = (query.set_codes or set()) | partial_sets
+            elif term in member_objects:
+                # 名單中的成員，但型錄中還沒有這位成員的生寫真 (不會有結果)
+                named_members.add(-1)
+            else:
+                query.unknown_terms.append(term)
+
+    if named_members:
+        query.restrict_members(named_members)
+    for values, attribute in ((groups, lambda member: member.group.value),
+                              (generations, lambda member: member.generation)):
+        if values:
+            query.restrict_members({
+                code for code, name in enumerate(catalog.members.values)
+                if name in member_objects and attribute(member_objects[name]) in values
+            })
+    return query
+
+
+class SearchResult:
+    """搜尋結果: 列索引 (依系列、成員、姿勢排序) 與無法辨識的條件"""
+
+    def __init__(self, photos: PhotoCollection, slots: List[int], unknown_terms: List[str]):
+        self.photos = photos
+        self.slots = slots
+        self.unknown_terms = unknown_terms
+
+    def __len__(self):
+        return len(self.slots)
+
+    def photo_list(self, limit: Optional[int] = None) -> List[Photo]:
+        return [Photo(self.photos, slot) for slot in self.slots[:limit]]
+
+    def set_names(self) -> List[str]:
+        """結果中出現的系列 (依第一次出現的順序)"""
+        catalog = self.photos.catalog
+        return list(dict.fromkeys(catalog.sets[catalog.set_codes[slot]] for slot in self.slots))
+
+    def total_owned(self) -> int:
+        counts = self.photos.catalog.counts
+        return sum(counts[slot] for slot in self.slots)
+
+
+def search_photos(photos: PhotoCollection, text: str) -> SearchResult:
+    """查詢所有系列的生寫真 (依系列、成員、姿勢排序)；無法辨識的條件會被忽略並列在結果中"""
+    query = parse_query(text, photos)
+    if not query.has_conditions():
+        # 沒有任何可用的條件 (空白或全部無法辨識) 時不列出整個收藏
+        return SearchResult(photos, [], query.unknown_terms)
+    slots = photos.catalog.index().query(query.member_codes, query.set_codes, query.pose_codes,
+                                         query.count_filter())
+    catalog = photos.catalog
+    # 依系列、成員、姿勢代碼排序 (即第一次出現的順序；移除後重複使用的列不會打亂順序)
+    ordered = sorted(slots, key=lambda slot: (catalog.set_codes[slot], catalog.member_codes[slot],
+                                              catalog.pose_codes[slot]))
+    return SearchResult(photos, ordered, query.unknown_terms)
@@ -0,0 +1,1062 @@
+"""坂道生寫真收藏追蹤器 - 儲存層 (不依賴 Streamlit)
+
+所有儲存後端都以純資料 (dict/list) 溝通:
+- sets_by_group: {團體名稱: {系列名稱: {"members_with_poses": {成員: [姿勢...]}}}}
+- collection rows: Photo.to_dict() 的結果 (id, set_name, member_name, group, pose, owned_count, custom_image_url)
+
+後端:
+- JsonStorage: 單一 JSON 檔 + append-only 變更日誌 (原本的儲存方式)
+- SqliteStorage: SQLite 資料庫，張數變更只更新單列，並以 set_name / member / group 建立索引
+
+每個儲存位置 (每位使用者一份) 都有自己的寫入鎖；張數以「增減量」記錄，
+因此多個 session 同時點擊時不會互相覆蓋，不同使用者之間也不會互相阻塞。
+
+舊版程式寫入的資料 (格式版本低於 SCHEMA_VERSION) 在第一次載入時備份並轉換一次 (見 sakamichi_migrations)。
+"""
+import argparse
+import atexit
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sakamichi_migrations import SCHEMA_VERSION, backup_files, migrate, normalize_set_info
+
+try:
+    import fcntl
+except ImportError:  # Windows: 只使用 process 內的鎖
+    fcntl = None
+
+SetsByGroup = Dict[str, Dict[str, Dict[str, Any]]]
+CollectionRows = List[Dict[str, Any]]
+CountDeltas = List[Tuple[Dict[str, Any], int]]
+SetPatches = List[Tuple[str, str, Optional[Dict[str, Any]], CollectionRows]]
+
+# 可由 Photo 變更記錄個別更新的欄位
+PHOTO_FIELDS = ("owned_count", "custom_image_url")
+
+# 同一個 process 內所有 session 共用的解析結果快取: {儲存位置: (檔案簽章, sets_by_group, rows)}
+_LOAD_CACHE: Dict[str, Tuple[Tuple, "SetsByGroup", "CollectionRows"]] = {}
+# 只在查詢/更新上面幾個 dict 時短暫持有 (持有期間不做檔案 I/O，也不取得其他鎖)
+_LOAD_CACHE_LOCK = threading.Lock()
+# 各儲存位置的快取清除次數: load() 期間被清除時，讀到的結果不存入快取
+_LOAD_CACHE_GENERATIONS: Dict[str, int] = {}
+# 各儲存位置的載入鎖: 同一位置同時只解析一次，不同位置互不等待
+_LOAD_LOCKS: Dict[str, threading.Lock] = {}
+
+# 已確認尚未合併的日誌: {日誌路徑: (日誌 ID, 確認當時 data_file 的簽章)}；data_file 改變 (合併) 後需重新確認
+_LIVE_JOURNALS: Dict[str, Tuple[str, Tuple]] = {}
+
+# 同一個 process 內各儲存位置累計寫入的位元組數 (效能分析用): {儲存位置: 位元組數}
+_BYTES_WRITTEN: Dict[str, int] = {}
+_BYTES_WRITTEN_LOCK = threading.Lock()
+
+
+def iter_encode_json(data: Any, indent: str = "") -> Iterator[str]:
+    """逐段產生縮排的 JSON: dict 逐層縮排，list 中的每個 dict 各佔一行，其餘的 list 與值寫在同一行
+
+    json.dump(indent=4) 會改用純 Python 的編碼器逐項輸出，大型收藏要花上數秒；
+    這裡每一行都交給 C 編碼器，輸出仍方便閱讀，也不需要在記憶體中組出整份字串。
+    """
+    inner = indent + "    "
+    if isinstance(data, dict) and data:
+        yield "{"
+        separator = "\n"
+        for key, value in data.items():
+            yield f"{separator}{inner}{json.dumps(str(key), ensure_ascii=False)}: "
+            yield from iter_encode_json(value, inner)
+            separator = ",\n"
+        yield "\n" + indent + "}"
+    elif isinstance(data, list) and data and isinstance(data[0], dict):
+        yield "["
+        separator = "\n"
+        for item in data:
+            yield separator + inner + json.dumps(item, ensure_ascii=False)
+            separator = ",\n"
+        yield "\n" + indent + "]"
+    else:
+        yield json.dumps(data, ensure_ascii=False)
+
+
+def atomic_write_json(path: str, data: Any) -> int:
+    """寫入暫存檔並 fsync 後再改名取代原檔，中斷時原檔保持完整；回傳寫入的位元組數"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(iter_encode_json(data))
+            f.flush()
+            os.fsync(f.fileno())
+            size = os.fstat(f.fileno()).st_size
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_directory(directory)
+    return size
+
+
+def _fsync_directory(directory: str):
+    """確保改名本身也寫入磁碟 (Windows 不支援開啟目錄，略過)"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class NamespaceLock:
+    """單一儲存位置的寫入鎖 (可重入)
+
+    同一 process 內以 RLock 序列化各執行緒，跨 process 以鎖定檔 (flock) 序列化。
+    每個儲存位置各自一把鎖，不同使用者的寫入不會互相等待。
+    """
+
+    _registry: Dict[str, "NamespaceLock"] = {}
+    _registry_lock = threading.Lock()
+
+    @classmethod
+    def for_path(cls, lock_file: str) -> "NamespaceLock":
+        key = os.path.abspath(lock_file)
+        with cls._registry_lock:
+            if key not in cls._registry:
+                cls._registry[key] = cls(key)
+            return cls._registry[key]
+
+    def __init__(self, lock_file: str):
+        self.lock_file = lock_file
+        self._rlock = threading.RLock()
+        self._depth = 0
+        self._handle = None
+
+    def __enter__(self) -> "NamespaceLock":
+        self._rlock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            os.makedirs(os.path.dirname(self.lock_file) or ".", exist_ok=True)
+            self._handle = open(self.lock_file, 'a')
+            fcntl.flock(self._handle, fcntl.LOCK_EX)
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0 and self._handle is not None:
+            fcntl.flock(self._handle, fcntl.LOCK_UN)
+            self._handle.close()
+            self._handle = None
+        self._rlock.release()
+
+
+class StorageBackend:
+    """儲存後端介面"""
+
+    def exists(self) -> bool:
+        """是否已有儲存的資料"""
+        raise NotImplementedError
+
+    def cache_key(self) -> str:
+        """process 共用快取的鍵 (儲存位置)"""
+        raise NotImplementedError
+
+    def data_files(self) -> List[str]:
+        """內容變更時會改變的檔案 (用於計算快取簽章)"""
+        raise NotImplementedError
+
+    def lock(self) -> NamespaceLock:
+        """此儲存位置的寫入鎖"""
+        return NamespaceLock.for_path(self.cache_key() + ".lock")
+
+    def signature(self) -> Tuple:
+        """資料檔的 (mtime, size) 簽章，檔案內容變更時會改變"""
+        stats = []
+        for path in self.data_files():
+            try:
+                stat = os.stat(path)
+                stats.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                stats.append(None)
+        return tuple(stats)
+
+    def load_cached(self) -> Tuple[SetsByGroup, CollectionRows]:
+        """以檔案簽章為鍵、同一 process 內共用的 load() 結果
+
+        回傳的資料由所有 session 共用，呼叫端不得直接修改 (需要時請自行複製)。
+        load() 會取得寫入鎖，而寫入端持有寫入鎖時會呼叫 invalidate_cache()，
+        因此載入期間只持有此儲存位置的載入鎖，不持有 _LOAD_CACHE_LOCK。
+        """
+        key = self.cache_key()
+        cached = self._cached(key, self.signature())
+        if cached is not None:
+            return cached
+        with _LOAD_CACHE_LOCK:
+            load_lock = _LOAD_LOCKS.setdefault(key, threading.Lock())
+        with load_lock:
+            # 等待期間其他 session 可能已載入
+            signature = self.signature()
+            cached = self._cached(key, signature)
+            if cached is not None:
+                return cached
+            with _LOAD_CACHE_LOCK:
+                generation = _LOAD_CACHE_GENERATIONS.get(key, 0)
+            sets_by_group, rows = self.load()
+            with _LOAD_CACHE_LOCK:
+                if _LOAD_CACHE_GENERATIONS.get(key, 0) == generation:
+                    _LOAD_CACHE[key] = (signature, sets_by_group, rows)
+            return sets_by_group, rows
+
+    @staticmethod
+    def _cached(key: str, signature: Tuple) -> Optional[Tuple[SetsByGroup, CollectionRows]]:
+        with _LOAD_CACHE_LOCK:
+            cached = _LOAD_CACHE.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1], cached[2]
+        return None
+
+    def invalidate_cache(self):
+        """寫入後清除快取 (避免 mtime 精度不足時讀到舊資料)"""
+        key = self.cache_key()
+        with _LOAD_CACHE_LOCK:
+            _LOAD_CACHE.pop(key, None)
+            _LOAD_CACHE_GENERATIONS[key] = _LOAD_CACHE_GENERATIONS.get(key, 0) + 1
+
+    def bytes_written(self) -> int:
+        """本 process 累計寫入此儲存位置的位元組數"""
+        with _BYTES_WRITTEN_LOCK:
+            return _BYTES_WRITTEN.get(self.cache_key(), 0)
+
+    def _count_bytes(self, size: int):
+        with _BYTES_WRITTEN_LOCK:
+            _BYTES_WRITTEN[self.cache_key()] = _BYTES_WRITTEN.get(self.cache_key(), 0) + size
+
+    def load(self) -> Tuple[SetsByGroup, CollectionRows]:
+        """讀取系列定義與收藏資料"""
+        raise NotImplementedError
+
+    def save_all(self, sets_by_group: SetsByGroup, rows: CollectionRows):
+        """完整寫入系列定義與收藏資料 (取代既有內容，並記錄為目前的格式版本)"""
+        raise NotImplementedError
+
+    def _upgrade(self, from_version: int, sets_by_group: SetsByGroup,
+                 rows: CollectionRows) -> Tuple[SetsByGroup, CollectionRows]:
+        """(在寫入鎖內呼叫) 備份資料檔，套用 from_version 之後的轉換並寫回，回傳轉換後的資料"""
+        backups = backup_files(self.data_files(), from_version)
+        sets_by_group, rows, applied = migrate(sets_by_group, rows, from_version)
+        self.save_all(sets_by_group, rows)
+        print(f"Migrated {self.cache_key()} from schema {from_version} to {SCHEMA_VERSION} "
+              f"({'; '.join(applied)}), backup: {', '.join(backups)}")
+        return sets_by_group, rows
+
+    def save_sets(self, sets_by_group: SetsByGroup, rows: CollectionRows):
+        """寫入系列定義與目前的 Photo 列表
+
+        張數與自訂圖片以儲存中的最新值為準 (可能已被其他 session 更新)，
+        rows 只用來決定有哪些 Photo；不在 rows 中的舊收藏列會被移除。
+        """
+        with self.lock():
+            _, saved_rows = self.load()
+            self.save_all(sets_by_group, self._merge_saved_status(rows, saved_rows))
+
+    def save_set_patches(self, patches: SetPatches):
+        """只更新個別系列 [(團體, 系列, 系列定義, 該系列目前的 Photo 列)]；系列定義為 None 時刪除該系列
+
+        張數與自訂圖片同樣以儲存中的最新值為準；其他系列的定義與收藏列不變。
+        """
+        with self.lock():
+            sets_by_group, rows = self.load()
+            rows_by_id = {row['id']: row for row in rows}
+            for patch in patches:
+                rows_by_id = self._apply_set_patch(sets_by_group, rows_by_id, *patch)
+            self.save_all(sets_by_group, list(rows_by_id.values()))
+
+    @classmethod
+    def _apply_set_patch(cls, sets_by_group: SetsByGroup, rows_by_id: Dict[str, Dict[str, Any]],
+                         group_name: str, set_name: str, set_info: Optional[Dict[str, Any]],
+                         set_rows: CollectionRows) -> Dict[str, Dict[str, Any]]:
+        """套用單一系列的變更 (直接修改 sets_by_group)，回傳新的 {id: 收藏列}；該系列的收藏列移到最後"""
+        sets = sets_by_group.setdefault(group_name, {})
+        if set_info is None:
+            sets.pop(set_name, None)
+        else:
+            sets[set_name] = set_info
+        saved_rows = [rows_by_id[row['id']] for row in set_rows if row['id'] in rows_by_id]
+        patched = {row_id: row for row_id, row in rows_by_id.items()
+                   if not cls._row_in_set(row, group_name, set_name)}
+        for row in cls._merge_saved_status(set_rows, saved_rows):
+            patched[row['id']] = row
+        return patched
+
+    @staticmethod
+    def _merge_saved_status(rows: CollectionRows, saved_rows: CollectionRows) -> CollectionRows:
+        """rows 中已儲存的收藏列改用儲存中的張數與自訂圖片"""
+        saved_by_id = {row['id']: row for row in saved_rows}
+        merged_rows = []
+        for row in rows:
+            saved = saved_by_id.get(row['id'])
+            if saved is not None:
+                row = dict(row, owned_count=saved.get('owned_count') or 0,
+                           custom_image_url=saved.get('custom_image_url'))
+            merged_rows.append(row)
+        return merged_rows
+
+    @staticmethod
+    def _row_in_set(row: Dict[str, Any], group_name: str, set_name: str) -> bool:
+        # 舊版收藏列只有 id (成員_系列_姿勢)，從 id 取出系列名稱
+        row_set_name = row.get('set_name') or row['id'].partition("_")[2].rpartition("_")[0]
+        return row_set_name == set_name and (row.get('group') or group_name) == group_name
+
+    def save_photo_changes(self, rows: CollectionRows, field: str = "owned_count"):
+        """只儲存指定 Photo 的單一欄位變更 (rows 為 Photo.to_dict())"""
+        raise NotImplementedError
+
+    def save_count_deltas(self, deltas: CountDeltas):
+        """以增減量記錄張數變更 [(Photo.to_dict(), 增減量)]，同時寫入時不會遺失其他 session 的變更"""
+        raise NotImplementedError
+
+
+class JsonStorage(StorageBackend):
+    """單一 JSON 檔案，搭配 append-only 變更日誌 (每次張數變更只追加一行)
+
+    系列的新增/編輯/刪除也只追加一筆記錄 (系列定義 + 該系列的 Photo 列)，載入時依序套用。
+
+    日誌第一行記錄日誌 ID；合併 (compact) 時把該 ID 寫入 data_file 的 compacted_journal_id，
+    即使合併後來不及刪除日誌就中斷，下次載入也不會重複套用增減量。這樣留下的舊日誌在載入或
+    追加前刪除 (之後的變更寫入新的日誌)，不會追加到已被視為合併過的日誌而遺失。
+    """
+
+    def __init__(self, data_file: str, journal_file: Optional[str] = None,
+                 compact_bytes: int = 256 * 1024):
+        self.data_file = data_file
+        # journal_file 為 None 時停用日誌，每次變更都重寫整個檔案
+        self.journal_file = journal_file
+        self.compact_bytes = compact_bytes
+
+    def exists(self) -> bool:
+        return os.path.exists(self.data_file)
+
+    def cache_key(self) -> str:
+        return os.path.abspath(self.data_file)
+
+    def data_files(self) -> List[str]:
+        return [self.data_file] + ([self.journal_file] if self.journal_file else [])
+
+    def load(self) -> Tuple[SetsByGroup, CollectionRows]:
+        # 讀取期間持有鎖，避免讀到合併到一半的 data_file/日誌組合
+        with self.lock():
+            full_data = self._read_data_file()
+            sets_by_group = full_data.get('sets') or {}
+            rows = full_data.get('collection', [])
+
+            journal_id, records = self.read_journal()
+            if journal_id is not None and journal_id == full_data.get('compacted_journal_id'):
+                # 合併後來不及刪除的日誌 (內容已包含在 data_file 內)
+                self._remove_journal()
+            elif records:
+                sets_by_group, rows = self._replay_journal(sets_by_group, rows, records)
+
+            # 舊版程式寫入的檔案 (沒有 schema_version) 只在這裡轉換一次
+            from_version = full_data.get('schema_version', 0)
+            if full_data and from_version < SCHEMA_VERSION:
+                sets_by_group, rows = self._upgrade(from_version, sets_by_group, rows)
+
+        return sets_by_group, rows
+
+    def _read_data_file(self) -> Dict[str, Any]:
+        if not os.path.exists(self.data_file):
+            return {}
+        try:
+            with open(self.data_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            # 保留損壞的檔案，避免下一次儲存時以空資料覆蓋而無法救回
+            corrupt_path = f"{self.data_file}.corrupt-{int(time.time())}"
+            shutil.copyfile(self.data_file, corrupt_path)
+            print(f"Warning: JSON Decode Error, resetting sets to default (original kept at {corrupt_path}).")
+        except Exception as e:
+            print(f"Warning: Unexpected error loading JSON: {e}")
+        return {}
+
+    def save_all(self, sets_by_group: SetsByGroup, rows: CollectionRows):
+        with self.lock():
+            data_to_save = {
+                "schema_version": SCHEMA_VERSION,
+                "sets": sets_by_group,
+                "collection": rows
+            }
+            journal_id, _ = self.read_journal()
+            if journal_id:
+                data_to_save["compacted_journal_id"] = journal_id
+
+            self._count_bytes(atomic_write_json(self.data_file, data_to_save))
+
+            # 完整儲存後，日誌中的變更都已包含在 data_file 內，可以清空
+            if self.journal_file:
+                self._remove_journal()
+            self.invalidate_cache()
+
+    def _remove_journal(self):
+        _LIVE_JOURNALS.pop(os.path.abspath(self.journal_file), None)
+        if os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
+
+    def save_photo_changes(self, rows: CollectionRows, field: str = "owned_count"):
+        self._save_records([{"id": r["id"], field: r[field]} for r in rows])
+
+    def save_count_deltas(self, deltas: CountDeltas):
+        self._save_records([{"id": row["id"], "delta": delta} for row, delta in deltas if delta])
+
+    def save_set_patches(self, patches: SetPatches):
+        if not self.exists():
+            # 第一次儲存: 寫出 data_file (系列定義不只存在日誌中)
+            super().save_set_patches(patches)
+            return
+        self._save_records([{"group": group_name, "set_name": set_name, "set": set_info, "rows": set_rows}
+                            for group_name, set_name, set_info, set_rows in patches])
+
+    def _save_records(self, records: List[Dict[str, Any]]):
+        if not records:
+            return
+        with self.lock():
+            if not self.journal_file:
+                sets_by_group, saved_rows = self.load()
+                self.save_all(*self._replay_journal(sets_by_group, saved_rows, records))
+                return
+
+            self.append_journal(records)
+
+            if os.path.getsize(self.journal_file) > self.compact_bytes:
+                self.compact()
+
+    def compact(self):
+        """將日誌合併回 data_file 並清空日誌"""
+        with self.lock():
+            sets_by_group, rows = self.load()
+            self.save_all(sets_by_group, rows)
+
+    def append_journal(self, records: List[Dict[str, Any]]):
+        """將變更記錄追加到日誌檔 (每筆一行 JSON；新日誌的第一行為日誌 ID)"""
+        lines = "".join(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n" for r in records)
+        with self.lock():
+            self._discard_compacted_journal()
+            if not os.path.exists(self.journal_file):
+                journal_id = uuid.uuid4().hex
+                lines = json.dumps({"journal_id": journal_id}) + "\n" + lines
+                _LIVE_JOURNALS[os.path.abspath(self.journal_file)] = (journal_id, self._data_signature())
+            encoded = lines.encode('utf-8')
+            with open(self.journal_file, 'ab') as f:
+                f.write(encoded)
+                f.flush()
+                os.fsync(f.fileno())
+            self._count_bytes(len(encoded))
+            self.invalidate_cache()
+
+    def _discard_compacted_journal(self):
+        """(在寫入鎖內呼叫) 既有日誌的 ID 已記錄為合併過時刪除該日誌
+
+        只讀取日誌的第一行；同一份日誌在 data_file 未改變期間只需確認一次 (不必每次解析 data_file)。
+        """
+        if not os.path.exists(self.journal_file):
+            return
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            try:
+                header = json.loads(f.readline())
+            except json.JSONDecodeError:
+                return
+        journal_id = header.get('journal_id') if isinstance(header, dict) else None
+        if journal_id is None:
+            return
+        path = os.path.abspath(self.journal_file)
+        signature = self._data_signature()
+        if _LIVE_JOURNALS.get(path) == (journal_id, signature):
+            return
+        if self._read_data_file().get('compacted_journal_id') == journal_id:
+            self._remove_journal()
+        else:
+            _LIVE_JOURNALS[path] = (journal_id, signature)
+
+    def _data_signature(self) -> Tuple:
+        try:
+            stat = os.stat(self.data_file)
+        except OSError:
+            return ()
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def read_journal(self) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        """讀取日誌 ID 與所有變更記錄 (忽略寫到一半的損壞行)"""
+        journal_id = None
+        records = []
+        if not self.journal_file or not os.path.exists(self.journal_file):
+            return journal_id, records
+
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if not isinstance(record, dict):
+                    continue
+                if 'journal_id' in record:
+                    journal_id = record['journal_id']
+                elif 'id' in record or 'rows' in record:
+                    records.append(record)
+        return journal_id, records
+
+    @classmethod
+    def _replay_journal(cls, sets_by_group: SetsByGroup, rows: CollectionRows,
+                        records: List[Dict[str, Any]]) -> Tuple[SetsByGroup, CollectionRows]:
+        """依序套用變更記錄 (欄位值為絕對值；delta 為張數增減量；有 rows 的記錄為系列變更)"""
+        rows_by_id = {row['id']: row for row in rows if 'id' in row}
+        for record in records:
+            if 'rows' in record:
+                rows_by_id = cls._apply_set_patch(sets_by_group, rows_by_id, record['group'],
+                                                  record['set_name'], record.get('set'), record['rows'])
+                continue
+            row = rows_by_id.get(record['id'])
+            if row is None:
+                row = rows_by_id[record['id']] = {'id': record['id'], 'owned_count': 0, 'custom_image_url': None}
+            for field in PHOTO_FIELDS:
+                if field in record:
+                    row[field] = record[field]
+            if 'delta' in record:
+                row['owned_count'] = max(0, (row.get('owned_count') or 0) + record['delta'])
+        return sets_by_group, list(rows_by_id.values())
+
+
+class SqliteStorage(StorageBackend):
+    """SQLite 資料庫後端：系列、系列成員/姿勢、收藏列分表儲存並建立索引
+
+    寫入位元組數 (bytes_written) 為估計值: 完整儲存以寫入後的資料庫大小計算，
+    單列更新只計算寫入的欄位資料量 (不含頁面與回滾日誌的額外開銷)。
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sets (
+        group_name TEXT NOT NULL,
+        set_name TEXT NOT NULL,
+        PRIMARY KEY (group_name, set_name)
+    );
+    CREATE TABLE IF NOT EXISTS set_members (
+        group_name TEXT NOT NULL,
+        set_name TEXT NOT NULL,
+        member_name TEXT NOT NULL,
+        pose TEXT NOT NULL,
+        PRIMARY KEY (group_name, set_name, member_name, pose)
+    );
+    CREATE TABLE IF NOT EXISTS collection (
+        id TEXT PRIMARY KEY,
+        set_name TEXT,
+        member_name TEXT,
+        group_name TEXT,
+        pose TEXT,
+        owned_count INTEGER NOT NULL DEFAULT 0,
+        custom_image_url TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_set_members_member ON set_members (member_name);
+    CREATE INDEX IF NOT EXISTS idx_collection_set_name ON collection (set_name);
+    CREATE INDEX IF NOT EXISTS idx_collection_member ON collection (member_name);
+    CREATE INDEX IF NOT EXISTS idx_collection_group ON collection (group_name);
+    """
+
+    INSERT_ROW_SQL = (
+        "INSERT INTO collection (id, set_name, member_name, group_name, pose, owned_count, custom_image_url) "
+        "VALUES (:id, :set_name, :member_name, :group, :pose, :owned_count, :custom_image_url) "
+    )
+
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+        # 資料表只需在此實例第一次連線時建立 (資料庫檔案被刪除後再建立一次)
+        self._schema_ready = False
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """開啟連線並在單一交易中執行，結束後關閉連線"""
+        schema_ready = self._schema_ready and os.path.exists(self.db_file)
+        new_database = not schema_ready and (not os.path.exists(self.db_file) or os.path.getsize(self.db_file) == 0)
+        conn = sqlite3.connect(self.db_file, timeout=30)
+        try:
+            conn.row_factory = sqlite3.Row
+            if not schema_ready:
+                # 新建立的資料庫直接記錄為目前的格式版本 (不需轉換)
+                conn.executescript(self.SCHEMA + (f"PRAGMA user_version = {SCHEMA_VERSION};" if new_database else ""))
+                self._schema_ready = True
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.db_file)
+
+    def cache_key(self) -> str:
+        return os.path.abspath(self.db_file)
+
+    def data_files(self) -> List[str]:
+        return [self.db_file]
+
+    def load(self) -> Tuple[SetsByGroup, CollectionRows]:
+        with self._connect() as conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+                return self._read_all(conn)
+
+        # 舊版程式建立的資料庫 (user_version 較舊) 只在這裡轉換一次
+        with self.lock():
+            with self._connect() as conn:
+                from_version = conn.execute("PRAGMA user_version").fetchone()[0]
+                sets_by_group, rows = self._read_all(conn)
+                if from_version >= SCHEMA_VERSION:
+                    return sets_by_group, rows
+                if not sets_by_group and not rows:
+                    # 新建立的空資料庫不需要轉換
+                    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                    return sets_by_group, rows
+            return self._upgrade(from_version, sets_by_group, rows)
+
+    @classmethod
+    def _read_all(cls, conn: sqlite3.Connection) -> Tuple[SetsByGroup, CollectionRows]:
+        sets_by_group: SetsByGroup = {}
+        # 以 rowid 排序，保留系列與成員/姿勢的新增順序
+        for row in conn.execute("SELECT group_name, set_name FROM sets ORDER BY rowid"):
+            sets_by_group.setdefault(row['group_name'], {})[row['set_name']] = {"members_with_poses": {}}
+
+        for row in conn.execute("SELECT group_name, set_name, member_name, pose FROM set_members ORDER BY rowid"):
+            set_info = sets_by_group.get(row['group_name'], {}).get(row['set_name'])
+            if set_info is not None:
+                set_info["members_with_poses"].setdefault(row['member_name'], []).append(row['pose'])
+
+        rows = [cls._row_to_dict(row) for row in conn.execute("SELECT * FROM collection ORDER BY rowid")]
+        return sets_by_group, rows
+
+    def save_all(self, sets_by_group: SetsByGroup, rows: CollectionRows):
+        with self.lock(), self._connect() as conn:
+            conn.execute("DELETE FROM sets")
+            conn.execute("DELETE FROM set_members")
+            conn.execute("DELETE FROM collection")
+            self._insert_sets(conn, sets_by_group)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.executemany(
+                "INSERT OR REPLACE INTO collection (id, set_name, member_name, group_name, pose, owned_count, custom_image_url) "
+                "VALUES (:id, :set_name, :member_name, :group, :pose, :owned_count, :custom_image_url)",
+                [self._dict_to_params(row) for row in rows]
+            )
+        self._count_bytes(os.path.getsize(self.db_file))
+        self.invalidate_cache()
+
+    def save_photo_changes(self, rows: CollectionRows, field: str = "owned_count"):
+        if field not in PHOTO_FIELDS:
+            raise ValueError(f"Unknown photo field: {field}")
+        # 單列 UPSERT: 只有 field 欄位會被更新
+        params = [self._dict_to_params(row) for row in rows]
+        with self.lock(), self._connect() as conn:
+            conn.executemany(
+                self.INSERT_ROW_SQL + f"ON CONFLICT (id) DO UPDATE SET {field} = excluded.{field}",
+                params
+            )
+        self._count_bytes(sum(self._param_bytes(param) for param in params))
+        self.invalidate_cache()
+
+    def save_count_deltas(self, deltas: CountDeltas):
+        # 在資料庫內累加，不依賴呼叫端看到的舊張數
+        params = []
+        for row, delta in deltas:
+            if delta:
+                param = self._dict_to_params(row)
+                param.update(owned_count=max(0, delta), delta=delta)
+                params.append(param)
+        if not params:
+            return
+        with self.lock(), self._connect() as conn:
+            conn.executemany(
+                self.INSERT_ROW_SQL + "ON CONFLICT (id) DO UPDATE SET owned_count = MAX(0, owned_count + :delta)",
+                params
+            )
+        self._count_bytes(sum(self._param_bytes(param) for param in params))
+        self.invalidate_cache()
+
+    def save_set_patches(self, patches: SetPatches):
+        # 只改動這些系列的列: 已儲存的 Photo 保留張數與自訂圖片，不再屬於系列的 Photo 刪除
+        written_bytes = 0
+        with self.lock(), self._connect() as conn:
+            for group_name, set_name, set_info, rows in patches:
+                params = [self._dict_to_params(row) for row in rows]
+                conn.execute("DELETE FROM set_members WHERE group_name = ? AND set_name = ?", (group_name, set_name))
+                if set_info is None:
+                    conn.execute("DELETE FROM sets WHERE group_name = ? AND set_name = ?", (group_name, set_name))
+                else:
+                    # INSERT OR IGNORE 保留既有系列的 rowid (系列順序不變)
+                    conn.execute("INSERT OR IGNORE INTO sets (group_name, set_name) VALUES (?, ?)",
+                                 (group_name, set_name))
+                    self._insert_sets(conn, {group_name: {set_name: set_info}}, include_sets=False)
+                kept_ids = {param["id"] for param in params}
+                # 欄位為 NULL 的舊收藏列 (只有 id) 同樣由 id 判斷是否屬於此系列
+                removed_ids = [(row['id'],) for row in conn.execute(
+                    "SELECT id, set_name, group_name FROM collection WHERE set_name = ? OR set_name IS NULL",
+                    (set_name,))
+                    if row['id'] not in kept_ids and self._row_in_set(
+                        {"id": row['id'], "set_name": row['set_name'], "group": row['group_name']},
+                        group_name, set_name)]
+                conn.executemany("DELETE FROM collection WHERE id = ?", removed_ids)
+                conn.executemany(self.INSERT_ROW_SQL + "ON CONFLICT (id) DO NOTHING", params)
+                written_bytes += sum(self._param_bytes(param) for param in params)
+        self._count_bytes(written_bytes)
+        self.invalidate_cache()
+
+    @staticmethod
+    def _insert_sets(conn: sqlite3.Connection, sets_by_group: SetsByGroup, include_sets: bool = True):
+        for group_name, sets in sets_by_group.items():
+            for set_name, set_info in sets.items():
+                if include_sets:
+                    conn.execute("INSERT INTO sets (group_name, set_name) VALUES (?, ?)", (group_name, set_name))
+                members_with_poses = normalize_set_info(set_info)["members_with_poses"]
+                conn.executemany(
+                    "INSERT OR IGNORE INTO set_members (group_name, set_name, member_name, pose) VALUES (?, ?, ?, ?)",
+                    [(group_name, set_name, member_name, pose)
+                     for member_name, poses in members_with_poses.items() for pose in poses]
+                )
+
+    @staticmethod
+    def _dict_to_params(row: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "set_name": row.get("set_name"),
+            "member_name": row.get("member_name"),
+            "group": row.get("group"),
+            "pose": row.get("pose"),
+            "owned_count": row.get("owned_count", 0),
+            "custom_image_url": row.get("custom_image_url"),
+        }
+
+    @staticmethod
+    def _param_bytes(param: Dict[str, Any]) -> int:
+        """一列資料的欄位位元組數 (估計寫入量用)"""
+        return sum(len(str(value).encode('utf-8')) for value in param.values() if value is not None)
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "set_name": row["set_name"],
+            "member_name": row["member_name"],
+            "group": row["group_name"],
+            "pose": row["pose"],
+            "owned_count": row["owned_count"],
+            "custom_image_url": row["custom_image_url"],
+        }
+
+
+class BackgroundWriter:
+    """背景寫入執行緒：合併短時間內的多次變更，一次寫入儲存後端
+
+    UI 端只把變更放入佇列 (不等待磁碟 I/O)；執行緒在第一筆變更進來後等待 delay 秒，
+    把同一儲存位置的連續變更合併 (張數增減量相加、同欄位只保留最後的值、系列定義只保留最新一份)
+    後依序寫入。process 結束時 (atexit) 會寫完所有尚未寫入的變更。
+
+    最近完成的寫入 (種類、列數、位元組數、耗時) 保留在 recent_writes，供效能分析面板以 writes_since() 讀取。
+    """
+
+    RECENT_WRITES_LIMIT = 200
+
+    def __init__(self, delay: float = 0.3):
+        self.delay = delay
+        self._condition = threading.Condition()
+        # {儲存位置: (儲存後端, [待寫入的批次])}；批次依加入順序寫入
+        self._pending: Dict[str, Tuple[StorageBackend, List[List[Any]]]] = {}
+        self._writing = set()
+        self._flush_requested = False
+        # 版本: 本 process 送出的變更數、偵測到的外部 (其他 process) 寫入次數
+        self._submitted: Dict[str, int] = {}
+        self._external: Dict[str, int] = {}
+        self._written_signatures: Dict[str, Tuple] = {}
+        self.recent_writes = deque(maxlen=self.RECENT_WRITES_LIMIT)
+        self._write_seq = 0
+        self._thread = threading.Thread(target=self._run, name="sakamichi-writer", daemon=True)
+        self._thread.start()
+        # 結束時最多等待 10 秒，避免寫入持續失敗時無法結束
+        atexit.register(self.flush, 10)
+
+    def submit_count_deltas(self, storage: StorageBackend, deltas: CountDeltas):
+        """送出張數增減量 (同一張生寫真的連續增減量會相加)"""
+        def merge(batch):
+            for row, delta in deltas:
+                if row['id'] in batch:
+                    batch[row['id']] = (batch[row['id']][0], batch[row['id']][1] + delta)
+                else:
+                    batch[row['id']] = (row, delta)
+        self._submit(storage, "deltas", None, merge)
+
+    def submit_photo_changes(self, storage: StorageBackend, rows: CollectionRows, field: str = "owned_count"):
+        """送出單一欄位的變更 (同一張生寫真只保留最後的值)"""
+        def merge(batch):
+            for row in rows:
+                batch[row['id']] = row
+        self._submit(storage, "fields", field, merge)
+
+    def submit_sets(self, storage: StorageBackend, sets_by_group: SetsByGroup, rows: CollectionRows):
+        """送出系列定義 (連續的系列變更只寫入最新一份)"""
+        def merge(batch):
+            batch.clear()
+            batch['sets'] = (sets_by_group, rows)
+        self._submit(storage, "sets", None, merge)
+
+    def submit_set_patch(self, storage: StorageBackend, group_name: str, set_name: str,
+                         set_info: Optional[Dict[str, Any]], rows: CollectionRows):
+        """送出單一系列的變更 (set_info 為 None 時刪除；同一系列的連續變更只寫入最新一份)"""
+        def merge(batch):
+            batch[(group_name, set_name)] = (group_name, set_name, set_info, rows)
+        self._submit(storage, "set_patches", None, merge)
+
+    def submit_history(self, storage: StorageBackend, history: Any):
+        """送出復原/重做歷史 (history.write_pending() 寫入所有尚未寫入的記錄)
+
+        與 storage 的變更一起處理 (flush(storage=...) 時一併寫完)；同一儲存位置只排入一個批次，
+        不會把張數增減量的批次切開。歷史不是收藏資料，不改變 version()。
+        """
+        key = storage.cache_key()
+        with self._condition:
+            _, batches = self._pending.setdefault(key, (storage, []))
+            if not any(batch[0] == "history" for batch in batches):
+                batches.append(["history", None, {"history": history}])
+            self._condition.notify_all()
+
+    def _submit(self, storage: StorageBackend, kind: str, field: Optional[str], merge):
+        key = storage.cache_key()
+        with self._condition:
+            _, batches = self._pending.setdefault(key, (storage, []))
+            if not batches or batches[-1][0] != kind or batches[-1][1] != field:
+                batches.append([kind, field, {}])
+            merge(batches[-1][2])
+            self._submitted[key] = self._submitted.get(key, 0) + 1
+            self._condition.notify_all()
+
+    def version(self, storage: StorageBackend) -> Tuple[int, int]:
+        """儲存位置的版本，任何 session 送出變更或其他 process 寫入檔案後都會改變"""
+        key = storage.cache_key()
+        signature = storage.signature()
+        with self._condition:
+            if key not in self._writing and key not in self._pending:
+                self._check_external_write(key, signature)
+            return self._submitted.get(key, 0), self._external.get(key, 0)
+
+    def _check_external_write(self, key: str, signature: Tuple):
+        """檔案簽章與本執行緒上次寫入後不同時，代表其他 process 寫入過 (呼叫時不需持有鎖)"""
+        with self._condition:
+            written = self._written_signatures.get(key)
+            if written is not None and written != signature:
+                self._external[key] = self._external.get(key, 0) + 1
+            self._written_signatures[key] = signature
+
+    def writes_since(self, storage: StorageBackend, seq: int) -> Tuple[List[Dict[str, Any]], int]:
+        """回傳此儲存位置在序號 seq 之後完成的寫入記錄，以及目前最新的序號"""
+        key = storage.cache_key()
+        with self._condition:
+            writes = [dict(write) for write in self.recent_writes if write['seq'] > seq and write['key'] == key]
+            return writes, self._write_seq
+
+    def _record_write(self, key: str, kind: str, rows: int, size: int, seconds: float):
+        with self._condition:
+            self._write_seq += 1
+            self.recent_writes.append({
+                'seq': self._write_seq, 'key': key, 'kind': kind, 'rows': rows,
+                'bytes': size, 'ms': seconds * 1000, 'finished_at': time.time(),
+            })
+
+    def flush(self, timeout: Optional[float] = None, storage: Optional[StorageBackend] = None) -> bool:
+        """立即寫入待寫入的變更並等待完成，回傳是否已全部寫入
+
+        指定 storage 時只處理該儲存位置: 尚未開始寫入的變更直接在呼叫端寫入，
+        不需等待背景執行緒先寫完其他使用者的變更。
+        """
+        key = storage.cache_key() if storage is not None else None
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                if key is None:
+                    busy = self._pending or self._writing
+                else:
+                    busy = key in self._pending or key in self._writing
+                if not busy:
+                    return True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                if key is not None and key not in self._writing:
+                    self._write_pending([key])
+                    continue
+                if not self._thread.is_alive():
+                    # 執行緒已停止 (例如直譯器關閉中)，改在呼叫端直接寫入
+                    self._write_pending()
+                    continue
+                # 寫入執行緒處理後會清除要求 (逾時返回也不會留下)，等待期間有新的變更時再次要求
+                if self._pending and not self._flush_requested:
+                    self._flush_requested = True
+                    self._condition.notify_all()
+                self._condition.wait(remaining)
+
+    def _ready_key(self, keys: Optional[List[str]], attempted: set) -> Optional[str]:
+        """有待寫入變更、且沒有其他執行緒正在寫入的儲存位置"""
+        for key in (self._pending if keys is None else keys):
+            if key in self._pending and key not in self._writing and key not in attempted:
+                return key
+        return None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._ready_key(None, set()) is None:
+                    self._condition.wait()
+                # 等待 delay 秒收集更多變更 (要求 flush 時立即寫入)
+                deadline = time.monotonic() + self.delay
+                while not self._flush_requested:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                self._flush_requested = False
+                self._write_pending()
+
+    def _write_pending(self, keys: Optional[List[str]] = None):
+        """寫入待寫入的批次 (keys 為 None 時為所有儲存位置；呼叫時需持有 _condition)
+
+        一次取出一個儲存位置寫入，寫完立即通知等待中的 flush；正在由其他執行緒寫入的位置略過
+        (同一位置的批次依序寫入)。
+        """
+        attempted = set()
+        while True:
+            key = self._ready_key(keys, attempted)
+            if key is None:
+                break
+            attempted.add(key)
+            storage, batches = self._pending.pop(key)
+            self._writing.add(key)
+            self._condition.release()
+            written = 0
+            try:
+                with storage.lock():
+                    self._check_external_write(key, storage.signature())
+                    for batch in batches:
+                        bytes_before = storage.bytes_written()
+                        started_at = time.perf_counter()
+                        self._write_batch(storage, *batch)
+                        self._record_write(key, batch[0], self._batch_rows(*batch),
+                                           storage.bytes_written() - bytes_before,
+                                           time.perf_counter() - started_at)
+                        written += 1
+                    signature = storage.signature()
+                with self._condition:
+                    self._written_signatures[key] = signature
+            except Exception as e:
+                print(f"Warning: Background save failed, will retry: {e}")
+            finally:
+                self._condition.acquire()
+                self._writing.discard(key)
+                # 寫入失敗的批次放回佇列最前面，下一輪重試
+                if written < len(batches):
+                    _, newer_batches = self._pending.get(key, (storage, []))
+                    self._pending[key] = (storage, batches[written:] + newer_batches)
+                self._condition.notify_all()
+            if written < len(batches):
+                self._condition.wait(self.delay)
+
+    @staticmethod
+    def _batch_rows(kind: str, field: Optional[str], batch: Dict[str, Any]) -> int:
+        if kind == "sets":
+            return len(batch['sets'][1])
+        if kind == "set_patches":
+            return sum(len(patch[3]) for patch in batch.values())
+        return len(batch)
+
+    @staticmethod
+    def _write_batch(storage: StorageBackend, kind: str, field: Optional[str], batch: Dict[str, Any]):
+        if kind == "deltas":
+            storage.save_count_deltas(list(batch.values()))
+        elif kind == "fields":
+            storage.save_photo_changes(list(batch.values()), field)
+        elif kind == "sets":
+            storage.save_sets(*batch['sets'])
+        elif kind == "set_patches":
+            storage.save_set_patches(list(batch.values()))
+        elif kind == "history":
+            storage._count_bytes(batch["history"].write_pending())
+
+
+_BACKGROUND_WRITER: Optional[BackgroundWriter] = None
+_BACKGROUND_WRITER_LOCK = threading.Lock()
+
+
+def get_background_writer(delay: float = 0.3) -> BackgroundWriter:
+    """同一 process 共用的背景寫入執行緒"""
+    global _BACKGROUND_WRITER
+    with _BACKGROUND_WRITER_LOCK:
+        if _BACKGROUND_WRITER is None:
+            _BACKGROUND_WRITER = BackgroundWriter(delay)
+        return _BACKGROUND_WRITER
+
+
+def create_storage(backend: str, data_file: str, journal_file: Optional[str] = None,
+                   sqlite_file: Optional[str] = None, compact_bytes: int = 256 * 1024) -> StorageBackend:
+    """依設定建立儲存後端 ("json" 或 "sqlite")"""
+    if backend == "sqlite":
+        storage = SqliteStorage(sqlite_file or os.path.splitext(data_file)[0] + ".sqlite3")
+        # 第一次使用 SQLite 時，自動匯入既有的 JSON 資料
+        if not storage.exists() and os.path.exists(data_file):
+            with storage.lock():
+                if not storage.exists():
+                    migrate_json_to_sqlite(data_file, storage.db_file, journal_file)
+        return storage
+    if backend == "json":
+        return JsonStorage(data_file, journal_file, compact_bytes)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def migrate_json_to_sqlite(json_file: str, sqlite_file: str, journal_file: Optional[str] = None) -> int:
+    """將 JSON 檔 (含變更日誌) 匯入 SQLite 資料庫，回傳匯入的收藏列數"""
+    # JsonStorage.load() 已將舊版格式轉換為目前的格式
+    sets_by_group, rows = JsonStorage(json_file, journal_file).load()
+    SqliteStorage(sqlite_file).save_all(sets_by_group, fill_row_fields(sets_by_group, rows))
+    return len(rows)
+
+
+def fill_row_fields(sets_by_group: SetsByGroup, rows: CollectionRows) -> CollectionRows:
+    """補上只有 id 的收藏列 (例如由日誌重播產生) 的系列、成員、姿勢與團體欄位
+
+    id 為「成員_系列_姿勢」；團體取自包含該成員的同名系列，找不到時保持空白。
+    """
+    groups_by_member_set = {(member_name, set_name): group_name
+                            for group_name, sets in sets_by_group.items()
+                            for set_name, set_info in sets.items()
+                            for member_name in normalize_set_info(set_info)["members_with_poses"]}
+    filled_rows = []
+    for row in rows:
+        if not (row.get('set_name') and row.get('member_name') and row.get('pose') and row.get('group')):
+            member_name, _, rest = row['id'].partition("_")
+            set_name, _, pose = rest.rpartition("_")
+            row = dict(row, set_name=row.get('set_name') or set_name,
+                       member_name=row.get('member_name') or member_name, pose=row.get('pose') or pose)
+            row['group'] = row.get('group') or groups_by_member_set.get((row['member_name'], row['set_name']))
+        filled_rows.append(row)
+    return filled_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="將 JSON 收藏資料匯入 SQLite 資料庫")
+    parser.add_argument("json_file", nargs="?", default="sakamichi_collection_data.json")
+    parser.add_argument("sqlite_file", nargs="?", default="sakamichi_collection_data.sqlite3")
+    parser.add_argument("--journal", default="sakamichi_collection_data.journal.jsonl",
+                        help="一併套用的變更日誌檔")
+    args = parser.parse_args()
+
+    count = migrate_json_to_sqlite(args.json_file, args.sqlite_file, args.journal)
+    print(f"Imported {count} collection rows into {args.sqlite_file}")
+
+
+if __name__ == "__main__":
+    main()
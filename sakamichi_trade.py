@@ -0,0 +1,301 @@
+"""坂道生寫真收藏追蹤器 - 多位收藏者之間的交換配對 (不依賴 Streamlit)
+
+每位收藏者的每張生寫真 (系列定義中有的) 以目標張數 (預設 1) 區分:
+- 多餘 (surplus): 張數 - 目標 > 0 的部分，可以拿來交換
+- 缺少 (missing): 張數為 0
+
+Photo ID 先轉為整數代碼，每位收藏者保存多餘/缺少的代碼；反向索引 (代碼 -> 持有多餘者 / 缺少者)
+以 NumPy 的 CSR 陣列保存。「a 能給 b 幾種」的矩陣 G 由多餘與缺少的 0/1 矩陣分段相乘求得
+(收藏者數 x 收藏者數，記憶體不隨 Photo 數增加)，再依序配對:
+
+1. 兩人互換: 依 min(G[a, b], G[b, a]) 由大到小，逐一確認實際的生寫真並扣除
+2. 三人循環 (a -> b -> c -> a): 在兩人互換之後剩餘的多餘/缺少上，依 min(G[a, b], G[b, c], G[c, a]) 配對
+
+收藏者可以是收藏者名稱 (sakamichi_users/<名稱>/ 或留空的預設收藏) 或匯出的 CSV / JSON Lines 檔:
+
+    python sakamichi_trade.py alice bob carol
+    python sakamichi_trade.py exports/*.jsonl --top 20
+    python sakamichi_trade.py --all-users
+"""
+import argparse
+import os
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from sakamichi_catalog import InternTable
+from sakamichi_core import USERS_DIR, create_user_storage, normalize_user_namespace
+from sakamichi_roster import get_roster
+from sakamichi_transfer import format_from_path, parse_import_row, read_rows
+
+DEFAULT_TARGET = 1
+# G 矩陣分段相乘時每段的 Photo 數 (每段的 0/1 矩陣為 收藏者數 x 段長 的 float32)
+MATRIX_CHUNK = 16384
+# 每位收藏者最多保留的三人循環候選數
+CYCLE_CANDIDATES_PER_COLLECTOR = 4
+
+
+class Collector:
+    """一位收藏者的多餘 {Photo 代碼: 多餘張數} 與缺少的 Photo 代碼 (配對時會直接扣除)"""
+
+    def __init__(self, name: str, surplus: Dict[int, int], missing: Set[int]):
+        self.name = name
+        self.surplus = surplus
+        self.missing = missing
+        # 還有多餘的 Photo 代碼 (與 missing 取交集即為可以給對方的生寫真)
+        self.available: Set[int] = {code for code, extra in surplus.items() if extra > 0}
+
+    def surplus_codes(self) -> np.ndarray:
+        return np.fromiter(sorted(self.available), dtype=np.int64)
+
+    def missing_codes(self) -> np.ndarray:
+        return np.fromiter(sorted(self.missing), dtype=np.int64)
+
+
+class PairTrade:
+    """兩人互換: a 給 b 的生寫真與 b 給 a 的生寫真 (張數相同)"""
+
+    def __init__(self, a: str, b: str, a_gives: List[str], b_gives: List[str]):
+        self.a, self.b = a, b
+        self.a_gives, self.b_gives = a_gives, b_gives
+
+    def __len__(self):
+        return len(self.a_gives)
+
+    def __repr__(self):
+        return f"PairTrade({self.a} <-> {self.b}, {len(self)} each)"
+
+
+class CycleTrade:
+    """多人循環: members[i] 給 members[i + 1] (最後一人給第一人) 的生寫真為 gives[i]"""
+
+    def __init__(self, members: Sequence[str], gives: List[List[str]]):
+        self.members = list(members)
+        self.gives = gives
+
+    def __len__(self):
+        return len(self.gives[0])
+
+    def __repr__(self):
+        return f"CycleTrade({' -> '.join(self.members)} -> {self.members[0]}, {len(self)} each)"
+
+
+class TradeIndex:
+    """多位收藏者的多餘/缺少索引與交換配對"""
+
+    def __init__(self, target: int = DEFAULT_TARGET):
+        self.target = target
+        self.photo_ids = InternTable()
+        self.collectors: List[Collector] = []
+
+    def add_collector(self, name: str, counts: Iterable[Tuple[str, int]]) -> Collector:
+        """加入一位收藏者: counts 為系列定義中每張生寫真的 (Photo ID, 張數)"""
+        surplus: Dict[int, int] = {}
+        missing: Set[int] = set()
+        code = self.photo_ids.code
+        target = self.target
+        for photo_id, owned_count in counts:
+            if owned_count <= 0:
+                missing.add(code(photo_id))
+            elif owned_count > target:
+                surplus[code(photo_id)] = owned_count - target
+        collector = Collector(name, surplus, missing)
+        self.collectors.append(collector)
+        return collector
+
+    # --- 反向索引 ---
+    def inverted_index(self, missing: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """(offsets, collectors) CSR 陣列: 代碼 p 的持有多餘者 (missing=True 時為缺少者) 為
+        collectors[offsets[p]:offsets[p + 1]]"""
+        per_collector = [c.missing_codes() if missing else c.surplus_codes() for c in self.collectors]
+        codes = np.concatenate(per_collector) if per_collector else np.zeros(0, dtype=np.int64)
+        owners = np.repeat(np.arange(len(per_collector), dtype=np.int32), [len(a) for a in per_collector])
+        order = np.argsort(codes, kind='stable')
+        offsets = np.zeros(len(self.photo_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=len(self.photo_ids)), out=offsets[1:])
+        return offsets, owners[order]
+
+    def holders_of(self, photo_id: str) -> List[str]:
+        """有多餘這張生寫真的收藏者"""
+        return self._lookup(photo_id, missing=False)
+
+    def seekers_of(self, photo_id: str) -> List[str]:
+        """缺少這張生寫真的收藏者"""
+        return self._lookup(photo_id, missing=True)
+
+    def _lookup(self, photo_id: str, missing: bool) -> List[str]:
+        code = self.photo_ids.lookup(photo_id)
+        if code is None:
+            return []
+        offsets, owners = self.inverted_index(missing)
+        return [self.collectors[i].name for i in owners[offsets[code]:offsets[code + 1]]]
+
+    # --- 配對 ---
+    def give_matrix(self) -> np.ndarray:
+        """G[a, b] = a 的多餘中 b 缺少的種類數 (以目前剩餘的多餘/缺少計算)"""
+        count = len(self.collectors)
+        photo_count = len(self.photo_ids)
+        surplus = [c.surplus_codes() for c in self.collectors]
+        missing = [c.missing_codes() for c in self.collectors]
+        give = np.zeros((count, count), dtype=np.float32)
+        for start in range(0, photo_count, MATRIX_CHUNK):
+            stop = min(start + MATRIX_CHUNK, photo_count)
+            surplus_chunk = self._indicator_chunk(surplus, start, stop)
+            missing_chunk = self._indicator_chunk(missing, start, stop)
+            give += surplus_chunk @ missing_chunk.T
+        np.fill_diagonal(give, 0)
+        # float32 的整數在 2^24 以內是精確的 (每段最多 MATRIX_CHUNK 種)
+        return give.astype(np.int64)
+
+    @staticmethod
+    def _indicator_chunk(codes_per_collector: List[np.ndarray], start: int, stop: int) -> np.ndarray:
+        chunk = np.zeros((len(codes_per_collector), stop - start), dtype=np.float32)
+        for row, codes in enumerate(codes_per_collector):
+            lo, hi = np.searchsorted(codes, (start, stop))
+            chunk[row, codes[lo:hi] - start] = 1.0
+        return chunk
+
+    @staticmethod
+    def _transferable(giver: Collector, receiver: Collector) -> List[int]:
+        """giver 目前可以給 receiver 的 Photo 代碼 (由小到大)"""
+        return sorted(giver.available & receiver.missing)
+
+    @staticmethod
+    def _commit(giver: Collector, receiver: Collector, codes: List[int]):
+        for code in codes:
+            giver.surplus[code] -= 1
+            if giver.surplus[code] == 0:
+                giver.available.discard(code)
+            receiver.missing.discard(code)
+
+    def match_pairs(self, limit: Optional[int] = None) -> List[PairTrade]:
+        """兩人互換 (依可互換的張數由多到少，貪婪地確定並扣除)"""
+        give = self.give_matrix()
+        mutual = np.triu(np.minimum(give, give.T), k=1)
+        candidates = np.flatnonzero(mutual)
+        candidates = candidates[np.argsort(-mutual.ravel()[candidates], kind='stable')]
+
+        trades = []
+        for flat in candidates:
+            if limit is not None and len(trades) >= limit:
+                break
+            a, b = divmod(int(flat), len(self.collectors))
+            collector_a, collector_b = self.collectors[a], self.collectors[b]
+            a_gives = self._transferable(collector_a, collector_b)
+            b_gives = self._transferable(collector_b, collector_a)
+            size = min(len(a_gives), len(b_gives))
+            if size == 0:
+                continue
+            a_gives, b_gives = a_gives[:size], b_gives[:size]
+            self._commit(collector_a, collector_b, a_gives)
+            self._commit(collector_b, collector_a, b_gives)
+            trades.append(PairTrade(collector_a.name, collector_b.name,
+                                    self._photo_ids(a_gives), self._photo_ids(b_gives)))
+        return trades
+
+    def match_cycles(self, limit: Optional[int] = None) -> List[CycleTrade]:
+        """三人循環 a -> b -> c -> a (通常在 match_pairs 之後，處理兩人之間無法互換的部分)"""
+        give = self.give_matrix()
+        count = len(self.collectors)
+        candidates = []
+        for a in range(count):
+            # 只找 b, c > a 的循環 (同一循環只出現一次)；value[b, c] = min(G[a, b], G[b, c], G[c, a])
+            rest = slice(a + 1, count)
+            value = np.minimum(np.minimum(give[a, rest][:, None], give[rest, rest]), give[rest, a][None, :])
+            best = np.flatnonzero(value)
+            if len(best) > CYCLE_CANDIDATES_PER_COLLECTOR:
+                best = best[np.argpartition(-value.ravel()[best], CYCLE_CANDIDATES_PER_COLLECTOR)
+                            [:CYCLE_CANDIDATES_PER_COLLECTOR]]
+            for flat in best:
+                b, c = divmod(int(flat), count - a - 1)
+                candidates.append((int(value.ravel()[flat]), a, a + 1 + b, a + 1 + c))
+        candidates.sort(key=lambda candidate: (-candidate[0], candidate[1:]))
+
+        trades = []
+        for _, *members in candidates:
+            if limit is not None and len(trades) >= limit:
+                break
+            cycle = [self.collectors[i] for i in members]
+            edges = list(zip(cycle, cycle[1:] + cycle[:1]))
+            gives = [self._transferable(giver, receiver) for giver, receiver in edges]
+            size = min(len(codes) for codes in gives)
+            if size == 0:
+                continue
+            gives = [codes[:size] for codes in gives]
+            for (giver, receiver), codes in zip(edges, gives):
+                self._commit(giver, receiver, codes)
+            trades.append(CycleTrade([c.name for c in cycle], [self._photo_ids(codes) for codes in gives]))
+        return trades
+
+    def _photo_ids(self, codes: List[int]) -> List[str]:
+        return [self.photo_ids[code] for code in codes]
+
+
+# --- 載入收藏者 ---
+def counts_from_storage(namespace: str, backend: Optional[str] = None) -> List[Tuple[str, int]]:
+    """收藏者資料中系列定義的每張生寫真的 (Photo ID, 張數)"""
+    sets_by_group, rows = create_user_storage(namespace, backend).load_cached()
+    owned = {row['id']: row.get('owned_count') or 0 for row in rows}
+    return [
+        (photo_id, owned.get(photo_id, 0))
+        for sets in sets_by_group.values()
+        for set_name, set_info in sets.items()
+        for member_name, poses in set_info["members_with_poses"].items()
+        for photo_id in (f"{member_name}_{set_name}_{pose_name}" for pose_name in poses)
+    ]
+
+
+def counts_from_export(path: str) -> List[Tuple[str, int]]:
+    """匯出的 CSV / JSON Lines 檔 (sakamichi_transfer 格式) 的 (Photo ID, 張數)，略過格式錯誤的列"""
+    counts = []
+    roster = get_roster()
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        for record in read_rows(f, format_from_path(path)):
+            try:
+                row = parse_import_row(record, roster)
+            except ValueError:
+                continue
+            counts.append((row['id'], row['owned_count']))
+    return counts
+
+
+def load_trade_index(sources: Sequence[str], backend: Optional[str] = None,
+                     target: int = DEFAULT_TARGET) -> TradeIndex:
+    """sources 為收藏者名稱或匯出檔路徑 (.csv / .jsonl)"""
+    index = TradeIndex(target)
+    for source in sources:
+        if os.path.splitext(source)[1].lower() in (".csv", ".jsonl", ".ndjson"):
+            index.add_collector(os.path.splitext(os.path.basename(source))[0], counts_from_export(source))
+        else:
+            index.add_collector(source or "(預設)", counts_from_storage(normalize_user_namespace(source), backend))
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多位收藏者之間的交換配對")
+    parser.add_argument("sources", nargs="*", help="收藏者名稱或匯出檔 (.csv / .jsonl)")
+    parser.add_argument("--all-users", action="store_true", help=f"加入 {USERS_DIR}/ 下的所有收藏者")
+    parser.add_argument("--backend", choices=("json", "sqlite"), help="儲存後端 (預設依 SAKAMICHI_STORAGE)")
+    parser.add_argument("--target", type=int, default=DEFAULT_TARGET, help="每張生寫真要保留的張數")
+    parser.add_argument("--top", type=int, default=50, help="兩人互換與三人循環各最多列出幾組")
+    args = parser.parse_args()
+
+    sources = list(args.sources)
+    if args.all_users and os.path.isdir(USERS_DIR):
+        sources += sorted(name for name in os.listdir(USERS_DIR) if os.path.isdir(os.path.join(USERS_DIR, name)))
+    if len(sources) < 2:
+        parser.error("at least two collectors are needed")
+
+    index = load_trade_index(sources, args.backend, args.target)
+    for trade in index.match_pairs(args.top):
+        print(f"{trade.a} <-> {trade.b} ({len(trade)} 張)")
+        print(f"  {trade.a} -> {trade.b}: {', '.join(trade.a_gives)}")
+        print(f"  {trade.b} -> {trade.a}: {', '.join(trade.b_gives)}")
+    for trade in index.match_cycles(args.top):
+        print(f"{' -> '.join(trade.members)} -> {trade.members[0]} ({len(trade)} 張)")
+        for giver, receiver, photo_ids in zip(trade.members, trade.members[1:] + trade.members[:1], trade.gives):
+            print(f"  {giver} -> {receiver}: {', '.join(photo_ids)}")
+
+
+if __name__ == "__main__":
+    main()
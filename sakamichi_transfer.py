@@ -0,0 +1,217 @@
+"""坂道生寫真收藏追蹤器 - 收藏的匯入/匯出 (CSV、JSON Lines，不依賴 Streamlit)
+
+每張生寫真一列: id, group, set_name, member_name, pose, owned_count。系列定義由各列的
+(團體, 系列, 成員, 姿勢) 組成，因此同一份檔案可同時匯出/匯入系列與張數。
+
+匯出逐列寫出 (不在記憶體中組出整份檔案)；匯入逐列解析、分批合併到收藏 (張數以匯入的值為準，
+自訂圖片保留原本的值)，最後只儲存一次:
+
+    python sakamichi_transfer.py export collection.csv
+    python sakamichi_transfer.py import trade_group.jsonl --user alice
+"""
+import argparse
+import copy
+import csv
+import io
+import json
+import os
+from itertools import islice
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional
+
+from sakamichi_core import DEFAULT_SETS_BY_GROUP, Group, Pose, create_user_storage, normalize_user_namespace
+from sakamichi_roster import Roster, get_roster
+from sakamichi_storage import BackgroundWriter, CollectionRows, SetsByGroup, StorageBackend
+
+EXPORT_FIELDS = ("id", "group", "set_name", "member_name", "pose", "owned_count")
+FORMATS = ("csv", "jsonl")
+IMPORT_BATCH_SIZE = 5000
+# 匯入結果中最多保留的錯誤訊息數
+MAX_REPORTED_ERRORS = 20
+
+GROUP_VALUES = {group.value for group in Group}
+# 姿勢可以寫代碼 (Y) 或顯示名稱 (ヨリ)
+POSE_KEYS = {**{pose.value: pose.name for pose in Pose}, **{pose.name: pose.name for pose in Pose}}
+
+
+def format_from_path(path: str) -> str:
+    """依副檔名判斷格式 (.csv 或 .jsonl/.ndjson)"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"Unknown file format: {path} (expected .csv or .jsonl)")
+
+
+# --- 匯出 ---
+def iter_collection_rows(sets_by_group: SetsByGroup, rows: CollectionRows) -> Iterator[Dict[str, Any]]:
+    """依系列定義的順序逐列產生匯出資料 (未收藏的生寫真張數為 0)"""
+    counts = {row['id']: row.get('owned_count') or 0 for row in rows}
+    for group_name, sets in sets_by_group.items():
+        for set_name, set_info in sets.items():
+            for member_name, poses in set_info["members_with_poses"].items():
+                for pose_name in poses:
+                    photo_id = f"{member_name}_{set_name}_{pose_name}"
+                    yield {"id": photo_id, "group": group_name, "set_name": set_name, "member_name": member_name,
+                           "pose": pose_name, "owned_count": counts.get(photo_id, 0)}
+
+
+def write_rows(rows: Iterable[Dict[str, Any]], f: IO[str], fmt: str) -> int:
+    """逐列寫入 CSV 或 JSON Lines，回傳寫入的列數"""
+    written = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(f, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            written += 1
+    elif fmt == "jsonl":
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n")
+            written += 1
+    else:
+        raise ValueError(f"Unknown format: {fmt}")
+    return written
+
+
+def export_collection(storage: StorageBackend, f: IO[str], fmt: str,
+                      writer: Optional[BackgroundWriter] = None) -> int:
+    """匯出收藏到已開啟的文字檔，回傳列數 (writer 有尚未寫入的變更時先寫完)"""
+    if writer is not None:
+        writer.flush(storage=storage)
+    sets_by_group, rows = storage.load_cached()
+    return write_rows(iter_collection_rows(sets_by_group, rows), f, fmt)
+
+
+def export_text(storage: StorageBackend, fmt: str, writer: Optional[BackgroundWriter] = None) -> str:
+    """匯出為字串 (供 st.download_button 使用)"""
+    buffer = io.StringIO()
+    export_collection(storage, buffer, fmt, writer)
+    return buffer.getvalue()
+
+
+# --- 匯入 ---
+def read_rows(f: IO[str], fmt: str) -> Iterator[Dict[str, Any]]:
+    """逐列讀取 CSV (第一列為欄位名稱) 或 JSON Lines"""
+    if fmt == "csv":
+        yield from csv.DictReader(f)
+    elif fmt == "jsonl":
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    record = None
+                yield record if isinstance(record, dict) else {}
+    else:
+        raise ValueError(f"Unknown format: {fmt}")
+
+
+def parse_import_row(record: Dict[str, Any], roster: Optional[Roster] = None) -> Dict[str, Any]:
+    """驗證並正規化一列匯入資料，格式錯誤時拋出 ValueError (成員以 roster 比對，包含畢業成員)"""
+    member_name = str(record.get("member_name") or "").strip()
+    set_name = str(record.get("set_name") or "").strip()
+    pose_name = POSE_KEYS.get(str(record.get("pose") or "").strip())
+    member = (roster or get_roster()).get(member_name)
+
+    if member is None:
+        raise ValueError(f"unknown member {member_name!r}")
+    group_name = str(record.get("group") or "").strip() or member.group.value
+    if group_name not in GROUP_VALUES or member.group.value != group_name:
+        raise ValueError(f"member {member_name!r} is not in group {group_name!r}")
+    if not set_name:
+        raise ValueError("missing set_name")
+    if pose_name is None:
+        raise ValueError(f"unknown pose {record.get('pose')!r}")
+    try:
+        owned_count = int(record.get("owned_count") or 0)
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid owned_count {record.get('owned_count')!r}")
+    if owned_count < 0:
+        raise ValueError(f"negative owned_count {owned_count}")
+
+    return {"id": f"{member_name}_{set_name}_{pose_name}", "set_name": set_name, "member_name": member_name,
+            "group": group_name, "pose": pose_name, "owned_count": owned_count}
+
+
+def merge_import_batch(batch: List[Dict[str, Any]], sets_by_group: SetsByGroup,
+                       rows_by_id: Dict[str, Dict[str, Any]]):
+    """將一批已驗證的列合併到系列定義 (加入缺少的系列/成員/姿勢) 與收藏列 (張數以匯入的值為準)"""
+    for row in batch:
+        set_info = sets_by_group.setdefault(row["group"], {}).setdefault(
+            row["set_name"], {"members_with_poses": {}})
+        poses = set_info["members_with_poses"].setdefault(row["member_name"], [])
+        if row["pose"] not in poses:
+            poses.append(row["pose"])
+
+        existing = rows_by_id.get(row["id"])
+        if existing is not None:
+            existing["owned_count"] = row["owned_count"]
+        else:
+            rows_by_id[row["id"]] = dict(row, custom_image_url=None)
+
+
+def import_collection(storage: StorageBackend, f: IO[str], fmt: str,
+                      writer: Optional[BackgroundWriter] = None,
+                      batch_size: int = IMPORT_BATCH_SIZE) -> Dict[str, Any]:
+    """從已開啟的文字檔匯入收藏，回傳 {"imported", "skipped", "errors"}
+
+    檔案逐列解析並分批合併，記憶體只保存收藏本身 (不保存匯入檔的內容)；整個匯入在寫入鎖內完成，
+    最後只儲存一次。writer 有尚未寫入的變更時先寫完，避免被匯入結果覆蓋。
+    """
+    if writer is not None:
+        writer.flush(storage=storage)
+    result: Dict[str, Any] = {"imported": 0, "skipped": 0, "errors": []}
+    with storage.lock():
+        sets_by_group, saved_rows = storage.load()
+        # 空的收藏: 與預設系列定義相同，三個團體都要有項目
+        sets_by_group = sets_by_group or copy.deepcopy(DEFAULT_SETS_BY_GROUP)
+        rows_by_id = {row['id']: dict(row) for row in saved_rows}
+        # CSV 的第 1 列為欄位名稱
+        numbered_records = enumerate(read_rows(f, fmt), start=2 if fmt == "csv" else 1)
+        roster = get_roster()
+        while True:
+            chunk = list(islice(numbered_records, batch_size))
+            if not chunk:
+                break
+            batch = []
+            for row_number, record in chunk:
+                try:
+                    batch.append(parse_import_row(record, roster))
+                except ValueError as e:
+                    result["skipped"] += 1
+                    if len(result["errors"]) < MAX_REPORTED_ERRORS:
+                        result["errors"].append(f"row {row_number}: {e}")
+            merge_import_batch(batch, sets_by_group, rows_by_id)
+            result["imported"] += len(batch)
+        if result["imported"]:
+            storage.save_all(sets_by_group, list(rows_by_id.values()))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="收藏匯入/匯出 (CSV 或 JSON Lines)")
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("path", help="檔案路徑 (.csv 或 .jsonl)")
+    parser.add_argument("--user", default="", help="收藏者名稱 (留空為預設收藏)")
+    parser.add_argument("--backend", choices=("json", "sqlite"), help="儲存後端 (預設依 SAKAMICHI_STORAGE)")
+    parser.add_argument("--format", choices=FORMATS, help="檔案格式 (預設依副檔名判斷)")
+    args = parser.parse_args()
+
+    storage = create_user_storage(normalize_user_namespace(args.user), args.backend)
+    fmt = args.format or format_from_path(args.path)
+    if args.command == "export":
+        with open(args.path, 'w', encoding='utf-8', newline='') as f:
+            count = export_collection(storage, f, fmt)
+        print(f"Exported {count} rows to {args.path}")
+    else:
+        with open(args.path, 'r', encoding='utf-8-sig', newline='') as f:
+            result = import_collection(storage, f, fmt)
+        print(f"Imported {result['imported']} rows, skipped {result['skipped']}")
+        for error in result["errors"]:
+            print(f"  {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""坂道生寫真收藏追蹤器 - 未收藏清單的輸出 (不依賴 Streamlit)
+
+PhotoCollection.want_list() 的結果 ({系列: {成員: [姿勢...]}}) 可輸出為:
+- 精簡文字: 依系列分段，每位成員一行，可直接貼到社群網站
+- PNG 圖片: 需要 Pillow 與日文字型 (以環境變數 SAKAMICHI_FONT 指定，或自動尋找常見的系統字型)
+
+    python sakamichi_wantlist.py --user alice --group 乃木坂46
+    python sakamichi_wantlist.py --set 2025.Jan --output want.png
+"""
+import argparse
+import functools
+import io
+import os
+from typing import Dict, List, Optional, Tuple
+
+from sakamichi_core import ALL_SETS_OPTION, Pose, create_user_storage, load_collection, normalize_user_namespace
+from sakamichi_images import HAS_PILLOW
+
+WantList = Dict[str, Dict[str, List[Pose]]]
+
+# 依序尋找的日文字型 (Linux / macOS / Windows)
+FONT_CANDIDATES = (
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/google-noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/fonts-japanese-gothic.ttf",
+    "/System/Library/Fonts/ヒラギノ角ゴシック W3.ttc",
+    "/System/Library/Fonts/Hiragino Sans GB.ttc",
+    "C:\\Windows\\Fonts\\meiryo.ttc",
+    "C:\\Windows\\Fonts\\msgothic.ttc",
+)
+IMAGE_FONT_SIZE = 22
+IMAGE_PADDING = 24
+# 圖片最多繪製的行數 (超過時在最後註明省略的行數，請先以系列或團體縮小範圍)
+MAX_IMAGE_LINES = 400
+
+
+def want_list_size(want_list: WantList) -> int:
+    """清單中的生寫真張數"""
+    return sum(len(poses) for members in want_list.values() for poses in members.values())
+
+
+def want_list_lines(want_list: WantList) -> List[Tuple[str, str]]:
+    """(種類, 文字) 行: title 為標題、set 為系列名稱、member 為「成員: 姿勢・姿勢」"""
+    lines = [("title", f"未收藏清單 (共 {want_list_size(want_list)} 張)")]
+    for set_name, members in want_list.items():
+        lines.append(("set", f"【{set_name}】"))
+        for member_name, poses in members.items():
+            lines.append(("member", f"{member_name}: {'・'.join(pose.value for pose in poses)}"))
+    return lines
+
+
+def format_want_list_text(want_list: WantList) -> str:
+    """精簡文字格式 (系列之間空一行)"""
+    parts = []
+    for kind, text in want_list_lines(want_list):
+        if kind == "set":
+            parts.append("")
+        parts.append(text)
+    return "\n".join(parts) + "\n"
+
+
+@functools.lru_cache(maxsize=None)
+def find_font() -> Optional[str]:
+    """可顯示日文的字型檔路徑 (找不到時為 None)"""
+    for path in (os.environ.get("SAKAMICHI_FONT"),) + FONT_CANDIDATES:
+        if path and os.path.exists(path):
+            return path
+    return None
+
+
+def render_want_list_png(want_list: WantList, font_path: Optional[str] = None,
+                         max_lines: int = MAX_IMAGE_LINES) -> Optional[bytes]:
+    """繪製為 PNG 圖片；沒有 Pillow 或找不到字型時回傳 None"""
+    font_path = font_path or find_font()
+    if not HAS_PILLOW or font_path is None:
+        return None
+    from PIL import Image, ImageDraw, ImageFont
+
+    lines = want_list_lines(want_list)
+    if len(lines) > max_lines:
+        omitted = len(lines) - (max_lines - 1)
+        lines = lines[:max_lines - 1] + [("note", f"… 其餘 {omitted} 行省略")]
+
+    font = ImageFont.truetype(font_path, IMAGE_FONT_SIZE)
+    heading_font = ImageFont.truetype(font_path, IMAGE_FONT_SIZE + 4)
+    colors = {"title": "#222222", "set": "#7e1083", "member": "#333333", "note": "#888888"}
+    line_height = int(IMAGE_FONT_SIZE * 1.6)
+
+    measure = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+    width = max(measure.textlength(text, font=heading_font if kind in ("title", "set") else font)
+                for kind, text in lines)
+    image = Image.new("RGB", (int(width) + IMAGE_PADDING * 2, line_height * len(lines) + IMAGE_PADDING * 2), "white")
+    draw = ImageDraw.Draw(image)
+    y = IMAGE_PADDING
+    for kind, text in lines:
+        draw.text((IMAGE_PADDING, y), text, fill=colors[kind],
+                  font=heading_font if kind in ("title", "set") else font)
+        y += line_height
+
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="輸出未收藏清單 (文字或 PNG 圖片)")
+    parser.add_argument("--user", default="", help="收藏者名稱 (留空為預設收藏)")
+    parser.add_argument("--backend", choices=("json", "sqlite"), help="儲存後端 (預設依 SAKAMICHI_STORAGE)")
+    parser.add_argument("--set", default=ALL_SETS_OPTION, help="只列出指定系列 (預設為所有系列)")
+    parser.add_argument("--group", help="只列出指定團體 (例如 乃木坂46)")
+    parser.add_argument("--output", help="輸出檔案 (.txt 或 .png；預設輸出文字到畫面)")
+    args = parser.parse_args()
+
+    photos, _ = load_collection(create_user_storage(normalize_user_namespace(args.user), args.backend))
+    want_list = photos.want_list(args.set, args.group)
+    if args.output and args.output.lower().endswith(".png"):
+        data = render_want_list_png(want_list)
+        if data is None:
+            parser.error("PNG output needs Pillow and a Japanese font (set SAKAMICHI_FONT)")
+        with open(args.output, 'wb') as f:
+            f.write(data)
+    elif args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(format_want_list_text(want_list))
+    else:
+        print(format_want_list_text(want_list), end="")
+
+
+if __name__ == "__main__":
+    main()
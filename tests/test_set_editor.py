@@ -0,0 +1,73 @@
+"""系列編輯: 系列中的成員畢業後 (不在現役名單中) 仍可開啟編輯與更新"""
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sakamichi_roster  # noqa: E402
+from sakamichi_storage import get_background_writer  # noqa: E402
+
+AppTest = pytest.importorskip("streamlit.testing.v1").AppTest
+
+APP_FILE = os.path.join(ROOT, "sakamichi_app.py")
+GRADUATED_MEMBER = "井上和"
+
+
+def write_roster(path, graduated_names):
+    """將預設名單中 graduated_names 的成員移到 graduated 後寫入 path"""
+    with open(os.path.join(ROOT, "roster.json"), 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    for group_value, generations in data["groups"].items():
+        for generation, names in generations.items():
+            for name in [name for name in names if name in graduated_names]:
+                names.remove(name)
+                data["graduated"].setdefault(group_value, {}).setdefault(generation, []).append(name)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    # 避免同一秒內改寫時 mtime/size 都相同而沿用快取
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    roster_path = tmp_path / "roster.json"
+    write_roster(roster_path, set())
+    monkeypatch.setattr(sakamichi_roster, "ROSTER_FILE", str(roster_path))
+    at = AppTest.from_file(APP_FILE, default_timeout=60)
+    at.roster_path = roster_path
+    yield at
+    # 資料檔為相對路徑: 在切回原本的工作目錄前寫完背景寫入的變更
+    get_background_writer().flush()
+
+
+def test_edit_set_with_graduated_member(app):
+    app.run()
+    app.text_input(key="new_set_name_simple").input("2024.Apr")
+    next(button for button in app.button if "新增此系列" in button.label).click().run()
+    app.multiselect(key="edit_selected_members").select(GRADUATED_MEMBER).select("遠藤さくら").run()
+    for multiselect in app.multiselect:
+        if multiselect.key and multiselect.key.startswith("edit_pose_for_member_"):
+            multiselect.select("Y")
+    app.run()
+    next(button for button in app.button if "更新此系列" in button.label).click().run()
+    assert not app.exception
+
+    # 成員畢業後重新開啟編輯器
+    write_roster(app.roster_path, {GRADUATED_MEMBER})
+    app.run()
+    assert not app.exception
+    member_select = app.multiselect(key="edit_selected_members")
+    assert GRADUATED_MEMBER in member_select.options[-1]
+    assert "(已畢業)" in member_select.options[-1]
+    assert GRADUATED_MEMBER in member_select.value
+
+    # 保留畢業成員再次更新，系列定義與 Photo 不受影響
+    next(button for button in app.button if "更新此系列" in button.label).click().run()
+    assert not app.exception
+    members_with_poses = app.session_state.all_sets_by_group["乃木坂46"]["2024.Apr"]["members_with_poses"]
+    assert members_with_poses[GRADUATED_MEMBER] == ["Y"]
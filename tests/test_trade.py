@@ -0,0 +1,101 @@
+"""交換配對: 固定的小型收藏的兩人互換、三人循環，以及每次交換都合法"""
+import os
+import random
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+pytest.importorskip("numpy")
+
+from sakamichi_trade import TradeIndex  # noqa: E402
+
+# {收藏者: {Photo ID: 張數}}；目標張數為 1: 2 張以上有多餘，0 張為缺少
+# alice/bob 可以兩人互換；carol -> dave -> erin -> carol 只能三人循環
+CORPUS = {
+    "alice": {"井上和_S1_Y": 2, "井上和_S1_C": 0, "井上和_S1_H": 1},
+    "bob": {"井上和_S1_Y": 0, "井上和_S1_C": 3, "井上和_S1_H": 0},
+    "carol": {"遠藤さくら_S2_Y": 2, "遠藤さくら_S2_H": 0},
+    "dave": {"遠藤さくら_S2_Y": 0, "遠藤さくら_S2_C": 2},
+    "erin": {"遠藤さくら_S2_C": 0, "遠藤さくら_S2_H": 4},
+}
+
+
+def build_index(corpus):
+    index = TradeIndex()
+    for name, counts in corpus.items():
+        index.add_collector(name, counts.items())
+    return index
+
+
+def check_trades(corpus, pairs, cycles):
+    """依序套用每次交換: 給出的人要有多餘、收到的人要缺少 (同一張不會收到兩次)；回傳交換的總張數"""
+    counts = {name: dict(photo_counts) for name, photo_counts in corpus.items()}
+
+    def give(giver, receiver, photo_ids):
+        for photo_id in photo_ids:
+            assert counts[giver].get(photo_id, 0) > 1, (giver, photo_id)
+            assert counts[receiver].get(photo_id) == 0, (receiver, photo_id)
+            counts[giver][photo_id] -= 1
+            counts[receiver][photo_id] = 1
+        return len(photo_ids)
+
+    total = 0
+    for trade in pairs:
+        assert len(trade.a_gives) == len(trade.b_gives)
+        total += give(trade.a, trade.b, trade.a_gives) + give(trade.b, trade.a, trade.b_gives)
+    for trade in cycles:
+        assert len({len(photo_ids) for photo_ids in trade.gives}) == 1
+        for giver, receiver, photo_ids in zip(trade.members, trade.members[1:] + trade.members[:1], trade.gives):
+            total += give(giver, receiver, photo_ids)
+    return total
+
+
+def random_corpus(collector_count, photo_count, seed):
+    rng = random.Random(seed)
+    photo_ids = [f"member{index % 7}_Set{index // 7:03d}_Y" for index in range(photo_count)]
+    return {f"collector{index:02d}": {photo_id: rng.choice((0, 0, 1, 1, 2, 3))
+                                      for photo_id in rng.sample(photo_ids, photo_count // 2)}
+            for index in range(collector_count)}
+
+
+def test_holders_and_seekers():
+    index = build_index(CORPUS)
+    assert index.holders_of("井上和_S1_Y") == ["alice"]
+    assert index.seekers_of("井上和_S1_H") == ["bob"]
+    assert index.holders_of("井上和_S1_H") == []
+    assert index.seekers_of("unknown") == []
+
+
+def test_give_matrix_matches_brute_force():
+    corpus = random_corpus(12, 60, seed=46)
+    names = list(corpus)
+    surplus = {name: {p for p, count in corpus[name].items() if count > 1} for name in names}
+    missing = {name: {p for p, count in corpus[name].items() if count == 0} for name in names}
+    expected = [[0 if a == b else len(surplus[a] & missing[b]) for b in names] for a in names]
+    assert build_index(corpus).give_matrix().tolist() == expected
+
+
+def test_expected_pairs_and_cycles():
+    index = build_index(CORPUS)
+    pairs = index.match_pairs()
+    cycles = index.match_cycles()
+
+    assert [(trade.a, trade.b, trade.a_gives, trade.b_gives) for trade in pairs] == [
+        ("alice", "bob", ["井上和_S1_Y"], ["井上和_S1_C"])]
+    assert [(trade.members, trade.gives) for trade in cycles] == [
+        (["carol", "dave", "erin"], [["遠藤さくら_S2_Y"], ["遠藤さくら_S2_C"], ["遠藤さくら_S2_H"]])]
+    assert check_trades(CORPUS, pairs, cycles) == 5
+
+
+def test_matched_trades_are_legal():
+    corpus = random_corpus(20, 80, seed=7)
+    index = build_index(corpus)
+    pairs = index.match_pairs()
+    cycles = index.match_cycles()
+    assert pairs and check_trades(corpus, pairs, cycles) > 0
+    # 配對後剩下的多餘/缺少已經無法再兩人互換
+    give = index.give_matrix()
+    assert not (give * give.T).any()